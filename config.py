@@ -4,44 +4,63 @@ Configuration for Project Manager Agent.
 Central location for notification and system settings.
 """
 
-from datetime import timedelta
+import bisect
+import functools
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import List, Tuple
 
 # ============================================
 # NOTIFICATION SETTINGS
 # ============================================
 
-NOTIFICATION_CONFIG = {
-    "P0": {
-        "channels": ["telegram", "sms"],
-        "send_immediately": True,
-        "dedup_window": timedelta(hours=4),
-        "requires_acknowledgement": False,
-    },
-    "P1": {
-        "channels": ["telegram"],
-        "batched": True,
-        "batch_times": ["09:00", "13:00", "17:00"],
-        "dedup_window": timedelta(hours=8),
-    },
-    "P2": {
-        "channels": ["telegram"],
-        "batched": True,
-        "batch_day": 6,  # Sunday
-        "batch_time": "20:00",
-    },
-    "P3": {
-        "channels": ["log"],
-        "dedup_window": timedelta(hours=1),
-    }
-}
+@dataclass(frozen=True, slots=True)
+class NotificationPolicy:
+    """Delivery rules for one priority level."""
+    channels: Tuple[str, ...]
+    dedup_hours: int
+    send_immediately: bool = False
+    batched: bool = False
+    silent: bool = False  # Telegram disable_notification
+    requires_acknowledgement: bool = False
+
+
+P0_POLICY = NotificationPolicy(
+    channels=("telegram", "sms"),
+    dedup_hours=4,
+    send_immediately=True,
+)
+P1_POLICY = NotificationPolicy(
+    channels=("telegram",),
+    dedup_hours=8,
+    batched=True,  # See P1_BATCH_TIMES
+)
+P2_POLICY = NotificationPolicy(
+    channels=("telegram",),
+    dedup_hours=168,  # 7 days
+    batched=True,  # See P2_WEEKLY_DAY / P2_WEEKLY_TIME
+    silent=True,
+)
+P3_POLICY = NotificationPolicy(
+    channels=("log",),
+    dedup_hours=1,
+    silent=True,
+)
+
+# Read-only: policies are shared by every sender and must not be mutated
+POLICIES = MappingProxyType({
+    "P0": P0_POLICY,
+    "P1": P1_POLICY,
+    "P2": P2_POLICY,
+    "P3": P3_POLICY,
+})
 
 # Dedup windows in hours for easy access
-DEDUP_WINDOWS = {
-    "P0": 4,
-    "P1": 8,
-    "P2": 168,  # 7 days
-    "P3": 1,
-}
+DEDUP_WINDOWS = MappingProxyType({
+    priority: policy.dedup_hours for priority, policy in POLICIES.items()
+})
 
 # P0 Trigger Types
 P0_TRIGGERS = [
@@ -67,6 +86,35 @@ P1_TRIGGERS = [
 # ============================================
 
 P1_BATCH_TIMES = ["09:00", "13:00", "17:00"]  # Local time
+P1_BATCH_MAX = 50  # Max notifications per digest; the rest roll into the next batch
+
+
+def _seconds_of_day(times: List[str]) -> Tuple[int, ...]:
+    """Convert "HH:MM" strings to sorted seconds-after-midnight."""
+    return tuple(sorted(int(h) * 3600 + int(m) * 60 for h, m in (t.split(":") for t in times)))
+
+
+def next_fire(slots: Tuple[int, ...], now: datetime) -> datetime:
+    """
+    Next firing time for a set of daily slots.
+
+    Args:
+        slots: Sorted seconds-after-midnight (e.g. P1_BATCH_SECONDS)
+        now: Reference time (naive local)
+
+    Returns:
+        First slot strictly after now, rolling over to tomorrow's first slot
+    """
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = (now - midnight).total_seconds()
+
+    i = bisect.bisect_right(slots, elapsed)
+    if i < len(slots):
+        return midnight + timedelta(seconds=slots[i])
+    return midnight + timedelta(days=1, seconds=slots[0])
+
+
+P1_BATCH_SECONDS = _seconds_of_day(P1_BATCH_TIMES)
 P2_WEEKLY_TIME = "20:00"  # Sunday 8pm
 P2_WEEKLY_DAY = 6  # Sunday = 6
 
@@ -75,16 +123,8 @@ SCHEDULER_JOBS = {
         "interval": timedelta(hours=1),
         "function": "notification_router.check_urgent_deadlines",
     },
-    "p1_batch_morning": {
-        "cron": "0 9 * * *",  # 9am daily
-        "function": "notification_router.process_pending_batch",
-    },
-    "p1_batch_afternoon": {
-        "cron": "0 13 * * *",  # 1pm daily
-        "function": "notification_router.process_pending_batch",
-    },
-    "p1_batch_evening": {
-        "cron": "0 17 * * *",  # 5pm daily
+    "p1_batch": {
+        "cron": "0 9,13,17 * * *",  # Single job at each P1_BATCH_TIMES slot
         "function": "notification_router.process_pending_batch",
     },
     "p2_weekly": {
@@ -97,21 +137,25 @@ SCHEDULER_JOBS = {
 # CHANNEL SETTINGS
 # ============================================
 
-TELEGRAM_CONFIG = {
-    "parse_mode": "Markdown",
-    "disable_notification": {
-        "P0": False,  # Always notify
-        "P1": False,
-        "P2": True,   # Silent for weekly
-        "P3": True,
-    }
-}
+@dataclass(frozen=True, slots=True)
+class SmsSettings:
+    """SMS channel settings."""
+    script_path: str
+    max_length: int
+    enabled: bool
 
-SMS_CONFIG = {
-    "script_path": "~/.claude/scripts/sms-tool.py",
-    "max_length": 160,
-    "enabled": True,
-}
+
+SMS_CONFIG = SmsSettings(
+    script_path="~/.claude/scripts/sms-tool.py",
+    max_length=160,
+    enabled=True,
+)
+
+
+@functools.cache
+def get_sms_script_path() -> str:
+    """Expanded SMS script path (resolved on first use, not at import)."""
+    return os.path.expanduser(SMS_CONFIG.script_path)
 
 # ============================================
 # LOGGING SETTINGS
@@ -133,8 +177,12 @@ EMAIL_SCAN_CONFIG = {
     "max_emails_per_scan": 50,
     "docs_base_path": "./pm-docs",
     "scan_times": ["09:00", "15:00"],
+    # Emails acted on in parallel after classification (I/O-bound: notifications, attachment records)
+    "concurrency": 8,
 }
 
+EMAIL_SCAN_SECONDS = _seconds_of_day(EMAIL_SCAN_CONFIG["scan_times"])
+
 # Keywords indicating blocker resolution
 RESOLUTION_KEYWORDS = [
     "attached", "here is", "completed", "finished",
@@ -147,9 +195,9 @@ ESCALATION_KEYWORDS = [
     "missing", "waiting", "require", "please provide"
 ]
 
-# Patterns to ignore (spam/newsletters)
+# Patterns to ignore (spam/newsletters) - case-insensitive regexes
 IGNORE_PATTERNS = [
-    "unsubscribe", "no-reply@", "noreply@", "newsletter",
+    "unsubscribe", "no-?reply@", "newsletter",
     "marketing", "automated message"
 ]
 
@@ -4,644 +4,1138 @@ SQLite persistence for Project Manager Agent.
 Full TOC-ready schema with projects, tasks, documents, and more.
 """
 
+import atexit
 import sqlite3
+import functools
 import json
-import uuid
+import os
+import queue
+import struct
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Set, Tuple, Union
 
+try:
+    import msgpack  # Optional: compact binary agent_state values
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson  # Optional: faster JSON for context/metadata columns
+except ImportError:
+    orjson = None
+
+# WAL mode: agent.db-wal / agent.db-shm hold recent commits, so never delete or
+# replace agent.db without removing them too (or they'll be replayed into it)
 DB_PATH = Path(__file__).parent / "agent.db"
-SCHEMA_VERSION = 3  # Bump when schema changes - v3: Added email_scan_log and email_attachments tables
+SCHEMA_VERSION = 15  # Bump when schema changes - v15: documents_fts keyed on documents.search_rowid
+
+
+# Connection tuning applied once per connection (WAL lets readers run alongside a writer)
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -64000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA wal_autocheckpoint = 1000",
+    "PRAGMA busy_timeout = 5000",  # Other processes (server, scheduler) may hold the write lock
+)
+
+# Read-only connections can't change the journal mode; the rest still applies
+READ_PRAGMAS = (
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -64000",
+    "PRAGMA busy_timeout = 5000",
+)
+
+READ_POOL_SIZE = 4
+
+# Per-connection prepared statement cache (sqlite3 keys it by SQL text)
+STATEMENT_CACHE_SIZE = 512
+
+# Hot point lookups, kept as constants so every call sends identical SQL text
+_SQL_GET_PROJECT = "SELECT * FROM projects WHERE id = ?"
+_SQL_GET_TASK = "SELECT * FROM tasks WHERE id = ?"
+_SQL_GET_FULL_KIT = "SELECT * FROM task_full_kit WHERE task_id = ? ORDER BY created_at"
+_SQL_KIT_COMPLETE = "SELECT NOT EXISTS(SELECT 1 FROM task_full_kit WHERE task_id = ? AND is_satisfied = 0)"
+_SQL_GET_BLOCKER = "SELECT * FROM blockers WHERE id = ?"
+_SQL_GET_DOCUMENT = "SELECT * FROM documents WHERE id = ?"
+_SQL_GET_DOCUMENT_BY_HASH = """
+    SELECT * FROM documents WHERE file_hash = ? AND project_id IS ?
+    ORDER BY created_at LIMIT 1
+"""
+_SQL_GET_SCHEDULE = "SELECT * FROM recurring_schedules WHERE id = ?"
+_SQL_GET_ACTION = "SELECT * FROM autonomous_actions WHERE id = ?"
+_SQL_GET_EMAIL_SCAN = "SELECT * FROM email_scan_log WHERE gmail_message_id = ?"
+_SQL_MARK_SENT = "UPDATE notification_queue SET sent_at = CURRENT_TIMESTAMP WHERE id = ?"
+# One JSON array parameter, so the statement text is the same for any batch size
+_SQL_MARK_MANY_SENT = (
+    "UPDATE notification_queue SET sent_at = CURRENT_TIMESTAMP "
+    "WHERE id IN (SELECT value FROM json_each(?))"
+)
+
+# Inserts shared by the single-row and batch helpers
+_SQL_INSERT_KIT_ITEM = """
+    INSERT INTO task_full_kit (id, task_id, requirement_type, description)
+    VALUES (?, ?, ?, ?)
+"""
+_SQL_INSERT_DOCUMENT = """
+    INSERT INTO documents (
+        id, filename, file_path, project_id, task_id, document_type,
+        content_text, file_type, file_size_bytes, file_hash,
+        vendor, amount, transaction_date, category, tags, notes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_INSERT_EMAIL_ATTACHMENT = """
+    INSERT INTO email_attachments (
+        id, email_scan_log_id, gmail_attachment_id, filename, local_path,
+        document_id, mime_type, file_size_bytes, download_status,
+        download_error, blocker_id, project_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_INSERT_EMAIL_SCAN = """
+    INSERT INTO email_scan_log (
+        id, gmail_message_id, gmail_thread_id, from_address, from_name,
+        subject, classification, received_at, matched_blocker_id,
+        matched_project_id, has_attachment, notification_sent
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
 
-def get_connection() -> sqlite3.Connection:
-    """Get database connection with row factory."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+class ConnectionPool:
+    """
+    One read-write connection plus a bounded pool of read-only connections.
 
+    SQLite allows a single writer at a time, so all writes share one
+    connection behind a lock (no SQLITE_BUSY between our own threads), while
+    WAL mode lets the read-only connections query in parallel.
 
-def generate_id() -> str:
-    """Generate a short unique ID."""
-    return uuid.uuid4().hex[:16]
+    Both checkouts are reentrant per thread: a thread holding the writer gets
+    the writer for nested reads and writes (so it sees its own uncommitted
+    rows, and only the outermost write commits), and nested reads reuse the
+    thread's reader.
+    """
 
+    def __init__(self, path: Path, readers: int = READ_POOL_SIZE):
+        self._path = path
+        self._max_readers = readers
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._opened: List[sqlite3.Connection] = []
+        self._open_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _open(self, read_only: bool) -> sqlite3.Connection:
+        """Open and tune a connection. Caller holds _open_lock."""
+        if read_only:
+            conn = sqlite3.connect(
+                f"{self._path.resolve().as_uri()}?mode=ro", uri=True,
+                check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            pragmas = READ_PRAGMAS
+        else:
+            # Autocommit at the driver level; write() issues BEGIN IMMEDIATE itself
+            conn = sqlite3.connect(
+                self._path, isolation_level=None,
+                check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            pragmas = CONNECTION_PRAGMAS
+
+        conn.row_factory = sqlite3.Row
+        for pragma in pragmas:
+            conn.execute(pragma)
+        self._opened.append(conn)
+        return conn
+
+    def _ensure_writer(self) -> None:
+        """Open the writer on first use. Caller holds _open_lock."""
+        if self._writer is None:
+            self._writer = self._open(read_only=False)
+
+    def _checkout_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._open_lock:
+            # The writer goes first so the database and its WAL files exist for mode=ro
+            self._ensure_writer()
+            if self._reader_count < self._max_readers:
+                self._reader_count += 1
+                return self._open(read_only=True)
+
+        return self._readers.get()
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Check out a read-only connection (or the writer, if this thread holds it)."""
+        if getattr(self._local, "write_depth", 0):
+            yield self._writer
+            return
+
+        reader = getattr(self._local, "reader", None)
+        if reader is not None:
+            yield reader
+            return
+
+        reader = self._checkout_reader()
+        self._local.reader = reader
+        try:
+            yield reader
+        finally:
+            self._local.reader = None
+            self._readers.put(reader)
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Hold the writer inside a transaction.
+
+        The outermost block runs BEGIN IMMEDIATE and commits on success or
+        rolls back on error; nested blocks join it.
+        """
+        with self._write_lock:
+            depth = getattr(self._local, "write_depth", 0)
+            with self._open_lock:
+                self._ensure_writer()
+            conn = self._writer
+
+            self._local.write_depth = depth + 1
+            try:
+                if depth:
+                    yield conn
+                    return
+
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                # executescript() may already have committed
+                if conn.in_transaction:
+                    conn.execute("COMMIT")
+            finally:
+                self._local.write_depth = depth
+
+    def close(self) -> None:
+        """Close every connection the pool opened."""
+        with self._open_lock:
+            conns = list(self._opened)
+            self._opened.clear()
+            self._writer = None
+            self._readers = queue.LifoQueue()
+            self._reader_count = 0
+
+        # Let SQLite refresh statistics the planner has found stale this session
+        if conns:
+            try:
+                conns[0].execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+
+        # Readers first, so the writer's close can checkpoint and drop the WAL
+        for conn in reversed(conns):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+_pool = ConnectionPool(DB_PATH)
+atexit.register(_pool.close)
+
+
+def read_connection():
+    """
+    Context manager yielding a read-only connection from the pool.
 
-def init_db():
-    """Initialize database schema with all tables."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Check schema version
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS schema_version (
-            version INTEGER PRIMARY KEY
-        )
-    """)
-    cursor.execute("SELECT version FROM schema_version LIMIT 1")
-    row = cursor.fetchone()
-    current_version = row["version"] if row else 0
-
-    # ============================================
-    # CORE TABLES (v1 - original)
-    # ============================================
-
-    # Messages table - conversation history (legacy, kept for compatibility)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            chat_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Agent state - key-value store with namespacing
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS agent_state (
-            key TEXT PRIMARY KEY,
-            value TEXT,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # ============================================
-    # TOC SCHEMA (v2 - new)
-    # ============================================
-
-    # Projects - top-level containers with TOC properties
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS projects (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            description TEXT,
-            status TEXT NOT NULL DEFAULT 'active'
-                CHECK (status IN ('active', 'on_hold', 'completed', 'archived')),
-
-            -- TOC: Constraint Identification
-            current_constraint TEXT,
-            constraint_type TEXT
-                CHECK (constraint_type IN ('resource', 'time', 'knowledge', 'dependency', 'external', NULL)),
-
-            -- TOC: Buffer Management
-            estimated_days REAL,
-            buffer_days REAL DEFAULT 0,
-            buffer_consumed_percent REAL DEFAULT 0,
-            progress_percent REAL DEFAULT 0,
-
-            -- TOC: WIP Control
-            wip_limit INTEGER DEFAULT 3,
-
-            -- Hierarchy
-            parent_project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
-
-            -- Metadata
-            priority INTEGER DEFAULT 50,
-            due_date TEXT,
-            started_at TEXT,
-            completed_at TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Tasks - hierarchical with dependencies and full-kit
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id TEXT PRIMARY KEY,
-            project_id TEXT REFERENCES projects(id) ON DELETE CASCADE,
-            parent_task_id TEXT REFERENCES tasks(id) ON DELETE CASCADE,
-
-            title TEXT NOT NULL,
-            description TEXT,
-
-            -- Status tracking
-            status TEXT NOT NULL DEFAULT 'pending'
-                CHECK (status IN ('pending', 'waiting_for_kit', 'ready', 'in_progress', 'blocked', 'completed', 'cancelled')),
-
-            -- TOC: Aggressive estimates (50% confidence)
-            estimated_hours REAL,
-            actual_hours REAL,
-
-            -- TOC: Critical Chain
-            is_critical_chain INTEGER DEFAULT 0,
-            critical_chain_sequence INTEGER,
-
-            -- Timing
-            planned_start TEXT,
-            actual_start TEXT,
-            planned_end TEXT,
-            actual_end TEXT,
-            due_date TEXT,
-
-            -- Priority (for multi-project staggering)
-            priority INTEGER DEFAULT 50,
-            sort_order INTEGER DEFAULT 0,
-
-            -- Recurring reference
-            recurring_schedule_id TEXT REFERENCES recurring_schedules(id) ON DELETE SET NULL,
-
-            -- Metadata
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    Use for SELECT-only helpers; the connection returns to the pool on exit
+    and must not be closed.
+    """
+    return _pool.read()
 
-    # Task Dependencies (finish-to-start by default)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS task_dependencies (
-            id TEXT PRIMARY KEY,
-            task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
-            depends_on_task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
-            dependency_type TEXT DEFAULT 'finish_to_start'
-                CHECK (dependency_type IN ('finish_to_start', 'start_to_start', 'finish_to_finish')),
 
-            -- TOC: Feeding buffer
-            feeding_buffer_hours REAL DEFAULT 0,
+def write_connection():
+    """
+    Context manager yielding the single read-write connection.
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    The outermost block commits on success and rolls back on error, so a
+    helper's writes (and any nested helper calls) are atomic.
+    """
+    return _pool.write()
 
-            UNIQUE(task_id, depends_on_task_id)
-        )
-    """)
-
-    # Full Kit Checklist (TOC)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS task_full_kit (
-            id TEXT PRIMARY KEY,
-            task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
-
-            requirement_type TEXT NOT NULL
-                CHECK (requirement_type IN ('information', 'resource', 'dependency', 'approval', 'tool', 'other')),
-            description TEXT NOT NULL,
-            is_satisfied INTEGER DEFAULT 0,
-            satisfied_at TEXT,
-            notes TEXT,
-
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Blockers - what's stopping work
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS blockers (
-            id TEXT PRIMARY KEY,
-            task_id TEXT REFERENCES tasks(id) ON DELETE CASCADE,
-            project_id TEXT REFERENCES projects(id) ON DELETE CASCADE,
-
-            blocker_type TEXT NOT NULL
-                CHECK (blocker_type IN ('email', 'document', 'approval', 'deadline', 'resource', 'external', 'other')),
-            description TEXT NOT NULL,
-            waiting_on TEXT,
-            watch_pattern TEXT,
-
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            resolved_at TEXT,
-            resolved_by TEXT
-        )
-    """)
-
-    # Documents - file metadata for RAG
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS documents (
-            id TEXT PRIMARY KEY,
-            project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
-            task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
-
-            filename TEXT NOT NULL,
-            file_path TEXT,
-            file_type TEXT,
-            file_size_bytes INTEGER,
-            file_hash TEXT,
-
-            document_type TEXT
-                CHECK (document_type IN ('receipt', 'invoice', 'quote', 'contract', 'manual', 'note', 'screenshot', 'email', 'meeting_notes', 'other')),
-
-            -- Extracted metadata (for receipts/invoices)
-            vendor TEXT,
-            amount REAL,
-            currency TEXT DEFAULT 'USD',
-            transaction_date TEXT,
-            category TEXT,
-
-            -- RAG support
-            content_text TEXT,
-            content_summary TEXT,
-            embedding_model TEXT,
-
-            tags TEXT,  -- JSON array
-            notes TEXT,
-
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
 
-    # Document Chunks - for RAG retrieval
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS document_chunks (
-            id TEXT PRIMARY KEY,
-            document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+def transaction():
+    """
+    Context manager grouping several helper calls into one transaction.
+
+    Every write helper joins an enclosing transaction instead of committing
+    on its own, so related writes share a single commit (and fsync):
 
-            chunk_index INTEGER NOT NULL,
-            chunk_text TEXT NOT NULL,
-            chunk_tokens INTEGER,
+        with db.transaction():
+            blocker = db.create_blocker(...)
+            db.queue_notification(...)
+    """
+    return _pool.write()
 
-            -- Embedding stored as JSON array (migrate to pgvector later)
-            embedding TEXT,
-            embedding_model TEXT,
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+def json_dumps(value: Any) -> str:
+    """Serialize a value to compact JSON text (orjson when installed, stdlib json otherwise)."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    # Same shape as orjson's output: no whitespace, non-ASCII kept as-is
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
 
-            UNIQUE(document_id, chunk_index)
-        )
-    """)
 
-    # Conversations - enhanced from messages with project linking
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS conversations (
-            id TEXT PRIMARY KEY,
-            project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
-            task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
+def json_loads(text: Union[str, bytes]) -> Any:
+    """Parse JSON text (orjson when installed). Raises json.JSONDecodeError on bad input."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
 
-            source TEXT NOT NULL
-                CHECK (source IN ('telegram', 'email', 'meeting', 'phone', 'manual')),
-            external_id TEXT,
 
-            title TEXT,
-            participants TEXT,  -- JSON array
+def _fetch_columns(cursor: sqlite3.Cursor) -> Dict[str, List[Any]]:
+    """
+    Fetch a result set column-wise (column name -> list of values).
 
-            summary TEXT,
-            summary_updated_at TEXT,
+    Avoids building one dict per row for read-mostly callers that only
+    aggregate a few columns.
+    """
+    columns = [d[0] for d in cursor.description]
+    rows = cursor.fetchall()
+    return {name: [row[i] for row in rows] for i, name in enumerate(columns)}
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
 
-    # Conversation Messages - replaces flat messages for new conversations
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS conversation_messages (
-            id TEXT PRIMARY KEY,
-            conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+def fetch_dicts(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    """
+    Fetch a result set as row dicts.
 
-            role TEXT NOT NULL CHECK (role IN ('user', 'assistant', 'system', 'external')),
-            content TEXT NOT NULL,
+    Column names are read from cursor.description once instead of through
+    each sqlite3.Row, which is measurably cheaper than dict(row) per row.
+    """
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-            is_summarized INTEGER DEFAULT 0,
-            importance_score REAL,
 
-            sender_name TEXT,
-            external_message_id TEXT,
+@functools.lru_cache(maxsize=128)
+def _update_sql(table: str, columns: Tuple[str, ...], touch: bool = True) -> str:
+    """
+    UPDATE statement for a table and sorted column tuple (memoized so the text is stable).
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    touch also sets updated_at, for tables that have the column.
+    """
+    sets = ", ".join(f"{column} = ?" for column in columns)
+    if touch:
+        sets += ", updated_at = CURRENT_TIMESTAMP"
+    return f"UPDATE {table} SET {sets} WHERE id = ?"
 
-    # Email Threads - for tracking email context
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS email_threads (
-            id TEXT PRIMARY KEY,
-            project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
-            conversation_id TEXT REFERENCES conversations(id) ON DELETE SET NULL,
 
-            gmail_thread_id TEXT UNIQUE,
-            subject TEXT,
-            participants TEXT,  -- JSON array
+@functools.lru_cache(maxsize=128)
+def _filtered_sql(table: str, conditions: Tuple[str, ...], suffix: str) -> str:
+    """
+    SELECT statement for a table, AND-ed filter conditions and ORDER/LIMIT suffix.
 
-            summary TEXT,
+    Memoized, so each filter combination maps to one stable SQL string and a
+    single cached prepared statement. Absent filters are left out rather than
+    written as "? IS NULL OR col = ?" guards, which would stop SQLite from
+    using the column's index.
+    """
+    where = " AND ".join(conditions) if conditions else "1=1"
+    return f"SELECT * FROM {table} WHERE {where} {suffix}"
 
-            last_message_at TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
 
-    # Recurring Schedules - for bills, maintenance, etc.
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS recurring_schedules (
-            id TEXT PRIMARY KEY,
-            project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
+def _update_columns(fields: Dict[str, Any], allowed: frozenset, kind: str) -> Tuple[str, ...]:
+    """Validate update field names against a whitelist and return them sorted."""
+    unknown = fields.keys() - allowed
+    if unknown:
+        raise ValueError(f"Unknown {kind} field(s): {', '.join(sorted(unknown))}")
+    return tuple(sorted(fields))
 
-            name TEXT NOT NULL,
-            description TEXT,
 
-            frequency TEXT NOT NULL
-                CHECK (frequency IN ('daily', 'weekly', 'biweekly', 'monthly', 'quarterly', 'yearly', 'custom')),
+# Random bytes for IDs are read from the OS in blocks rather than per row
+ID_POOL_SIZE = 128
+_id_lock = threading.Lock()
+_id_pool = b""
+_id_offset = 0
+_id_last_ms = 0
+_id_counter = 0
 
-            -- Scheduling fields
-            cron_pattern TEXT,            -- For custom: '0 9 15 * *' (minute hour day month dow)
-            day_of_week TEXT,             -- 0=Mon, 6=Sun (comma-separated for multiple)
-            day_of_month TEXT,            -- 1-31 (comma-separated for multiple)
-            month_of_year TEXT,           -- 1-12 (comma-separated for multiple)
-            time_of_day TEXT DEFAULT '09:00',  -- HH:MM format
 
-            -- Task template fields
-            task_title_template TEXT NOT NULL,
-            task_description_template TEXT,
-            estimated_hours REAL,
-            priority INTEGER DEFAULT 3,   -- Priority for generated tasks (1-5)
+def _take_random(n: int) -> bytes:
+    """Slice n random bytes off the pool, refilling it when empty. Caller holds _id_lock."""
+    global _id_pool, _id_offset
 
-            expected_document_type TEXT,
+    if _id_offset + n > len(_id_pool):
+        _id_pool = os.urandom(8 * ID_POOL_SIZE)
+        _id_offset = 0
+    chunk = _id_pool[_id_offset:_id_offset + n]
+    _id_offset += n
+    return chunk
 
-            start_date TEXT NOT NULL,
-            end_date TEXT,
 
-            last_generated_date TEXT,
-            next_due_date TEXT,
+def generate_id() -> str:
+    """Generate a short unique ID (16 random hex chars)."""
+    with _id_lock:
+        return _take_random(8).hex()
 
-            is_active INTEGER DEFAULT 1,
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+def generate_ordered_id() -> str:
+    """
+    Generate a short unique ID that sorts by creation time.
 
-    # Autonomous Actions - actions agent takes or wants to take
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS autonomous_actions (
-            id TEXT PRIMARY KEY,
+    16 hex chars: 48-bit millisecond timestamp + 16-bit counter (randomly
+    seeded each millisecond). New rows land at the tail of the primary key
+    B-tree instead of at random pages.
+    """
+    global _id_last_ms, _id_counter
 
-            action_type TEXT NOT NULL,
-            target TEXT,
-            context TEXT,  -- JSON
+    now_ms = time.time_ns() // 1_000_000
+    with _id_lock:
+        if now_ms > _id_last_ms:
+            _id_last_ms = now_ms
+            _id_counter = int.from_bytes(_take_random(2), "big") & 0x7FFF
+        else:
+            _id_counter += 1
+            if _id_counter > 0xFFFF:
+                # Counter exhausted within one millisecond - borrow the next one
+                _id_last_ms += 1
+                _id_counter = 0
+        value = (_id_last_ms << 16) | _id_counter
 
-            status TEXT DEFAULT 'pending'
-                CHECK (status IN ('pending', 'approved', 'executed', 'cancelled', 'failed')),
-            requires_approval INTEGER DEFAULT 0,
+    return f"{value & 0xFFFFFFFFFFFFFFFF:016x}"
 
-            approved_at TEXT,
-            executed_at TEXT,
-            result TEXT,  -- JSON
-            error TEXT,
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+# ============================================
+# SCHEMA
+# ============================================
 
-    # TOC Metrics Snapshots - for trend analysis
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS toc_metrics_snapshots (
-            id TEXT PRIMARY KEY,
+# Full DDL, idempotent (IF NOT EXISTS), run as one script by init_db()
+_SCHEMA_SQL = """
+-- ============================================
+-- CORE TABLES (v1 - original)
+-- ============================================
+
+-- Messages table - conversation history (legacy, kept for compatibility)
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    chat_id INTEGER,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    -- token_count INTEGER: added by the v13 migration
+);
+
+-- Full-text index over message history (external content, keyed on the
+-- AUTOINCREMENT id so VACUUM can't desync it). Word tokens with Porter
+-- stemming, so "deploying" finds "deployed".
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+
+-- Agent state - key-value store with namespacing
+CREATE TABLE IF NOT EXISTS agent_state (
+    key TEXT PRIMARY KEY,
+    value BLOB,  -- msgpack bytes, or JSON/plain text
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- TOC SCHEMA (v2 - new)
+-- ============================================
+
+-- Projects - top-level containers with TOC properties
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    status TEXT NOT NULL DEFAULT 'active'
+        CHECK (status IN ('active', 'on_hold', 'completed', 'archived')),
+
+    -- TOC: Constraint Identification
+    current_constraint TEXT,
+    constraint_type TEXT
+        CHECK (constraint_type IN ('resource', 'time', 'knowledge', 'dependency', 'external', NULL)),
+
+    -- TOC: Buffer Management
+    estimated_days REAL,
+    buffer_days REAL DEFAULT 0,
+    buffer_consumed_percent REAL DEFAULT 0,
+    progress_percent REAL DEFAULT 0,
+
+    -- TOC: WIP Control
+    wip_limit INTEGER DEFAULT 3,
+
+    -- Hierarchy
+    parent_project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
+
+    -- Metadata
+    priority INTEGER DEFAULT 50,
+    due_date TEXT,
+    started_at TEXT,
+    completed_at TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tasks - hierarchical with dependencies and full-kit
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    project_id TEXT REFERENCES projects(id) ON DELETE CASCADE,
+    parent_task_id TEXT REFERENCES tasks(id) ON DELETE CASCADE,
+
+    title TEXT NOT NULL,
+    description TEXT,
+
+    -- Status tracking
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'waiting_for_kit', 'ready', 'in_progress', 'blocked', 'completed', 'cancelled')),
+
+    -- TOC: Aggressive estimates (50% confidence)
+    estimated_hours REAL,
+    actual_hours REAL,
+
+    -- TOC: Critical Chain
+    is_critical_chain INTEGER DEFAULT 0,
+    critical_chain_sequence INTEGER,
+
+    -- Timing
+    planned_start TEXT,
+    actual_start TEXT,
+    planned_end TEXT,
+    actual_end TEXT,
+    due_date TEXT,
+
+    -- Priority (for multi-project staggering)
+    priority INTEGER DEFAULT 50,
+    sort_order INTEGER DEFAULT 0,
+
+    -- Recurring reference
+    recurring_schedule_id TEXT REFERENCES recurring_schedules(id) ON DELETE SET NULL,
+
+    -- Metadata
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Task Dependencies (finish-to-start by default)
+CREATE TABLE IF NOT EXISTS task_dependencies (
+    id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    depends_on_task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    dependency_type TEXT DEFAULT 'finish_to_start'
+        CHECK (dependency_type IN ('finish_to_start', 'start_to_start', 'finish_to_finish')),
+
+    -- TOC: Feeding buffer
+    feeding_buffer_hours REAL DEFAULT 0,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(task_id, depends_on_task_id)
+);
+
+-- Full Kit Checklist (TOC)
+CREATE TABLE IF NOT EXISTS task_full_kit (
+    id TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+
+    requirement_type TEXT NOT NULL
+        CHECK (requirement_type IN ('information', 'resource', 'dependency', 'approval', 'tool', 'other')),
+    description TEXT NOT NULL,
+    is_satisfied INTEGER DEFAULT 0,
+    satisfied_at TEXT,
+    notes TEXT,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Blockers - what's stopping work
+CREATE TABLE IF NOT EXISTS blockers (
+    id TEXT PRIMARY KEY,
+    task_id TEXT REFERENCES tasks(id) ON DELETE CASCADE,
+    project_id TEXT REFERENCES projects(id) ON DELETE CASCADE,
+
+    blocker_type TEXT NOT NULL
+        CHECK (blocker_type IN ('email', 'document', 'approval', 'deadline', 'resource', 'external', 'other')),
+    description TEXT NOT NULL,
+    waiting_on TEXT,
+    watch_pattern TEXT,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    resolved_at TEXT,
+    resolved_by TEXT
+);
+
+-- Documents - file metadata for RAG
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
+    task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
+
+    filename TEXT NOT NULL,
+    file_path TEXT,
+    file_type TEXT,
+    file_size_bytes INTEGER,
+    file_hash TEXT,
+
+    document_type TEXT
+        CHECK (document_type IN ('receipt', 'invoice', 'quote', 'contract', 'manual', 'note', 'screenshot', 'email', 'meeting_notes', 'other')),
+
+    -- Extracted metadata (for receipts/invoices)
+    vendor TEXT,
+    amount REAL,
+    currency TEXT DEFAULT 'USD',
+    transaction_date TEXT,
+    category TEXT,
+
+    -- RAG support
+    content_text TEXT,
+    content_summary TEXT,
+    embedding_model TEXT,
+
+    tags TEXT,  -- JSON array
+    notes TEXT,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    -- search_rowid INTEGER: added by the v15 migration (documents_fts key)
+);
+
+-- Full-text index over documents' searchable text: documents_fts and its
+-- triggers are created by the v15 migration, keyed on search_rowid.
+
+-- Document Chunks - for RAG retrieval
+CREATE TABLE IF NOT EXISTS document_chunks (
+    id TEXT PRIMARY KEY,
+    document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+
+    chunk_index INTEGER NOT NULL,
+    chunk_text TEXT NOT NULL,
+    chunk_tokens INTEGER,
+
+    -- Embedding stored as packed little-endian float16 (see encode_embedding)
+    embedding BLOB,
+    embedding_model TEXT,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(document_id, chunk_index)
+);
+
+-- Conversations - enhanced from messages with project linking
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
+    task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
+
+    source TEXT NOT NULL
+        CHECK (source IN ('telegram', 'email', 'meeting', 'phone', 'manual')),
+    external_id TEXT,
+
+    title TEXT,
+    participants TEXT,  -- JSON array
+
+    summary TEXT,
+    summary_updated_at TEXT,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
 
-            snapshot_date TEXT NOT NULL,
+-- Conversation Messages - replaces flat messages for new conversations
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    id TEXT PRIMARY KEY,
+    conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
 
-            total_wip_count INTEGER,
-            wip_limit_violations INTEGER,
+    role TEXT NOT NULL CHECK (role IN ('user', 'assistant', 'system', 'external')),
+    content TEXT NOT NULL,
 
-            avg_buffer_consumed_percent REAL,
-            projects_in_red_zone INTEGER,
-            projects_in_yellow_zone INTEGER,
+    is_summarized INTEGER DEFAULT 0,
+    importance_score REAL,
 
-            tasks_completed INTEGER,
-            avg_flow_efficiency REAL,
+    sender_name TEXT,
+    external_message_id TEXT,
 
-            context_switches INTEGER,
-            full_kit_starts INTEGER,
-            partial_kit_starts INTEGER,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
 
-            tasks_started_late INTEGER,
-            tasks_expanded_to_fill INTEGER,
+-- Email Threads - for tracking email context
+CREATE TABLE IF NOT EXISTS email_threads (
+    id TEXT PRIMARY KEY,
+    project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
+    conversation_id TEXT REFERENCES conversations(id) ON DELETE SET NULL,
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    gmail_thread_id TEXT UNIQUE,
+    subject TEXT,
+    participants TEXT,  -- JSON array
 
-    # Context Switches - for behavioral tracking
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS context_switches (
-            id TEXT PRIMARY KEY,
+    summary TEXT,
 
-            from_task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
-            to_task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
+    last_message_at TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
 
-            switch_type TEXT CHECK (switch_type IN ('voluntary', 'blocked', 'interrupt', 'scheduled')),
-            reason TEXT,
+-- Recurring Schedules - for bills, maintenance, etc.
+CREATE TABLE IF NOT EXISTS recurring_schedules (
+    id TEXT PRIMARY KEY,
+    project_id TEXT REFERENCES projects(id) ON DELETE SET NULL,
 
-            occurred_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    name TEXT NOT NULL,
+    description TEXT,
 
-    # Notification Queue - for batch notifications
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS notification_queue (
-            id TEXT PRIMARY KEY,
+    frequency TEXT NOT NULL
+        CHECK (frequency IN ('daily', 'weekly', 'biweekly', 'monthly', 'quarterly', 'yearly', 'custom')),
 
-            priority TEXT NOT NULL CHECK (priority IN ('P0', 'P1', 'P2', 'P3')),
-            channel TEXT NOT NULL CHECK (channel IN ('telegram', 'sms', 'email')),
+    -- Scheduling fields
+    cron_pattern TEXT,            -- For custom: '0 9 15 * *' (minute hour day month dow)
+    day_of_week TEXT,             -- 0=Mon, 6=Sun (comma-separated for multiple)
+    day_of_month TEXT,            -- 1-31 (comma-separated for multiple)
+    month_of_year TEXT,           -- 1-12 (comma-separated for multiple)
+    time_of_day TEXT DEFAULT '09:00',  -- HH:MM format
 
-            message TEXT NOT NULL,
-            context TEXT,  -- JSON
+    -- Task template fields
+    task_title_template TEXT NOT NULL,
+    task_description_template TEXT,
+    estimated_hours REAL,
+    priority INTEGER DEFAULT 3,   -- Priority for generated tasks (1-5)
 
-            scheduled_for TEXT,
-            sent_at TEXT,
+    expected_document_type TEXT,
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Notification Deduplication - prevents repeat notifications
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS notification_dedup (
-            id TEXT PRIMARY KEY,
-            notification_type TEXT NOT NULL,
-            source_id TEXT,
-            last_sent_at TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # ============================================
-    # EMAIL MONITOR TABLES (Phase 4)
-    # ============================================
-
-    # Email Scan Log - track processed emails to avoid duplicates
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS email_scan_log (
-            id TEXT PRIMARY KEY,
-            gmail_message_id TEXT UNIQUE NOT NULL,
-            gmail_thread_id TEXT,
-
-            -- Email metadata
-            from_address TEXT,
-            from_name TEXT,
-            subject TEXT,
-            received_at TEXT,
-
-            -- Classification
-            classification TEXT CHECK (classification IN (
-                'blocker_match', 'project_relevant', 'attachment', 'ignore'
-            )),
-            matched_blocker_id TEXT REFERENCES blockers(id),
-            matched_project_id TEXT REFERENCES projects(id),
-
-            -- Processing
-            processed_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            has_attachment INTEGER DEFAULT 0,
-            attachment_downloaded INTEGER DEFAULT 0,
-            notification_sent INTEGER DEFAULT 0,
-
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    start_date TEXT NOT NULL,
+    end_date TEXT,
 
-    # Email Attachments - track downloaded files
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS email_attachments (
-            id TEXT PRIMARY KEY,
-            email_scan_log_id TEXT REFERENCES email_scan_log(id),
-            document_id TEXT REFERENCES documents(id),
+    last_generated_date TEXT,
+    next_due_date TEXT,
 
-            gmail_attachment_id TEXT,
-            filename TEXT NOT NULL,
-            mime_type TEXT,
-            file_size_bytes INTEGER,
+    is_active INTEGER DEFAULT 1,
 
-            local_path TEXT,
-            download_status TEXT CHECK (download_status IN ('pending', 'downloaded', 'failed')),
-            download_error TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
 
-            blocker_id TEXT REFERENCES blockers(id),
-            project_id TEXT REFERENCES projects(id),
+-- Autonomous Actions - actions agent takes or wants to take
+CREATE TABLE IF NOT EXISTS autonomous_actions (
+    id TEXT PRIMARY KEY,
 
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    action_type TEXT NOT NULL,
+    target TEXT,
+    context TEXT,  -- JSON
 
-    # ============================================
-    # INDEXES
-    # ============================================
+    status TEXT DEFAULT 'pending'
+        CHECK (status IN ('pending', 'approved', 'executed', 'cancelled', 'failed')),
+    requires_approval INTEGER DEFAULT 0,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_parent ON projects(parent_project_id)")
+    approved_at TEXT,
+    executed_at TEXT,
+    result TEXT,  -- JSON
+    error TEXT,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks(parent_task_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_critical_chain ON tasks(is_critical_chain, critical_chain_sequence)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date)")
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dependencies_task ON task_dependencies(task_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dependencies_depends ON task_dependencies(depends_on_task_id)")
+-- TOC Metrics Snapshots - for trend analysis
+CREATE TABLE IF NOT EXISTS toc_metrics_snapshots (
+    id TEXT PRIMARY KEY,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_project ON documents(project_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_type ON documents(document_type)")
+    snapshot_date TEXT NOT NULL,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunks_document ON document_chunks(document_id)")
+    total_wip_count INTEGER,
+    wip_limit_violations INTEGER,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_project ON conversations(project_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_external ON conversations(external_id, source)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conv_messages_conversation ON conversation_messages(conversation_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conv_messages_date ON conversation_messages(conversation_id, created_at)")
+    avg_buffer_consumed_percent REAL,
+    projects_in_red_zone INTEGER,
+    projects_in_yellow_zone INTEGER,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_blockers_task ON blockers(task_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_blockers_resolved ON blockers(resolved_at)")
+    tasks_completed INTEGER,
+    avg_flow_efficiency REAL,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_recurring_next_due ON recurring_schedules(next_due_date) WHERE is_active = 1")
+    context_switches INTEGER,
+    full_kit_starts INTEGER,
+    partial_kit_starts INTEGER,
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notifications_priority ON notification_queue(priority, scheduled_for)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notification_dedup_type ON notification_dedup(notification_type, source_id)")
+    tasks_started_late INTEGER,
+    tasks_expanded_to_fill INTEGER,
 
-    # Email monitor indexes (Phase 4)
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_scan_gmail_id ON email_scan_log(gmail_message_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_scan_processed ON email_scan_log(processed_at)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_attach_email ON email_attachments(email_scan_log_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_attach_blocker ON email_attachments(blocker_id)")
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
 
-    # Update schema version
-    if current_version < SCHEMA_VERSION:
-        cursor.execute("DELETE FROM schema_version")
-        cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (SCHEMA_VERSION,))
+-- Context Switches - for behavioral tracking
+CREATE TABLE IF NOT EXISTS context_switches (
+    id TEXT PRIMARY KEY,
 
-    conn.commit()
-    conn.close()
+    from_task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
+    to_task_id TEXT REFERENCES tasks(id) ON DELETE SET NULL,
 
+    switch_type TEXT CHECK (switch_type IN ('voluntary', 'blocked', 'interrupt', 'scheduled')),
+    reason TEXT,
 
-def add_message(role: str, content: str, chat_id: int = None) -> int:
+    occurred_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Notification Queue - for batch notifications
+CREATE TABLE IF NOT EXISTS notification_queue (
+    id TEXT PRIMARY KEY,
+
+    priority TEXT NOT NULL CHECK (priority IN ('P0', 'P1', 'P2', 'P3')),
+    channel TEXT NOT NULL CHECK (channel IN ('telegram', 'sms', 'email')),
+
+    message TEXT NOT NULL,
+    context TEXT,  -- JSON
+
+    scheduled_for TEXT,
+    sent_at TEXT,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Notification Deduplication - prevents repeat notifications
+CREATE TABLE IF NOT EXISTS notification_dedup (
+    id TEXT PRIMARY KEY,
+    notification_type TEXT NOT NULL,
+    source_id TEXT,
+    last_sent_at TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- EMAIL MONITOR TABLES (Phase 4)
+-- ============================================
+
+-- Email Scan Log - track processed emails to avoid duplicates
+CREATE TABLE IF NOT EXISTS email_scan_log (
+    id TEXT PRIMARY KEY,
+    gmail_message_id TEXT UNIQUE NOT NULL,
+    gmail_thread_id TEXT,
+
+    -- Email metadata
+    from_address TEXT,
+    from_name TEXT,
+    subject TEXT,
+    received_at TEXT,
+
+    -- Classification
+    classification TEXT CHECK (classification IN (
+        'blocker_match', 'project_relevant', 'attachment', 'ignore'
+    )),
+    matched_blocker_id TEXT REFERENCES blockers(id),
+    matched_project_id TEXT REFERENCES projects(id),
+
+    -- Processing
+    processed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    has_attachment INTEGER DEFAULT 0,
+    attachment_downloaded INTEGER DEFAULT 0,
+    notification_sent INTEGER DEFAULT 0,
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Email Attachments - track downloaded files
+CREATE TABLE IF NOT EXISTS email_attachments (
+    id TEXT PRIMARY KEY,
+    email_scan_log_id TEXT REFERENCES email_scan_log(id),
+    document_id TEXT REFERENCES documents(id),
+
+    gmail_attachment_id TEXT,
+    filename TEXT NOT NULL,
+    mime_type TEXT,
+    file_size_bytes INTEGER,
+
+    local_path TEXT,
+    download_status TEXT CHECK (download_status IN ('pending', 'downloaded', 'failed')),
+    download_error TEXT,
+
+    blocker_id TEXT REFERENCES blockers(id),
+    project_id TEXT REFERENCES projects(id),
+
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- INDEXES
+-- ============================================
+
+-- Context paging: WHERE chat_id = ? ORDER BY id DESC walks this backwards
+-- (id is the rowid, so every index entry already carries it)
+CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages(chat_id);
+
+CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status);
+CREATE INDEX IF NOT EXISTS idx_projects_parent ON projects(parent_project_id);
+CREATE INDEX IF NOT EXISTS idx_projects_status_priority ON projects(status, priority DESC, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks(parent_task_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_critical_chain ON tasks(is_critical_chain, critical_chain_sequence);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_project_status_sort ON tasks(project_id, status, sort_order, priority DESC, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_full_kit_task ON task_full_kit(task_id, created_at);
+-- Partial index: a task's open prerequisites, for the full-kit EXISTS check
+CREATE INDEX IF NOT EXISTS idx_kit_unsat ON task_full_kit(task_id) WHERE is_satisfied = 0;
+
+CREATE INDEX IF NOT EXISTS idx_dependencies_task ON task_dependencies(task_id);
+CREATE INDEX IF NOT EXISTS idx_dependencies_depends ON task_dependencies(depends_on_task_id);
+
+CREATE INDEX IF NOT EXISTS idx_docs_project_type ON documents(project_id, document_type, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_documents_type ON documents(document_type);
+-- Partial index: duplicate-upload lookup by content hash
+CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(file_hash) WHERE file_hash IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_document ON document_chunks(document_id);
+
+CREATE INDEX IF NOT EXISTS idx_conversations_project ON conversations(project_id);
+CREATE INDEX IF NOT EXISTS idx_conversations_external ON conversations(external_id, source);
+CREATE INDEX IF NOT EXISTS idx_conv_messages_date ON conversation_messages(conversation_id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_blockers_task ON blockers(task_id);
+CREATE INDEX IF NOT EXISTS idx_blockers_resolved ON blockers(resolved_at);
+CREATE INDEX IF NOT EXISTS idx_blockers_open ON blockers(task_id, project_id, created_at DESC) WHERE resolved_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_recurring_next_due ON recurring_schedules(next_due_date) WHERE is_active = 1;
+
+CREATE INDEX IF NOT EXISTS idx_notifications_priority ON notification_queue(priority, scheduled_for);
+-- Partial index: only unsent rows, so drain cost tracks pending, not history
+CREATE INDEX IF NOT EXISTS idx_notif_pending ON notification_queue(priority, scheduled_for, created_at) WHERE sent_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_notification_dedup_type ON notification_dedup(notification_type, source_id);
+
+CREATE INDEX IF NOT EXISTS idx_actions_pending ON autonomous_actions(requires_approval, created_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_ctxsw_day ON context_switches(occurred_at);
+
+-- Email monitor indexes (Phase 4)
+CREATE INDEX IF NOT EXISTS idx_email_scan_gmail_id ON email_scan_log(gmail_message_id);
+CREATE INDEX IF NOT EXISTS idx_email_scan_processed ON email_scan_log(processed_at);
+CREATE INDEX IF NOT EXISTS idx_email_attach_email ON email_attachments(email_scan_log_id);
+CREATE INDEX IF NOT EXISTS idx_email_attach_blocker ON email_attachments(blocker_id);
+"""
+
+# Data migrations: (target version, SQL run when upgrading from below it)
+_MIGRATIONS = (
+    # Collapse per-send dedup rows into one keyed row per type + source
+    (4, """
+INSERT OR REPLACE INTO notification_dedup (id, notification_type, source_id, last_sent_at)
+SELECT notification_type || ':' || COALESCE(source_id, ''),
+       notification_type, source_id, MAX(last_sent_at)
+FROM notification_dedup
+GROUP BY notification_type, source_id;
+
+DELETE FROM notification_dedup
+WHERE id != notification_type || ':' || COALESCE(source_id, '');
+"""),
+    # Superseded by idx_notifq_pending (itself replaced in v8)
+    (6, "DROP INDEX IF EXISTS idx_notifications_sched;"),
+    # Superseded by idx_notif_pending / idx_docs_project_type
+    (8, """
+DROP INDEX IF EXISTS idx_notifq_pending;
+DROP INDEX IF EXISTS idx_documents_project;
+"""),
+    # Index messages that predate messages_fts
+    (11, "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');"),
+    # Prefix of idx_conv_messages_date, which serves the same lookups
+    (12, "DROP INDEX IF EXISTS idx_conv_messages_conversation;"),
+    # Token count stored at insert (NULL for older rows: estimate from length)
+    (13, "ALTER TABLE messages ADD COLUMN token_count INTEGER;"),
+    # Store the length estimate for rows from before v13 (memory_manager's fallback)
+    (14, "UPDATE messages SET token_count = LENGTH(content) / 4 WHERE token_count IS NULL;"),
+    # Full-text index over documents (external content, so the text itself isn't
+    # stored twice). documents has a TEXT primary key, so its implicit rowid can
+    # be renumbered by VACUUM; the index is keyed on an explicit search_rowid
+    # instead, assigned on insert. Trigram tokens give the same substring
+    # semantics as the LIKE '%q%' search it replaced. Replaces the v10 index.
+    (15, """
+DROP TRIGGER IF EXISTS documents_fts_insert;
+DROP TRIGGER IF EXISTS documents_fts_delete;
+DROP TRIGGER IF EXISTS documents_fts_update;
+DROP TABLE IF EXISTS documents_fts;
+
+ALTER TABLE documents ADD COLUMN search_rowid INTEGER;
+UPDATE documents SET search_rowid = rowid;
+CREATE UNIQUE INDEX idx_documents_search_rowid ON documents(search_rowid);
+
+CREATE VIRTUAL TABLE documents_fts USING fts5(
+    filename, content_text, vendor, notes, content_summary,
+    content='documents', content_rowid='search_rowid', tokenize='trigram'
+);
+
+CREATE TRIGGER documents_fts_insert AFTER INSERT ON documents BEGIN
+    UPDATE documents SET search_rowid = (SELECT IFNULL(MAX(search_rowid), 0) + 1 FROM documents)
+    WHERE rowid = new.rowid;
+    INSERT INTO documents_fts (rowid, filename, content_text, vendor, notes, content_summary)
+    SELECT search_rowid, filename, content_text, vendor, notes, content_summary
+    FROM documents WHERE rowid = new.rowid;
+END;
+
+CREATE TRIGGER documents_fts_delete AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, filename, content_text, vendor, notes, content_summary)
+    VALUES ('delete', old.search_rowid, old.filename, old.content_text, old.vendor, old.notes, old.content_summary);
+END;
+
+CREATE TRIGGER documents_fts_update
+AFTER UPDATE OF filename, content_text, vendor, notes, content_summary ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, filename, content_text, vendor, notes, content_summary)
+    VALUES ('delete', old.search_rowid, old.filename, old.content_text, old.vendor, old.notes, old.content_summary);
+    INSERT INTO documents_fts (rowid, filename, content_text, vendor, notes, content_summary)
+    VALUES (new.search_rowid, new.filename, new.content_text, new.vendor, new.notes, new.content_summary);
+END;
+
+INSERT INTO documents_fts (documents_fts) VALUES ('rebuild');
+"""),
+)
+
+
+# Set once init_db() has brought the schema up to date in this process
+_schema_ready = False
+
+
+def init_db():
+    """
+    Initialize database schema with all tables.
+
+    The schema version lives in PRAGMA user_version, so a database that is
+    already current costs a single PRAGMA read, and repeat calls in the same
+    process cost nothing. Otherwise the DDL, pending data migrations and the
+    new version stamp run as one executescript() inside a single transaction.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+
+    with write_connection() as conn:
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if current_version >= SCHEMA_VERSION:
+            _schema_ready = True
+            return
+
+        script = ["BEGIN;", _SCHEMA_SQL]
+        script.extend(sql for version, sql in _MIGRATIONS if current_version < version)
+        script.append(f"PRAGMA user_version = {SCHEMA_VERSION};")
+        script.append("COMMIT;")
+        # Fresh planner statistics for any indexes this upgrade added
+        script.append("ANALYZE;")
+
+        # A failure leaves the script's transaction open; write_connection rolls it back
+        conn.executescript("\n".join(script))
+    _schema_ready = True
+
+
+def add_message(role: str, content: str, chat_id: int = None, token_count: int = None) -> int:
     """Add a message to conversation history."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO messages (role, content, chat_id) VALUES (?, ?, ?)",
-        (role, content, chat_id)
-    )
-    conn.commit()
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO messages (role, content, chat_id, token_count) VALUES (?, ?, ?, ?)",
+            (role, content, chat_id, token_count)
+        )
     msg_id = cursor.lastrowid
-    conn.close()
     return msg_id
 
 
 def get_recent_messages(limit: int = 20, chat_id: int = None) -> List[Dict[str, Any]]:
     """Get recent messages for context."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    if chat_id:
-        cursor.execute(
-            "SELECT role, content FROM messages WHERE chat_id = ? ORDER BY id DESC LIMIT ?",
-            (chat_id, limit)
-        )
-    else:
-        cursor.execute(
-            "SELECT role, content FROM messages ORDER BY id DESC LIMIT ?",
-            (limit,)
-        )
+    with read_connection() as conn:
+        cursor = conn.cursor()
+
+        if chat_id:
+            cursor.execute(
+                "SELECT role, content FROM messages WHERE chat_id = ? ORDER BY id DESC LIMIT ?",
+                (chat_id, limit)
+            )
+        else:
+            cursor.execute(
+                "SELECT role, content FROM messages ORDER BY id DESC LIMIT ?",
+                (limit,)
+            )
 
-    rows = cursor.fetchall()
-    conn.close()
+        rows = cursor.fetchall()
 
-    # Reverse to get chronological order
-    return [{"role": row["role"], "content": row["content"]} for row in reversed(rows)]
+        # Reverse to get chronological order
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
 
 
 def get_state(key: str, default: Any = None) -> Any:
     """Get agent state value."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM agent_state WHERE key = ?", (key,))
-    row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM agent_state WHERE key = ?", (key,))
+        row = cursor.fetchone()
 
-    if row is None:
-        return default
+        if row is None:
+            return default
 
-    try:
-        return json.loads(row["value"])
-    except json.JSONDecodeError:
-        return row["value"]
+        value = row["value"]
+        if isinstance(value, bytes):
+            if msgpack is None:
+                raise RuntimeError(f"agent_state '{key}' is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(value, raw=False)
 
+        try:
+            return json_loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return value
 
-def set_state(key: str, value: Any):
-    """Set agent state value."""
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    value_str = json.dumps(value) if not isinstance(value, str) else value
+def set_state(key: str, value: Any):
+    """
+    Set agent state value.
 
-    cursor.execute("""
-        INSERT INTO agent_state (key, value, updated_at)
-        VALUES (?, ?, CURRENT_TIMESTAMP)
-        ON CONFLICT(key) DO UPDATE SET value = ?, updated_at = CURRENT_TIMESTAMP
-    """, (key, value_str, value_str))
+    Strings are stored as-is; other values are msgpack-encoded when msgpack
+    is installed, otherwise JSON text.
+    """
+    if isinstance(value, str):
+        stored = value
+    elif msgpack is not None:
+        stored = msgpack.packb(value, use_bin_type=True)
+    else:
+        stored = json_dumps(value)
 
-    conn.commit()
-    conn.close()
+    with write_connection() as conn:
+        conn.execute("""
+            INSERT INTO agent_state (key, value, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+        """, (key, stored))
 
 
 def clear_messages():
     """Clear all messages (for testing)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM messages")
-    conn.commit()
-    conn.close()
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM messages")
 
 
 # ============================================
 # PROJECT CRUD
 # ============================================
 
+# Columns that update_project() may set
+PROJECT_UPDATABLE_FIELDS = frozenset({
+    "name", "description", "status", "current_constraint", "constraint_type",
+    "estimated_days", "buffer_days", "buffer_consumed_percent", "progress_percent",
+    "wip_limit", "parent_project_id", "priority", "due_date", "started_at", "completed_at",
+})
+
 def create_project(
     name: str,
     description: str = None,
@@ -653,93 +1147,84 @@ def create_project(
     priority: int = 50
 ) -> Dict[str, Any]:
     """Create a new project."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        cursor = conn.cursor()
 
-    project_id = generate_id()
-    cursor.execute("""
-        INSERT INTO projects (
-            id, name, description, estimated_days, buffer_days,
+        project_id = generate_ordered_id()
+        cursor.execute("""
+            INSERT INTO projects (
+                id, name, description, estimated_days, buffer_days,
+                due_date, parent_project_id, wip_limit, priority
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
+        """, (
+            project_id, name, description, estimated_days, buffer_days,
             due_date, parent_project_id, wip_limit, priority
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        project_id, name, description, estimated_days, buffer_days,
-        due_date, parent_project_id, wip_limit, priority
-    ))
+        ))
+        row = cursor.fetchone()
 
-    conn.commit()
-    conn.close()
-
-    return get_project(project_id)
+    return dict(row)
 
 
 def get_project(project_id: str) -> Optional[Dict[str, Any]]:
     """Get a project by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM projects WHERE id = ?", (project_id,))
-    row = cursor.fetchone()
-    conn.close()
-
-    if row:
-        return dict(row)
-    return None
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_PROJECT, (project_id,)).fetchone()
+    return dict(row) if row else None
 
 
 def list_projects(
     status: str = None,
     parent_id: str = None,
-    limit: int = 100
-) -> List[Dict[str, Any]]:
-    """List projects with optional filters."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    limit: int = 100,
+    columnar: bool = False
+) -> Union[List[Dict[str, Any]], Dict[str, List[Any]]]:
+    """
+    List projects with optional filters.
 
-    query = "SELECT * FROM projects WHERE 1=1"
-    params = []
+    With columnar=True, returns {column: [values...]} instead of row dicts.
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
 
-    if status:
-        query += " AND status = ?"
-        params.append(status)
-    if parent_id is not None:
-        if parent_id == "":
-            query += " AND parent_project_id IS NULL"
-        else:
-            query += " AND parent_project_id = ?"
-            params.append(parent_id)
+        query = "SELECT * FROM projects WHERE 1=1"
+        params = []
 
-    query += " ORDER BY priority DESC, created_at DESC LIMIT ?"
-    params.append(limit)
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if parent_id is not None:
+            if parent_id == "":
+                query += " AND parent_project_id IS NULL"
+            else:
+                query += " AND parent_project_id = ?"
+                params.append(parent_id)
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
+        query += " ORDER BY priority DESC, created_at DESC LIMIT ?"
+        params.append(limit)
 
-    return [dict(row) for row in rows]
+        cursor.execute(query, params)
+        if columnar:
+            return _fetch_columns(cursor)
+        return fetch_dicts(cursor)
 
 
 def update_project(project_id: str, **kwargs) -> Optional[Dict[str, Any]]:
-    """Update a project."""
+    """
+    Update a project.
+
+    Raises:
+        ValueError: If a field is not in PROJECT_UPDATABLE_FIELDS
+    """
     if not kwargs:
         return get_project(project_id)
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Build SET clause
-    sets = []
-    params = []
-    for key, value in kwargs.items():
-        sets.append(f"{key} = ?")
-        params.append(value)
-
-    sets.append("updated_at = CURRENT_TIMESTAMP")
+    columns = _update_columns(kwargs, PROJECT_UPDATABLE_FIELDS, "project")
+    params = [kwargs[column] for column in columns]
     params.append(project_id)
 
-    query = f"UPDATE projects SET {', '.join(sets)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-    conn.close()
+    with write_connection() as conn:
+        conn.execute(_update_sql("projects", columns), params)
 
     return get_project(project_id)
 
@@ -748,6 +1233,14 @@ def update_project(project_id: str, **kwargs) -> Optional[Dict[str, Any]]:
 # TASK CRUD
 # ============================================
 
+# Columns that update_task() may set
+TASK_UPDATABLE_FIELDS = frozenset({
+    "project_id", "parent_task_id", "title", "description", "status",
+    "estimated_hours", "actual_hours", "is_critical_chain", "critical_chain_sequence",
+    "planned_start", "actual_start", "planned_end", "actual_end", "due_date",
+    "priority", "sort_order", "recurring_schedule_id",
+})
+
 def create_task(
     project_id: str,
     title: str,
@@ -758,96 +1251,144 @@ def create_task(
     priority: int = 50
 ) -> Dict[str, Any]:
     """Create a new task."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        cursor = conn.cursor()
 
-    task_id = generate_id()
-    cursor.execute("""
-        INSERT INTO tasks (
-            id, project_id, parent_task_id, title, description,
+        task_id = generate_ordered_id()
+        cursor.execute("""
+            INSERT INTO tasks (
+                id, project_id, parent_task_id, title, description,
+                estimated_hours, due_date, priority
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
+        """, (
+            task_id, project_id, parent_task_id, title, description,
             estimated_hours, due_date, priority
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        task_id, project_id, parent_task_id, title, description,
-        estimated_hours, due_date, priority
-    ))
+        ))
+        row = cursor.fetchone()
 
-    conn.commit()
-    conn.close()
+    return dict(row)
 
-    return get_task(task_id)
+
+def create_tasks(project_id: str, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Create several tasks for a project in a single transaction.
+
+    Args:
+        project_id: Project the tasks belong to
+        tasks: Task dicts with at least 'title' (sort_order defaults to list position)
+
+    Returns:
+        Created task dicts, in the order given
+    """
+    if not tasks:
+        return []
+
+    rows = [
+        (
+            generate_ordered_id(), project_id, task.get("parent_task_id"), task.get("title"),
+            task.get("description"), task.get("estimated_hours"), task.get("due_date"),
+            task.get("priority", 50), task.get("sort_order", i)
+        )
+        for i, task in enumerate(tasks)
+    ]
+
+    with write_connection() as conn:
+        conn.executemany("""
+            INSERT INTO tasks (
+                id, project_id, parent_task_id, title, description,
+                estimated_hours, due_date, priority, sort_order
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    by_id = get_tasks_by_ids([row[0] for row in rows])
+    return [by_id[row[0]] for row in rows]
 
 
 def get_task(task_id: str) -> Optional[Dict[str, Any]]:
     """Get a task by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE id = ?", (task_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_TASK, (task_id,)).fetchone()
+    return dict(row) if row else None
 
-    if row:
-        return dict(row)
-    return None
 
+def get_tasks_by_ids(task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Get many tasks in one query.
 
-def list_tasks(
-    project_id: str = None,
-    status: str = None,
-    parent_task_id: str = None,
-    limit: int = 100
-) -> List[Dict[str, Any]]:
-    """List tasks with optional filters."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    Args:
+        task_ids: Task IDs (passed as one JSON array, so any count is fine)
 
-    query = "SELECT * FROM tasks WHERE 1=1"
-    params = []
+    Returns:
+        Dict of task_id -> task dict (missing IDs are omitted)
+    """
+    if not task_ids:
+        return {}
 
-    if project_id:
-        query += " AND project_id = ?"
-        params.append(project_id)
-    if status:
-        query += " AND status = ?"
-        params.append(status)
-    if parent_task_id is not None:
-        if parent_task_id == "":
-            query += " AND parent_task_id IS NULL"
-        else:
-            query += " AND parent_task_id = ?"
-            params.append(parent_task_id)
+    with read_connection() as conn:
+        cursor = conn.execute(
+            "SELECT * FROM tasks WHERE id IN (SELECT value FROM json_each(?))",
+            (json_dumps(list(task_ids)),)
+        )
+        return {row["id"]: dict(row) for row in cursor.fetchall()}
 
-    query += " ORDER BY sort_order, priority DESC, created_at LIMIT ?"
-    params.append(limit)
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
+def list_tasks(
+    project_id: str = None,
+    status: str = None,
+    parent_task_id: str = None,
+    limit: int = 100,
+    columnar: bool = False
+) -> Union[List[Dict[str, Any]], Dict[str, List[Any]]]:
+    """
+    List tasks with optional filters.
 
-    return [dict(row) for row in rows]
+    With columnar=True, returns {column: [values...]} instead of row dicts.
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+
+        query = "SELECT * FROM tasks WHERE 1=1"
+        params = []
+
+        if project_id:
+            query += " AND project_id = ?"
+            params.append(project_id)
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if parent_task_id is not None:
+            if parent_task_id == "":
+                query += " AND parent_task_id IS NULL"
+            else:
+                query += " AND parent_task_id = ?"
+                params.append(parent_task_id)
+
+        query += " ORDER BY sort_order, priority DESC, created_at LIMIT ?"
+        params.append(limit)
+
+        cursor.execute(query, params)
+        if columnar:
+            return _fetch_columns(cursor)
+        return fetch_dicts(cursor)
 
 
 def update_task(task_id: str, **kwargs) -> Optional[Dict[str, Any]]:
-    """Update a task."""
+    """
+    Update a task.
+
+    Raises:
+        ValueError: If a field is not in TASK_UPDATABLE_FIELDS
+    """
     if not kwargs:
         return get_task(task_id)
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    sets = []
-    params = []
-    for key, value in kwargs.items():
-        sets.append(f"{key} = ?")
-        params.append(value)
-
-    sets.append("updated_at = CURRENT_TIMESTAMP")
+    columns = _update_columns(kwargs, TASK_UPDATABLE_FIELDS, "task")
+    params = [kwargs[column] for column in columns]
     params.append(task_id)
 
-    query = f"UPDATE tasks SET {', '.join(sets)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-    conn.close()
+    with write_connection() as conn:
+        conn.execute(_update_sql("tasks", columns), params)
 
     return get_task(task_id)
 
@@ -859,22 +1400,36 @@ def get_active_tasks() -> List[Dict[str, Any]]:
 
 def get_wip_count(project_id: str = None) -> int:
     """Get current WIP count."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with read_connection() as conn:
+        cursor = conn.cursor()
+
+        if project_id:
+            cursor.execute(
+                "SELECT COUNT(*) FROM tasks WHERE project_id = ? AND status = 'in_progress'",
+                (project_id,)
+            )
+        else:
+            cursor.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status = 'in_progress'"
+            )
 
-    if project_id:
-        cursor.execute(
-            "SELECT COUNT(*) as count FROM tasks WHERE project_id = ? AND status = 'in_progress'",
-            (project_id,)
-        )
-    else:
-        cursor.execute(
-            "SELECT COUNT(*) as count FROM tasks WHERE status = 'in_progress'"
-        )
+        return cursor.fetchone()[0]
 
-    row = cursor.fetchone()
-    conn.close()
-    return row["count"]
+
+def get_wip_counts() -> Dict[str, int]:
+    """
+    Get WIP counts for every project in one grouped query.
+
+    Returns:
+        Dict of project_id -> in-progress task count (projects with no WIP omitted)
+    """
+    with read_connection() as conn:
+        cursor = conn.execute("""
+            SELECT project_id, COUNT(*) as count FROM tasks
+            WHERE status = 'in_progress'
+            GROUP BY project_id
+        """)
+        return {row["project_id"]: row["count"] for row in cursor.fetchall()}
 
 
 # ============================================
@@ -887,60 +1442,90 @@ def add_full_kit_item(
     requirement_type: str = 'other'
 ) -> Dict[str, Any]:
     """Add a prerequisite to task's full kit."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        item_id = generate_id()
+        conn.execute(_SQL_INSERT_KIT_ITEM, (item_id, task_id, requirement_type, description))
 
-    item_id = generate_id()
-    cursor.execute("""
-        INSERT INTO task_full_kit (id, task_id, requirement_type, description)
-        VALUES (?, ?, ?, ?)
-    """, (item_id, task_id, requirement_type, description))
+    return {"id": item_id, "task_id": task_id, "description": description, "is_satisfied": False}
 
-    conn.commit()
-    conn.close()
 
-    return {"id": item_id, "task_id": task_id, "description": description, "is_satisfied": False}
+def add_full_kit_items(task_id: str, items: List[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Add several prerequisites to a task's full kit in one transaction.
+
+    Args:
+        task_id: Task ID
+        items: Descriptions, or dicts with 'description' and optional 'type'
+
+    Returns:
+        List of created kit item dicts, in input order
+    """
+    rows = []
+    for item in items:
+        if isinstance(item, str):
+            rows.append((generate_id(), task_id, 'other', item))
+        else:
+            rows.append((generate_id(), task_id, item.get("type", "other"), item.get("description")))
+
+    if rows:
+        with write_connection() as conn:
+            conn.executemany(_SQL_INSERT_KIT_ITEM, rows)
+
+    return [
+        {"id": row[0], "task_id": task_id, "description": row[3], "is_satisfied": False}
+        for row in rows
+    ]
 
 
 def get_full_kit(task_id: str) -> List[Dict[str, Any]]:
     """Get full kit items for a task."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM task_full_kit WHERE task_id = ? ORDER BY created_at",
-        (task_id,)
-    )
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    with read_connection() as conn:
+        return fetch_dicts(conn.execute(_SQL_GET_FULL_KIT, (task_id,)))
+
+
+def get_full_kit_for_tasks(task_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Get full kit items for many tasks in one query.
+
+    Args:
+        task_ids: Task IDs
+
+    Returns:
+        Dict of task_id -> list of kit item dicts (tasks without items map to [])
+    """
+    kits: Dict[str, List[Dict[str, Any]]] = {task_id: [] for task_id in task_ids}
+    if not kits:
+        return kits
+
+    with read_connection() as conn:
+        cursor = conn.execute("""
+            SELECT * FROM task_full_kit
+            WHERE task_id IN (SELECT value FROM json_each(?))
+            ORDER BY created_at
+        """, (json_dumps(list(kits)),))
+
+        for row in cursor.fetchall():
+            kits[row["task_id"]].append(dict(row))
+        return kits
 
 
 def mark_kit_item_satisfied(item_id: str, satisfied: bool = True) -> bool:
     """Mark a full kit item as satisfied or not."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE task_full_kit
-        SET is_satisfied = ?, satisfied_at = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE NULL END
-        WHERE id = ?
-    """, (1 if satisfied else 0, satisfied, item_id))
-    conn.commit()
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE task_full_kit
+            SET is_satisfied = ?, satisfied_at = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE NULL END
+            WHERE id = ?
+        """, (1 if satisfied else 0, satisfied, item_id))
     affected = cursor.rowcount
-    conn.close()
     return affected > 0
 
 
 def is_full_kit_complete(task_id: str) -> bool:
     """Check if all full kit items are satisfied."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT COUNT(*) as count FROM task_full_kit WHERE task_id = ? AND is_satisfied = 0",
-        (task_id,)
-    )
-    row = cursor.fetchone()
-    conn.close()
-    return row["count"] == 0
+    with read_connection() as conn:
+        return bool(conn.execute(_SQL_KIT_COMPLETE, (task_id,)).fetchone()[0])
 
 
 # ============================================
@@ -956,29 +1541,22 @@ def create_blocker(
     watch_pattern: str = None
 ) -> Dict[str, Any]:
     """Create a blocker."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        blocker_id = generate_id()
+        row = conn.execute("""
+            INSERT INTO blockers (
+                id, task_id, project_id, blocker_type, description, waiting_on, watch_pattern
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
+        """, (blocker_id, task_id, project_id, blocker_type, description, waiting_on, watch_pattern)).fetchone()
 
-    blocker_id = generate_id()
-    cursor.execute("""
-        INSERT INTO blockers (
-            id, task_id, project_id, blocker_type, description, waiting_on, watch_pattern
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (blocker_id, task_id, project_id, blocker_type, description, waiting_on, watch_pattern))
-
-    conn.commit()
-    conn.close()
-
-    return get_blocker(blocker_id)
+    return dict(row)
 
 
 def get_blocker(blocker_id: str) -> Optional[Dict[str, Any]]:
     """Get a blocker by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM blockers WHERE id = ?", (blocker_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_BLOCKER, (blocker_id,)).fetchone()
     return dict(row) if row else None
 
 
@@ -988,41 +1566,33 @@ def list_blockers(
     project_id: str = None
 ) -> List[Dict[str, Any]]:
     """List blockers."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM blockers WHERE 1=1"
+    conditions = []
     params = []
 
     if active_only:
-        query += " AND resolved_at IS NULL"
+        conditions.append("resolved_at IS NULL")
     if task_id:
-        query += " AND task_id = ?"
+        conditions.append("task_id = ?")
         params.append(task_id)
     if project_id:
-        query += " AND project_id = ?"
+        conditions.append("project_id = ?")
         params.append(project_id)
 
-    query += " ORDER BY created_at DESC"
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [dict(row) for row in rows]
+    query = _filtered_sql("blockers", tuple(conditions), "ORDER BY created_at DESC")
+    with read_connection() as conn:
+        return fetch_dicts(conn.execute(query, params))
 
 
 def resolve_blocker(blocker_id: str, resolved_by: str = None) -> bool:
     """Resolve a blocker."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE blockers
-        SET resolved_at = CURRENT_TIMESTAMP, resolved_by = ?
-        WHERE id = ?
-    """, (resolved_by, blocker_id))
-    conn.commit()
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE blockers
+            SET resolved_at = CURRENT_TIMESTAMP, resolved_by = ?
+            WHERE id = ?
+        """, (resolved_by, blocker_id))
     affected = cursor.rowcount
-    conn.close()
     return affected > 0
 
 
@@ -1030,7 +1600,24 @@ def resolve_blocker(blocker_id: str, resolved_by: str = None) -> bool:
 # DOCUMENTS
 # ============================================
 
-def create_document(
+# Bumped after every document write in this process, so callers can key
+# read caches on it (see documents_version)
+_documents_version = 0
+
+
+def documents_version() -> int:
+    """Counter that changes whenever this process creates, updates or deletes a document."""
+    return _documents_version
+
+
+def _documents_changed():
+    """Invalidate document read caches (call after the write is done)."""
+    global _documents_version
+    _documents_version += 1
+
+
+def _document_row(
+    doc_id: str,
     filename: str,
     file_path: str = None,
     project_id: str = None,
@@ -1038,41 +1625,90 @@ def create_document(
     document_type: str = 'other',
     content_text: str = None,
     **metadata
-) -> Dict[str, Any]:
-    """Create a document record."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    doc_id = generate_id()
-    cursor.execute("""
-        INSERT INTO documents (
-            id, filename, file_path, project_id, task_id, document_type,
-            content_text, vendor, amount, transaction_date, category, tags, notes
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+) -> Tuple:
+    """Parameter tuple for _SQL_INSERT_DOCUMENT."""
+    return (
         doc_id, filename, file_path, project_id, task_id, document_type,
         content_text,
+        metadata.get('file_type'),
+        metadata.get('file_size_bytes'),
+        metadata.get('file_hash'),
         metadata.get('vendor'),
         metadata.get('amount'),
         metadata.get('transaction_date'),
         metadata.get('category'),
-        json.dumps(metadata.get('tags')) if metadata.get('tags') else None,
+        json_dumps(metadata.get('tags')) if metadata.get('tags') else None,
         metadata.get('notes')
-    ))
+    )
 
-    conn.commit()
-    conn.close()
 
-    return get_document(doc_id)
+def create_document(
+    filename: str,
+    file_path: str = None,
+    project_id: str = None,
+    task_id: str = None,
+    document_type: str = 'other',
+    content_text: str = None,
+    **metadata
+) -> Dict[str, Any]:
+    """Create a document record."""
+    with write_connection() as conn:
+        row = conn.execute(_SQL_INSERT_DOCUMENT + " RETURNING *", _document_row(
+            generate_id(), filename, file_path, project_id, task_id, document_type,
+            content_text, **metadata
+        )).fetchone()
+
+    _documents_changed()
+    return dict(row)
+
+
+def create_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Create several document records in one transaction.
+
+    Args:
+        documents: Dicts of create_document keyword arguments ('filename' required)
+
+    Returns:
+        List of created document dicts, in input order
+    """
+    rows = [_document_row(generate_id(), **doc) for doc in documents]
+    if not rows:
+        return []
+
+    doc_ids = [row[0] for row in rows]
+    with write_connection() as conn:
+        conn.executemany(_SQL_INSERT_DOCUMENT, rows)
+        cursor = conn.execute(
+            "SELECT * FROM documents WHERE id IN (SELECT value FROM json_each(?))",
+            (json_dumps(doc_ids),)
+        )
+        by_id = {row["id"]: dict(row) for row in cursor.fetchall()}
+
+    _documents_changed()
+    return [by_id[doc_id] for doc_id in doc_ids]
 
 
 def get_document(doc_id: str) -> Optional[Dict[str, Any]]:
     """Get a document by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM documents WHERE id = ?", (doc_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_DOCUMENT, (doc_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def get_document_by_hash(file_hash: str, project_id: str = None) -> Optional[Dict[str, Any]]:
+    """
+    Find an already-stored document with the same content.
+
+    Args:
+        file_hash: SHA-256 hex digest of the file
+        project_id: Project the document belongs to (None for unassigned)
+
+    Returns:
+        The earliest matching document dict, or None
+    """
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_DOCUMENT_BY_HASH, (file_hash, project_id)).fetchone()
     return dict(row) if row else None
 
 
@@ -1082,27 +1718,20 @@ def list_documents(
     limit: int = 100
 ) -> List[Dict[str, Any]]:
     """List documents."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM documents WHERE 1=1"
+    conditions = []
     params = []
 
     if project_id:
-        query += " AND project_id = ?"
+        conditions.append("project_id = ?")
         params.append(project_id)
     if document_type:
-        query += " AND document_type = ?"
+        conditions.append("document_type = ?")
         params.append(document_type)
-
-    query += " ORDER BY created_at DESC LIMIT ?"
     params.append(limit)
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [dict(row) for row in rows]
+    query = _filtered_sql("documents", tuple(conditions), "ORDER BY created_at DESC LIMIT ?")
+    with read_connection() as conn:
+        return fetch_dicts(conn.execute(query, params))
 
 
 def search_documents(
@@ -1122,7 +1751,8 @@ def search_documents(
 
     Args:
         project_id: Filter by project
-        query: Text search in filename, content_text, vendor, notes
+        query: Text search in filename, content_text, vendor, notes, summary
+            (case-insensitive substring; results ranked by BM25 relevance)
         document_type: Filter by type (receipt, invoice, etc.)
         vendor: Filter by vendor (partial match)
         category: Filter by category
@@ -1135,63 +1765,65 @@ def search_documents(
     Returns:
         List of matching document dicts
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    sql = "SELECT * FROM documents WHERE 1=1"
+    conditions = []
     params = []
 
     if project_id:
-        sql += " AND project_id = ?"
+        conditions.append("d.project_id = ?")
         params.append(project_id)
 
     if document_type:
-        sql += " AND document_type = ?"
+        conditions.append("d.document_type = ?")
         params.append(document_type)
 
     if vendor:
-        sql += " AND vendor LIKE ?"
+        conditions.append("d.vendor LIKE ?")
         params.append(f"%{vendor}%")
 
     if category:
-        sql += " AND category = ?"
+        conditions.append("d.category = ?")
         params.append(category)
 
     if date_from:
-        sql += " AND transaction_date >= ?"
+        conditions.append("d.transaction_date >= ?")
         params.append(date_from)
 
     if date_to:
-        sql += " AND transaction_date <= ?"
+        conditions.append("d.transaction_date <= ?")
         params.append(date_to)
 
     if amount_min is not None:
-        sql += " AND amount >= ?"
+        conditions.append("d.amount >= ?")
         params.append(amount_min)
 
     if amount_max is not None:
-        sql += " AND amount <= ?"
+        conditions.append("d.amount <= ?")
         params.append(amount_max)
 
-    if query:
-        sql += """ AND (
-            filename LIKE ? OR
-            content_text LIKE ? OR
-            vendor LIKE ? OR
-            notes LIKE ? OR
-            content_summary LIKE ?
-        )"""
-        q = f"%{query}%"
-        params.extend([q, q, q, q, q])
-
-    sql += " ORDER BY transaction_date DESC, created_at DESC LIMIT ?"
+    if query and len(query) >= 3:
+        # Trigram index: the query as one quoted phrase is a substring match
+        sql = "SELECT d.* FROM documents_fts JOIN documents d ON d.search_rowid = documents_fts.rowid"
+        conditions.insert(0, "documents_fts MATCH ?")
+        params.insert(0, '"' + query.replace('"', '""') + '"')
+        order = "ORDER BY documents_fts.rank"
+    else:
+        sql = "SELECT d.* FROM documents d"
+        if query:
+            # Shorter than one trigram, so the index can't help
+            conditions.append(
+                "(d.filename LIKE ? OR d.content_text LIKE ? OR d.vendor LIKE ? "
+                "OR d.notes LIKE ? OR d.content_summary LIKE ?)"
+            )
+            params.extend([f"%{query}%"] * 5)
+        order = "ORDER BY d.transaction_date DESC, d.created_at DESC"
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" {order} LIMIT ?"
     params.append(limit)
 
-    cursor.execute(sql, params)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [dict(row) for row in rows]
+    with read_connection() as conn:
+        return fetch_dicts(conn.execute(sql, params))
 
 
 def update_document(doc_id: str, **kwargs) -> Optional[Dict[str, Any]]:
@@ -1208,27 +1840,26 @@ def update_document(doc_id: str, **kwargs) -> Optional[Dict[str, Any]]:
     if not kwargs:
         return get_document(doc_id)
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        cursor = conn.cursor()
 
-    # Handle tags specially - convert list to JSON
-    if 'tags' in kwargs and isinstance(kwargs['tags'], list):
-        kwargs['tags'] = json.dumps(kwargs['tags'])
+        # Handle tags specially - convert list to JSON
+        if 'tags' in kwargs and isinstance(kwargs['tags'], list):
+            kwargs['tags'] = json_dumps(kwargs['tags'])
 
-    sets = []
-    params = []
-    for key, value in kwargs.items():
-        sets.append(f"{key} = ?")
-        params.append(value)
+        sets = []
+        params = []
+        for key, value in kwargs.items():
+            sets.append(f"{key} = ?")
+            params.append(value)
 
-    sets.append("updated_at = CURRENT_TIMESTAMP")
-    params.append(doc_id)
+        sets.append("updated_at = CURRENT_TIMESTAMP")
+        params.append(doc_id)
 
-    query = f"UPDATE documents SET {', '.join(sets)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-    conn.close()
+        query = f"UPDATE documents SET {', '.join(sets)} WHERE id = ?"
+        cursor.execute(query, params)
 
+    _documents_changed()
     return get_document(doc_id)
 
 
@@ -1242,69 +1873,141 @@ def delete_document(doc_id: str) -> bool:
     Returns:
         True if deleted, False if not found
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        cursor = conn.cursor()
 
-    # Delete associated chunks first (cascade should handle, but be explicit)
-    cursor.execute("DELETE FROM document_chunks WHERE document_id = ?", (doc_id,))
+        # Delete associated chunks first (cascade should handle, but be explicit)
+        cursor.execute("DELETE FROM document_chunks WHERE document_id = ?", (doc_id,))
 
-    # Delete document
-    cursor.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
-    affected = cursor.rowcount
-
-    conn.commit()
-    conn.close()
+        # Delete document
+        cursor.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        affected = cursor.rowcount
 
+    if affected:
+        _documents_changed()
     return affected > 0
 
 
-def get_document_stats(project_id: str = None) -> Dict[str, Any]:
+def encode_embedding(vector: Sequence[float]) -> bytes:
+    """Pack an embedding as little-endian float16 (2 bytes per dimension)."""
+    return struct.pack(f"<{len(vector)}e", *vector)
+
+
+def decode_embedding(blob: bytes) -> List[float]:
+    """Unpack an embedding stored by encode_embedding()."""
+    return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+
+
+def save_document_chunk(
+    document_id: str,
+    chunk_index: int,
+    chunk_text: str,
+    embedding: Sequence[float] = None,
+    embedding_model: str = None,
+    chunk_tokens: int = None
+) -> Dict[str, Any]:
     """
-    Get document statistics.
+    Create or replace a document chunk.
 
     Args:
-        project_id: Optional project filter
+        document_id: Parent document ID
+        chunk_index: Position of the chunk within the document
+        chunk_text: Chunk text
+        embedding: Optional embedding vector (stored as float16)
+        embedding_model: Model that produced the embedding
+        chunk_tokens: Token count of the chunk
 
     Returns:
-        Stats dict with counts by type, total amount, etc.
+        Chunk dict (embedding omitted)
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    chunk_id = generate_id()
+    blob = encode_embedding(embedding) if embedding is not None else None
 
-    # Base filter
-    where = "WHERE 1=1"
-    params = []
-    if project_id:
-        where += " AND project_id = ?"
-        params.append(project_id)
+    with write_connection() as conn:
+        conn.execute("""
+            INSERT INTO document_chunks (
+                id, document_id, chunk_index, chunk_text, chunk_tokens, embedding, embedding_model
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(document_id, chunk_index) DO UPDATE SET
+                chunk_text = excluded.chunk_text,
+                chunk_tokens = excluded.chunk_tokens,
+                embedding = excluded.embedding,
+                embedding_model = excluded.embedding_model
+        """, (chunk_id, document_id, chunk_index, chunk_text, chunk_tokens, blob, embedding_model))
 
-    # Total count
-    cursor.execute(f"SELECT COUNT(*) as count FROM documents {where}", params)
-    total = cursor.fetchone()["count"]
+    return {"document_id": document_id, "chunk_index": chunk_index, "chunk_tokens": chunk_tokens}
 
-    # Count by type
-    cursor.execute(f"""
-        SELECT document_type, COUNT(*) as count
-        FROM documents {where}
-        GROUP BY document_type
-    """, params)
-    by_type = {row["document_type"]: row["count"] for row in cursor.fetchall()}
 
-    # Sum amounts by type (for receipts/invoices)
-    cursor.execute(f"""
-        SELECT document_type, SUM(amount) as total, currency
-        FROM documents {where} AND amount IS NOT NULL
-        GROUP BY document_type, currency
-    """, params)
-    amounts = [dict(row) for row in cursor.fetchall()]
+def get_document_chunks(document_id: str) -> List[Dict[str, Any]]:
+    """
+    Get a document's chunks in order, with embeddings decoded to float lists.
 
-    conn.close()
+    Args:
+        document_id: Document ID
 
-    return {
-        "total_documents": total,
-        "by_type": by_type,
-        "amounts": amounts
-    }
+    Returns:
+        List of chunk dicts
+    """
+    with read_connection() as conn:
+        cursor = conn.execute(
+            "SELECT * FROM document_chunks WHERE document_id = ? ORDER BY chunk_index",
+            (document_id,)
+        )
+
+        chunks = []
+        for row in cursor.fetchall():
+            chunk = dict(row)
+            if chunk["embedding"] is not None:
+                chunk["embedding"] = decode_embedding(chunk["embedding"])
+            chunks.append(chunk)
+        return chunks
+
+
+def get_document_stats(project_id: str = None) -> Dict[str, Any]:
+    """
+    Get document statistics.
+
+    Args:
+        project_id: Optional project filter
+
+    Returns:
+        Stats dict with counts by type, total amount, etc.
+    """
+    with read_connection() as conn:
+        cursor = conn.cursor()
+
+        # Base filter
+        where = "WHERE 1=1"
+        params = []
+        if project_id:
+            where += " AND project_id = ?"
+            params.append(project_id)
+
+        # Total count
+        cursor.execute(f"SELECT COUNT(*) FROM documents {where}", params)
+        total = cursor.fetchone()[0]
+
+        # Count by type
+        cursor.execute(f"""
+            SELECT document_type, COUNT(*) as count
+            FROM documents {where}
+            GROUP BY document_type
+        """, params)
+        by_type = {row["document_type"]: row["count"] for row in cursor.fetchall()}
+
+        # Sum amounts by type (for receipts/invoices)
+        cursor.execute(f"""
+            SELECT document_type, SUM(amount) as total, currency
+            FROM documents {where} AND amount IS NOT NULL
+            GROUP BY document_type, currency
+        """, params)
+        amounts = [dict(row) for row in cursor.fetchall()]
+
+        return {
+            "total_documents": total,
+            "by_type": by_type,
+            "amounts": amounts
+        }
 
 
 # ============================================
@@ -1320,62 +2023,52 @@ def create_recurring_schedule(
     **kwargs
 ) -> Dict[str, Any]:
     """Create a recurring schedule."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    schedule_id = generate_id()
-    cursor.execute("""
-        INSERT INTO recurring_schedules (
-            id, name, task_title_template, frequency, start_date, project_id,
-            description, cron_pattern, day_of_week, day_of_month, month_of_year,
-            time_of_day, task_description_template, estimated_hours, priority,
-            expected_document_type
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        schedule_id, name, task_title_template, frequency, start_date, project_id,
-        kwargs.get('description'),
-        kwargs.get('cron_pattern'),
-        kwargs.get('day_of_week'),
-        kwargs.get('day_of_month'),
-        kwargs.get('month_of_year'),
-        kwargs.get('time_of_day', '09:00'),
-        kwargs.get('task_description_template'),
-        kwargs.get('estimated_hours'),
-        kwargs.get('priority', 3),
-        kwargs.get('expected_document_type')
-    ))
-
-    conn.commit()
-    conn.close()
-
-    return get_recurring_schedule(schedule_id)
+    with write_connection() as conn:
+        schedule_id = generate_id()
+        row = conn.execute("""
+            INSERT INTO recurring_schedules (
+                id, name, task_title_template, frequency, start_date, project_id,
+                description, cron_pattern, day_of_week, day_of_month, month_of_year,
+                time_of_day, task_description_template, estimated_hours, priority,
+                expected_document_type
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING *
+        """, (
+            schedule_id, name, task_title_template, frequency, start_date, project_id,
+            kwargs.get('description'),
+            kwargs.get('cron_pattern'),
+            kwargs.get('day_of_week'),
+            kwargs.get('day_of_month'),
+            kwargs.get('month_of_year'),
+            kwargs.get('time_of_day', '09:00'),
+            kwargs.get('task_description_template'),
+            kwargs.get('estimated_hours'),
+            kwargs.get('priority', 3),
+            kwargs.get('expected_document_type')
+        )).fetchone()
+
+    return dict(row)
 
 
 def get_recurring_schedule(schedule_id: str) -> Optional[Dict[str, Any]]:
     """Get a recurring schedule by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM recurring_schedules WHERE id = ?", (schedule_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_SCHEDULE, (schedule_id,)).fetchone()
     return dict(row) if row else None
 
 
 def list_recurring_schedules(active_only: bool = True) -> List[Dict[str, Any]]:
     """List recurring schedules."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM recurring_schedules"
-    if active_only:
-        query += " WHERE is_active = 1"
-    query += " ORDER BY next_due_date"
+    with read_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
+        query = "SELECT * FROM recurring_schedules"
+        if active_only:
+            query += " WHERE is_active = 1"
+        query += " ORDER BY next_due_date"
 
-    return [dict(row) for row in rows]
+        cursor.execute(query)
+        return fetch_dicts(cursor)
 
 
 # ============================================
@@ -1390,56 +2083,118 @@ def queue_notification(
     context: Dict = None
 ) -> Dict[str, Any]:
     """Queue a notification."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        cursor = conn.cursor()
 
-    notif_id = generate_id()
-    cursor.execute("""
-        INSERT INTO notification_queue (id, priority, channel, message, scheduled_for, context)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (notif_id, priority, channel, message, scheduled_for, json.dumps(context) if context else None))
-
-    conn.commit()
-    conn.close()
+        notif_id = generate_id()
+        cursor.execute("""
+            INSERT INTO notification_queue (id, priority, channel, message, scheduled_for, context)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (notif_id, priority, channel, message, scheduled_for, json_dumps(context) if context else None))
 
     return {"id": notif_id, "priority": priority, "message": message}
 
 
+def queue_notifications(notifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Queue several notifications in a single transaction.
+
+    Args:
+        notifications: Dicts with 'message' and optional priority, channel,
+            scheduled_for and context (same defaults as queue_notification)
+
+    Returns:
+        List of queued notification summaries
+    """
+    rows = [
+        (
+            generate_id(),
+            n.get("priority", "P1"),
+            n.get("channel", "telegram"),
+            n["message"],
+            n.get("scheduled_for"),
+            json_dumps(n["context"]) if n.get("context") else None
+        )
+        for n in notifications
+    ]
+
+    if rows:
+        with write_connection() as conn:
+            conn.executemany("""
+                INSERT INTO notification_queue (id, priority, channel, message, scheduled_for, context)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    return [{"id": row[0], "priority": row[1], "message": row[3]} for row in rows]
+
+
 def get_pending_notifications(priority: str = None, channel: str = None) -> List[Dict[str, Any]]:
     """Get pending notifications."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM notification_queue WHERE sent_at IS NULL"
+    conditions = ["sent_at IS NULL"]
     params = []
 
     if priority:
-        query += " AND priority = ?"
+        conditions.append("priority = ?")
         params.append(priority)
     if channel:
-        query += " AND channel = ?"
+        conditions.append("channel = ?")
         params.append(channel)
 
-    query += " ORDER BY priority, scheduled_for, created_at"
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
+    query = _filtered_sql("notification_queue", tuple(conditions), "ORDER BY priority, scheduled_for, created_at")
+    with read_connection() as conn:
+        return fetch_dicts(conn.execute(query, params))
+
+
+def claim_due_notifications(priority: str, due_before: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Take one batch of due notifications and mark them sent in one transaction.
 
-    return [dict(row) for row in rows]
+    Args:
+        priority: Notification priority (e.g. 'P1')
+        due_before: Include rows with scheduled_for <= this timestamp
+        limit: Max notifications to take
+
+    Returns:
+        Claimed notification dicts, oldest scheduled first
+    """
+    with write_connection() as conn:
+        cursor = conn.execute("""
+            SELECT * FROM notification_queue
+            WHERE sent_at IS NULL AND priority = ? AND scheduled_for <= ?
+            ORDER BY scheduled_for, created_at
+            LIMIT ?
+        """, (priority, due_before, limit))
+        rows = [dict(row) for row in cursor.fetchall()]
+
+        if rows:
+            conn.execute(_SQL_MARK_MANY_SENT, (json_dumps([row["id"] for row in rows]),))
+
+    return rows
 
 
 def mark_notification_sent(notif_id: str) -> bool:
     """Mark a notification as sent."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE notification_queue SET sent_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (notif_id,)
-    )
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    with write_connection() as conn:
+        cursor = conn.execute(_SQL_MARK_SENT, (notif_id,))
+    return cursor.rowcount > 0
+
+
+def mark_notifications_sent(notif_ids: List[str]) -> int:
+    """
+    Mark several notifications as sent in a single statement.
+
+    Args:
+        notif_ids: Notification IDs (passed as one JSON array)
+
+    Returns:
+        Number of notifications updated
+    """
+    if not notif_ids:
+        return 0
+
+    with write_connection() as conn:
+        cursor = conn.execute(_SQL_MARK_MANY_SENT, (json_dumps(list(notif_ids)),))
+    return cursor.rowcount
 
 
 # ============================================
@@ -1453,32 +2208,28 @@ def log_context_switch(
     reason: str = None
 ) -> Dict[str, Any]:
     """Log a context switch."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    switch_id = generate_id()
-    cursor.execute("""
-        INSERT INTO context_switches (id, from_task_id, to_task_id, switch_type, reason)
-        VALUES (?, ?, ?, ?, ?)
-    """, (switch_id, from_task_id, to_task_id, switch_type, reason))
+    with write_connection() as conn:
+        cursor = conn.cursor()
 
-    conn.commit()
-    conn.close()
+        switch_id = generate_id()
+        cursor.execute("""
+            INSERT INTO context_switches (id, from_task_id, to_task_id, switch_type, reason)
+            VALUES (?, ?, ?, ?, ?)
+        """, (switch_id, from_task_id, to_task_id, switch_type, reason))
 
     return {"id": switch_id, "from": from_task_id, "to": to_task_id, "type": switch_type}
 
 
 def get_context_switches_today() -> int:
     """Get count of context switches today."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COUNT(*) as count FROM context_switches
-        WHERE date(occurred_at) = date('now')
-    """)
-    row = cursor.fetchone()
-    conn.close()
-    return row["count"]
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        # Half-open range (not date(occurred_at)) so idx_ctxsw_day is usable
+        cursor.execute("""
+            SELECT COUNT(*) FROM context_switches
+            WHERE occurred_at >= date('now') AND occurred_at < date('now', '+1 day')
+        """)
+        return cursor.fetchone()[0]
 
 
 # ============================================
@@ -1492,49 +2243,36 @@ def create_autonomous_action(
     requires_approval: bool = False
 ) -> Dict[str, Any]:
     """Create an autonomous action."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    action_id = generate_id()
-    cursor.execute("""
-        INSERT INTO autonomous_actions (id, action_type, target, context, requires_approval)
-        VALUES (?, ?, ?, ?, ?)
-    """, (action_id, action_type, target, json.dumps(context) if context else None, 1 if requires_approval else 0))
+    with write_connection() as conn:
+        action_id = generate_id()
+        row = conn.execute("""
+            INSERT INTO autonomous_actions (id, action_type, target, context, requires_approval)
+            VALUES (?, ?, ?, ?, ?)
+            RETURNING *
+        """, (action_id, action_type, target, json_dumps(context) if context else None, 1 if requires_approval else 0)).fetchone()
 
-    conn.commit()
-    conn.close()
-
-    return get_autonomous_action(action_id)
+    return dict(row)
 
 
 def get_autonomous_action(action_id: str) -> Optional[Dict[str, Any]]:
     """Get an autonomous action by ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM autonomous_actions WHERE id = ?", (action_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_ACTION, (action_id,)).fetchone()
     return dict(row) if row else None
 
 
 def get_pending_actions(requires_approval: bool = None) -> List[Dict[str, Any]]:
     """Get pending autonomous actions."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM autonomous_actions WHERE status = 'pending'"
+    conditions = ["status = 'pending'"]
     params = []
 
     if requires_approval is not None:
-        query += " AND requires_approval = ?"
+        conditions.append("requires_approval = ?")
         params.append(1 if requires_approval else 0)
 
-    query += " ORDER BY created_at"
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [dict(row) for row in rows]
+    query = _filtered_sql("autonomous_actions", tuple(conditions), "ORDER BY created_at")
+    with read_connection() as conn:
+        return fetch_dicts(conn.execute(query, params))
 
 
 def update_action_status(
@@ -1544,33 +2282,31 @@ def update_action_status(
     error: str = None
 ) -> bool:
     """Update an autonomous action status."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    if status == 'approved':
-        cursor.execute(
-            "UPDATE autonomous_actions SET status = ?, approved_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (status, action_id)
-        )
-    elif status == 'executed':
-        cursor.execute(
-            "UPDATE autonomous_actions SET status = ?, executed_at = CURRENT_TIMESTAMP, result = ? WHERE id = ?",
-            (status, json.dumps(result) if result else None, action_id)
-        )
-    elif status == 'failed':
-        cursor.execute(
-            "UPDATE autonomous_actions SET status = ?, error = ? WHERE id = ?",
-            (status, error, action_id)
-        )
-    else:
-        cursor.execute(
-            "UPDATE autonomous_actions SET status = ? WHERE id = ?",
-            (status, action_id)
-        )
+    with write_connection() as conn:
+        cursor = conn.cursor()
+
+        if status == 'approved':
+            cursor.execute(
+                "UPDATE autonomous_actions SET status = ?, approved_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (status, action_id)
+            )
+        elif status == 'executed':
+            cursor.execute(
+                "UPDATE autonomous_actions SET status = ?, executed_at = CURRENT_TIMESTAMP, result = ? WHERE id = ?",
+                (status, json_dumps(result) if result else None, action_id)
+            )
+        elif status == 'failed':
+            cursor.execute(
+                "UPDATE autonomous_actions SET status = ?, error = ? WHERE id = ?",
+                (status, error, action_id)
+            )
+        else:
+            cursor.execute(
+                "UPDATE autonomous_actions SET status = ? WHERE id = ?",
+                (status, action_id)
+            )
 
-    conn.commit()
     affected = cursor.rowcount
-    conn.close()
     return affected > 0
 
 
@@ -1591,30 +2327,29 @@ def get_tasks_due_within(hours: int, status_not: str = None) -> List[Dict[str, A
     """
     from datetime import timedelta
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    with read_connection() as conn:
+        cursor = conn.cursor()
 
-    cutoff = (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat()
+        cutoff = (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat()
 
-    if status_not:
-        cursor.execute("""
-            SELECT * FROM tasks
-            WHERE due_date IS NOT NULL
-              AND due_date <= ?
-              AND status != ?
-            ORDER BY due_date ASC
-        """, (cutoff, status_not))
-    else:
-        cursor.execute("""
-            SELECT * FROM tasks
-            WHERE due_date IS NOT NULL
-              AND due_date <= ?
-            ORDER BY due_date ASC
-        """, (cutoff,))
+        if status_not:
+            cursor.execute("""
+                SELECT * FROM tasks
+                WHERE due_date IS NOT NULL
+                  AND due_date <= ?
+                  AND status != ?
+                ORDER BY due_date ASC
+            """, (cutoff, status_not))
+        else:
+            cursor.execute("""
+                SELECT * FROM tasks
+                WHERE due_date IS NOT NULL
+                  AND due_date <= ?
+                ORDER BY due_date ASC
+            """, (cutoff,))
 
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return results
+        results = [dict(row) for row in cursor.fetchall()]
+        return results
 
 
 def get_blockers_filtered(resolved: bool = None) -> List[Dict[str, Any]]:
@@ -1627,19 +2362,18 @@ def get_blockers_filtered(resolved: bool = None) -> List[Dict[str, Any]]:
     Returns:
         List of blocker dicts
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    with read_connection() as conn:
+        cursor = conn.cursor()
 
-    if resolved is None:
-        cursor.execute("SELECT * FROM blockers ORDER BY created_at DESC")
-    elif resolved:
-        cursor.execute("SELECT * FROM blockers WHERE resolved_at IS NOT NULL ORDER BY resolved_at DESC")
-    else:
-        cursor.execute("SELECT * FROM blockers WHERE resolved_at IS NULL ORDER BY created_at DESC")
+        if resolved is None:
+            cursor.execute("SELECT * FROM blockers ORDER BY created_at DESC")
+        elif resolved:
+            cursor.execute("SELECT * FROM blockers WHERE resolved_at IS NOT NULL ORDER BY resolved_at DESC")
+        else:
+            cursor.execute("SELECT * FROM blockers WHERE resolved_at IS NULL ORDER BY created_at DESC")
 
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return results
+        results = [dict(row) for row in cursor.fetchall()]
+        return results
 
 
 def get_full_kit_items(task_id: str) -> List[Dict[str, Any]]:
@@ -1655,6 +2389,11 @@ def get_full_kit_items(task_id: str) -> List[Dict[str, Any]]:
     return get_full_kit(task_id)
 
 
+def _dedup_key(notification_type: str, source_id: str) -> str:
+    """Primary key of the single dedup row for a notification type + source."""
+    return f"{notification_type}:{source_id or ''}"
+
+
 def check_dedup(notification_type: str, source_id: str, window_hours: float) -> bool:
     """
     Check if notification was sent within dedup window.
@@ -1669,25 +2408,23 @@ def check_dedup(notification_type: str, source_id: str, window_hours: float) ->
     """
     from datetime import timedelta
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    with read_connection() as conn:
+        cursor = conn.cursor()
 
-    cutoff = (datetime.now(timezone.utc) - timedelta(hours=window_hours)).isoformat()
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=window_hours)).isoformat()
 
-    cursor.execute("""
-        SELECT last_sent_at FROM notification_dedup
-        WHERE notification_type = ? AND (source_id = ? OR (source_id IS NULL AND ? IS NULL))
-        ORDER BY last_sent_at DESC LIMIT 1
-    """, (notification_type, source_id, source_id))
+        cursor.execute(
+            "SELECT last_sent_at FROM notification_dedup WHERE id = ?",
+            (_dedup_key(notification_type, source_id),)
+        )
 
-    row = cursor.fetchone()
-    conn.close()
+        row = cursor.fetchone()
 
-    if not row:
-        return False
+        if not row:
+            return False
 
-    last_sent = row["last_sent_at"]
-    return last_sent > cutoff
+        last_sent = row["last_sent_at"]
+        return last_sent > cutoff
 
 
 def update_dedup(notification_type: str, source_id: str) -> None:
@@ -1698,20 +2435,47 @@ def update_dedup(notification_type: str, source_id: str) -> None:
         notification_type: Type of notification
         source_id: Related entity ID
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    with write_connection() as conn:
+        cursor = conn.cursor()
 
-    dedup_id = generate_id()
-    now = datetime.now(timezone.utc).isoformat()
+        now = datetime.now(timezone.utc).isoformat()
 
-    cursor.execute("""
-        INSERT OR REPLACE INTO notification_dedup
-        (id, notification_type, source_id, last_sent_at)
-        VALUES (?, ?, ?, ?)
-    """, (dedup_id, notification_type, source_id, now))
+        cursor.execute("""
+            INSERT OR REPLACE INTO notification_dedup
+            (id, notification_type, source_id, last_sent_at)
+            VALUES (?, ?, ?, ?)
+        """, (_dedup_key(notification_type, source_id), notification_type, source_id, now))
 
-    conn.commit()
-    conn.close()
+
+def claim_dedup(notification_type: str, source_id: str, window_hours: float) -> bool:
+    """
+    Atomically check and record a notification against its dedup window.
+
+    One keyed upsert: inserts the dedup row, or refreshes it only if the last
+    send is older than the window (SET NX EX semantics).
+
+    Args:
+        notification_type: Type of notification
+        source_id: Related entity ID
+        window_hours: Dedup window in hours
+
+    Returns:
+        True if claimed (ok to send), False if duplicate within the window
+    """
+    from datetime import timedelta
+
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(hours=window_hours)).isoformat()
+
+    with write_connection() as conn:
+        cursor = conn.execute("""
+            INSERT INTO notification_dedup (id, notification_type, source_id, last_sent_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET last_sent_at = excluded.last_sent_at
+            WHERE notification_dedup.last_sent_at <= ?
+        """, (_dedup_key(notification_type, source_id), notification_type, source_id, now.isoformat(), cutoff))
+
+    return cursor.rowcount > 0
 
 
 # ============================================
@@ -1728,17 +2492,66 @@ def get_email_scan_log(gmail_message_id: str) -> Optional[Dict[str, Any]]:
     Returns:
         Email scan log dict or None if not found
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM email_scan_log WHERE gmail_message_id = ?",
-        (gmail_message_id,)
-    )
-    row = cursor.fetchone()
-    conn.close()
+    with read_connection() as conn:
+        row = conn.execute(_SQL_GET_EMAIL_SCAN, (gmail_message_id,)).fetchone()
     return dict(row) if row else None
 
 
+def get_processed_email_ids(gmail_message_ids: List[str]) -> Set[str]:
+    """
+    Find which Gmail messages already have a scan log entry, in one query.
+
+    Args:
+        gmail_message_ids: Gmail message IDs (passed as one JSON array)
+
+    Returns:
+        Set of the given IDs that are already logged
+    """
+    if not gmail_message_ids:
+        return set()
+
+    with read_connection() as conn:
+        cursor = conn.execute(
+            "SELECT gmail_message_id FROM email_scan_log "
+            "WHERE gmail_message_id IN (SELECT value FROM json_each(?))",
+            (json_dumps(list(gmail_message_ids)),)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _email_scan_log_row(
+    log_id: str,
+    gmail_message_id: str,
+    gmail_thread_id: str = None,
+    from_address: str = None,
+    from_name: str = None,
+    subject: str = None,
+    classification: str = 'ignore',
+    received_at: str = None,
+    matched_blocker_id: str = None,
+    matched_project_id: str = None,
+    has_attachment: bool = False,
+    notification_sent: bool = False
+) -> Tuple:
+    """Parameter tuple for _SQL_INSERT_EMAIL_SCAN."""
+    return (
+        log_id, gmail_message_id, gmail_thread_id, from_address, from_name,
+        subject, classification, received_at, matched_blocker_id,
+        matched_project_id, 1 if has_attachment else 0, 1 if notification_sent else 0
+    )
+
+
+def _email_scan_log_summary(row: Tuple) -> Dict[str, Any]:
+    """Summary dict returned for a freshly inserted scan log row."""
+    return {
+        "id": row[0],
+        "gmail_message_id": row[1],
+        "classification": row[6],
+        "matched_blocker_id": row[8],
+        "matched_project_id": row[9]
+    }
+
+
 def create_email_scan_log(
     gmail_message_id: str,
     gmail_thread_id: str = None,
@@ -1771,32 +2584,36 @@ def create_email_scan_log(
     Returns:
         Created email scan log dict
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    log_id = generate_id()
-    cursor.execute("""
-        INSERT INTO email_scan_log (
-            id, gmail_message_id, gmail_thread_id, from_address, from_name,
-            subject, classification, received_at, matched_blocker_id,
-            matched_project_id, has_attachment, notification_sent
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        log_id, gmail_message_id, gmail_thread_id, from_address, from_name,
+    row = _email_scan_log_row(
+        generate_id(), gmail_message_id, gmail_thread_id, from_address, from_name,
         subject, classification, received_at, matched_blocker_id,
-        matched_project_id, 1 if has_attachment else 0, 1 if notification_sent else 0
-    ))
+        matched_project_id, has_attachment, notification_sent
+    )
+    with write_connection() as conn:
+        conn.execute(_SQL_INSERT_EMAIL_SCAN, row)
 
-    conn.commit()
-    conn.close()
+    return _email_scan_log_summary(row)
 
-    return {
-        "id": log_id,
-        "gmail_message_id": gmail_message_id,
-        "classification": classification,
-        "matched_blocker_id": matched_blocker_id,
-        "matched_project_id": matched_project_id
-    }
+
+def create_email_scan_logs(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Create several email scan log entries in one transaction.
+
+    Args:
+        entries: Dicts of create_email_scan_log keyword arguments
+            ('gmail_message_id' required)
+
+    Returns:
+        List of created email scan log dicts, in input order
+    """
+    rows = [_email_scan_log_row(generate_id(), **entry) for entry in entries]
+    if not rows:
+        return []
+
+    with write_connection() as conn:
+        conn.executemany(_SQL_INSERT_EMAIL_SCAN, rows)
+
+    return [_email_scan_log_summary(row) for row in rows]
 
 
 def get_recent_email_scans(limit: int = 50) -> List[Dict[str, Any]]:
@@ -1809,15 +2626,45 @@ def get_recent_email_scans(limit: int = 50) -> List[Dict[str, Any]]:
     Returns:
         List of email scan log dicts, newest first
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT * FROM email_scan_log ORDER BY processed_at DESC LIMIT ?",
-        (limit,)
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM email_scan_log ORDER BY processed_at DESC LIMIT ?",
+            (limit,)
+        )
+        return fetch_dicts(cursor)
+
+
+def _email_attachment_row(
+    att_id: str,
+    email_scan_log_id: str,
+    gmail_attachment_id: str,
+    filename: str,
+    local_path: str = None,
+    document_id: str = None,
+    mime_type: str = None,
+    file_size_bytes: int = None,
+    download_status: str = 'pending',
+    download_error: str = None,
+    blocker_id: str = None,
+    project_id: str = None
+) -> Tuple:
+    """Parameter tuple for _SQL_INSERT_EMAIL_ATTACHMENT."""
+    return (
+        att_id, email_scan_log_id, gmail_attachment_id, filename, local_path,
+        document_id, mime_type, file_size_bytes, download_status,
+        download_error, blocker_id, project_id
     )
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+
+
+def _email_attachment_summary(row: Tuple) -> Dict[str, Any]:
+    """Summary dict returned for a freshly inserted attachment row."""
+    return {
+        "id": row[0],
+        "email_scan_log_id": row[1],
+        "filename": row[3],
+        "download_status": row[8]
+    }
 
 
 def create_email_attachment(
@@ -1852,31 +2699,43 @@ def create_email_attachment(
     Returns:
         Created attachment dict
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    att_id = generate_id()
-    cursor.execute("""
-        INSERT INTO email_attachments (
-            id, email_scan_log_id, gmail_attachment_id, filename, local_path,
-            document_id, mime_type, file_size_bytes, download_status,
-            download_error, blocker_id, project_id
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        att_id, email_scan_log_id, gmail_attachment_id, filename, local_path,
+    row = _email_attachment_row(
+        generate_id(), email_scan_log_id, gmail_attachment_id, filename, local_path,
         document_id, mime_type, file_size_bytes, download_status,
         download_error, blocker_id, project_id
-    ))
+    )
+    with write_connection() as conn:
+        conn.execute(_SQL_INSERT_EMAIL_ATTACHMENT, row)
 
-    conn.commit()
-    conn.close()
+    return _email_attachment_summary(row)
 
-    return {
-        "id": att_id,
-        "email_scan_log_id": email_scan_log_id,
-        "filename": filename,
-        "download_status": download_status
-    }
+
+def create_email_attachments(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Create several email attachment records in one transaction.
+
+    Args:
+        entries: Dicts of create_email_attachment keyword arguments
+            ('email_scan_log_id', 'gmail_attachment_id' and 'filename' required)
+
+    Returns:
+        List of created attachment dicts, in input order
+    """
+    rows = [_email_attachment_row(generate_id(), **entry) for entry in entries]
+    if not rows:
+        return []
+
+    with write_connection() as conn:
+        conn.executemany(_SQL_INSERT_EMAIL_ATTACHMENT, rows)
+
+    return [_email_attachment_summary(row) for row in rows]
+
+
+# Columns that update_email_attachment() may set
+EMAIL_ATTACHMENT_UPDATABLE_FIELDS = frozenset({
+    "document_id", "gmail_attachment_id", "filename", "mime_type", "file_size_bytes",
+    "local_path", "download_status", "download_error", "blocker_id", "project_id",
+})
 
 
 def update_email_attachment(
@@ -1888,32 +2747,25 @@ def update_email_attachment(
 
     Args:
         attachment_id: ID of attachment to update
-        **kwargs: Fields to update
+        **kwargs: Fields to update (see EMAIL_ATTACHMENT_UPDATABLE_FIELDS)
 
     Returns:
         Updated attachment dict or None
+
+    Raises:
+        ValueError: If a field is not in EMAIL_ATTACHMENT_UPDATABLE_FIELDS
     """
     if not kwargs:
         return None
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    sets = []
-    params = []
-    for key, value in kwargs.items():
-        sets.append(f"{key} = ?")
-        params.append(value)
-
+    columns = _update_columns(kwargs, EMAIL_ATTACHMENT_UPDATABLE_FIELDS, "email attachment")
+    params = [kwargs[column] for column in columns]
     params.append(attachment_id)
 
-    query = f"UPDATE email_attachments SET {', '.join(sets)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-
-    cursor.execute("SELECT * FROM email_attachments WHERE id = ?", (attachment_id,))
-    row = cursor.fetchone()
-    conn.close()
+    with write_connection() as conn:
+        conn.execute(_update_sql("email_attachments", columns, touch=False), params)
+        # Read back before the writer is released to other threads
+        row = conn.execute("SELECT * FROM email_attachments WHERE id = ?", (attachment_id,)).fetchone()
 
     return dict(row) if row else None
 
@@ -12,11 +12,19 @@ Following Anthropic Dec 2025 guidance:
 - No embeddings needed at ~100 docs/project scale
 """
 
+import atexit
 import os
+import re
 import json
 import hashlib
+import importlib
 import logging
+import shutil
+import tempfile
+import threading
+import time
 from pathlib import Path
+from types import MappingProxyType
 from datetime import datetime
 from typing import Dict, Any, Optional, List, Tuple
 
@@ -36,12 +44,19 @@ SUPPORTED_EXTENSIONS = {
     'spreadsheet': ['.csv', '.tsv'],
 }
 
+# Extension -> category, for one dict lookup per file
+_EXT_TO_CATEGORY = {
+    ext: category
+    for category, extensions in SUPPORTED_EXTENSIONS.items()
+    for ext in extensions
+}
+
 # Document storage directory
 DOCUMENT_STORAGE = Path(__file__).parent / "documents"
 DOCUMENT_STORAGE.mkdir(exist_ok=True)
 
-# Metadata extraction prompts by document type
-EXTRACTION_PROMPTS = {
+# Metadata extraction prompts by document type (read-only)
+EXTRACTION_PROMPTS = MappingProxyType({
     'receipt': """Extract the following from this receipt:
 - vendor: Store/merchant name
 - date: Transaction date (YYYY-MM-DD format)
@@ -127,7 +142,8 @@ Return as JSON.""",
 - entities: Important names, companies, or references
 
 Return as JSON."""
-}
+})
+_DEFAULT_PROMPT = EXTRACTION_PROMPTS['other']
 
 
 # ============================================
@@ -145,19 +161,10 @@ def extract_text_from_file(file_path: str) -> Tuple[str, str]:
         Tuple of (extracted_text, extraction_method)
     """
     path = Path(file_path)
-    ext = path.suffix.lower()
-
-    # Plain text files
-    if ext in SUPPORTED_EXTENSIONS['text']:
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return f.read(), 'direct'
-        except UnicodeDecodeError:
-            with open(path, 'r', encoding='latin-1') as f:
-                return f.read(), 'direct'
+    category = _EXT_TO_CATEGORY.get(path.suffix.lower())
 
-    # CSV/TSV files
-    if ext in SUPPORTED_EXTENSIONS['spreadsheet']:
+    # Plain text and CSV/TSV files
+    if category == 'text' or category == 'spreadsheet':
         try:
             with open(path, 'r', encoding='utf-8') as f:
                 return f.read(), 'direct'
@@ -166,20 +173,79 @@ def extract_text_from_file(file_path: str) -> Tuple[str, str]:
                 return f.read(), 'direct'
 
     # PDF files
-    if ext in SUPPORTED_EXTENSIONS['pdf']:
+    if category == 'pdf':
         return extract_text_from_pdf(file_path)
 
     # Image files - return empty, will use vision API
-    if ext in SUPPORTED_EXTENSIONS['image']:
+    if category == 'image':
         return '', 'vision_required'
 
     return '', 'unsupported'
 
 
+# Optional dependencies found to be missing; a failed import is not cached
+# in sys.modules, so without this every call would search sys.path again
+_missing_modules = set()
+
+
+def _optional_import(name: str):
+    """
+    Import an optional dependency.
+
+    Raises:
+        ImportError: If the module is not installed (remembered, so later
+            calls fail without another filesystem search)
+    """
+    if name in _missing_modules:
+        raise ImportError(f"{name} is not installed")
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        _missing_modules.add(name)
+        raise
+
+
+def _pdf_text_pdfium(file_path: str) -> List[str]:
+    """Page texts via pypdfium2 (PDFium, C++)."""
+    pdfium = _optional_import('pypdfium2')
+
+    text_parts = []
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        # PDFium is not thread-safe, so pages are read one at a time and
+        # released as soon as their text is out
+        for page in pdf:
+            textpage = page.get_textpage()
+            page_text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            if page_text:
+                text_parts.append(page_text)
+    finally:
+        pdf.close()
+    return text_parts
+
+
+def _pdf_text_pypdf2(file_path: str) -> List[str]:
+    """Page texts via PyPDF2 (pure Python)."""
+    PyPDF2 = _optional_import('PyPDF2')
+
+    text_parts = []
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        for page in reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text_parts.append(page_text)
+    return text_parts
+
+
 def extract_text_from_pdf(file_path: str) -> Tuple[str, str]:
     """
     Extract text from a PDF file.
 
+    Uses pypdfium2 when installed (much faster), otherwise PyPDF2.
+
     Args:
         file_path: Path to PDF
 
@@ -187,34 +253,62 @@ def extract_text_from_pdf(file_path: str) -> Tuple[str, str]:
         Tuple of (extracted_text, extraction_method)
     """
     try:
-        import PyPDF2
-
-        text_parts = []
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
+        try:
+            text_parts, method = _pdf_text_pdfium(file_path), 'pdfium'
+        except ImportError:
+            text_parts, method = _pdf_text_pypdf2(file_path), 'pypdf2'
 
         full_text = '\n'.join(text_parts)
         if full_text.strip():
-            return full_text, 'pypdf2'
+            return full_text, method
         else:
             return '', 'ocr_required'
 
     except ImportError:
-        logger.warning("PyPDF2 not installed, PDF text extraction unavailable")
+        logger.warning("Neither pypdfium2 nor PyPDF2 installed, PDF text extraction unavailable")
         return '', 'pypdf2_missing'
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
         return '', f'error: {str(e)}'
 
 
+# One in-process libtesseract engine, created on first use. It is not
+# thread-safe, so calls are serialized on _tesseract_lock.
+_tesseract_api = None
+_tesseract_lock = threading.Lock()
+
+
+def _ocr_tesserocr(file_path: str) -> str:
+    """Image text via tesserocr (libtesseract bound in-process, no fork)."""
+    global _tesseract_api
+    tesserocr = _optional_import('tesserocr')
+    Image = _optional_import('PIL.Image')
+
+    with _tesseract_lock:
+        if _tesseract_api is None:
+            _tesseract_api = tesserocr.PyTessBaseAPI()
+            atexit.register(_tesseract_api.End)
+        with Image.open(file_path) as img:
+            _tesseract_api.SetImage(img)
+            return _tesseract_api.GetUTF8Text()
+
+
+def _ocr_pytesseract(file_path: str) -> str:
+    """Image text via pytesseract (spawns the tesseract binary per call)."""
+    pytesseract = _optional_import('pytesseract')
+    Image = _optional_import('PIL.Image')
+
+    with Image.open(file_path) as img:
+        return pytesseract.image_to_string(img)
+
+
 def extract_text_from_image(file_path: str) -> Tuple[str, str]:
     """
     Extract text from an image using OCR.
 
+    Uses tesserocr when installed (engine loaded once and reused),
+    otherwise pytesseract.
+
     Args:
         file_path: Path to image
 
@@ -222,15 +316,13 @@ def extract_text_from_image(file_path: str) -> Tuple[str, str]:
         Tuple of (extracted_text, extraction_method)
     """
     try:
-        import pytesseract
-        from PIL import Image
-
-        img = Image.open(file_path)
-        text = pytesseract.image_to_string(img)
-        return text, 'tesseract'
+        try:
+            return _ocr_tesserocr(file_path), 'tesserocr'
+        except ImportError:
+            return _ocr_pytesseract(file_path), 'tesseract'
 
     except ImportError:
-        logger.warning("pytesseract/PIL not installed, OCR unavailable")
+        logger.warning("Neither tesserocr nor pytesseract/PIL installed, OCR unavailable")
         return '', 'ocr_missing'
     except Exception as e:
         logger.error(f"OCR error: {e}")
@@ -243,7 +335,11 @@ def extract_text_from_image(file_path: str) -> Tuple[str, str]:
 
 def get_extraction_prompt(document_type: str) -> str:
     """Get the metadata extraction prompt for a document type."""
-    return EXTRACTION_PROMPTS.get(document_type, EXTRACTION_PROMPTS['other'])
+    return EXTRACTION_PROMPTS.get(document_type, _DEFAULT_PROMPT)
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
+_JSON_DECODER = json.JSONDecoder()
 
 
 def parse_extracted_metadata(raw_response: str) -> Dict[str, Any]:
@@ -256,42 +352,29 @@ def parse_extracted_metadata(raw_response: str) -> Dict[str, Any]:
     Returns:
         Parsed metadata dict
     """
-    # Try to find JSON in the response
     try:
-        # Look for JSON block
-        if '```json' in raw_response:
-            start = raw_response.find('```json') + 7
-            end = raw_response.find('```', start)
-            json_str = raw_response[start:end].strip()
-        elif '```' in raw_response:
-            start = raw_response.find('```') + 3
-            end = raw_response.find('```', start)
-            json_str = raw_response[start:end].strip()
-        elif '{' in raw_response:
-            # Find the JSON object
-            start = raw_response.find('{')
-            # Find matching closing brace
-            depth = 0
-            end = start
-            for i, c in enumerate(raw_response[start:]):
-                if c == '{':
-                    depth += 1
-                elif c == '}':
-                    depth -= 1
-                    if depth == 0:
-                        end = start + i + 1
-                        break
-            json_str = raw_response[start:end]
-        else:
+        # Fenced ```json block first
+        match = _FENCE_RE.search(raw_response)
+        if match:
+            return db.json_loads(match.group(1))
+
+        # Otherwise decode the first JSON object; raw_decode finds its end itself
+        # (braces inside strings included)
+        start = raw_response.find('{')
+        if start < 0:
             return {"raw_response": raw_response}
-
-        return json.loads(json_str)
+        metadata, _ = _JSON_DECODER.raw_decode(raw_response, start)
+        return metadata
 
     except json.JSONDecodeError as e:
         logger.warning(f"Failed to parse metadata JSON: {e}")
         return {"raw_response": raw_response, "parse_error": str(e)}
 
 
+# Content sent along with an extraction prompt is capped at this size
+MAX_EXTRACTION_CONTENT = 10000
+
+
 def build_metadata_extraction_request(
     document_type: str,
     content_text: str = None,
@@ -305,7 +388,8 @@ def build_metadata_extraction_request(
 
     Args:
         document_type: Type of document
-        content_text: Extracted text content (for PDFs, text files)
+        content_text: Extracted text content (for PDFs, text files);
+            str or UTF-8 bytes, truncated to MAX_EXTRACTION_CONTENT
         file_path: Path to file (for images that need vision)
 
     Returns:
@@ -319,11 +403,14 @@ def build_metadata_extraction_request(
     }
 
     if content_text:
-        request["content"] = content_text[:10000]  # Limit content size
+        if isinstance(content_text, bytes):
+            # Decode only the prefix we keep; a split trailing character is dropped
+            content_text = content_text[:MAX_EXTRACTION_CONTENT].decode('utf-8', 'ignore')
+        request["content"] = content_text[:MAX_EXTRACTION_CONTENT]
 
     if file_path:
         path = Path(file_path)
-        if path.suffix.lower() in SUPPORTED_EXTENSIONS['image']:
+        if _EXT_TO_CATEGORY.get(path.suffix.lower()) == 'image':
             request["image_path"] = str(path)
             request["requires_vision"] = True
 
@@ -336,40 +423,84 @@ def build_metadata_extraction_request(
 
 def compute_file_hash(file_path: str) -> str:
     """Compute SHA-256 hash of file."""
-    sha256 = hashlib.sha256()
+    # file_digest reads into one reusable buffer and hashes with the GIL released
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+        return hashlib.file_digest(f, 'sha256').hexdigest()
 
 
 def get_file_type(file_path: str) -> str:
     """Determine file type category from extension."""
-    ext = Path(file_path).suffix.lower()
-    for category, extensions in SUPPORTED_EXTENSIONS.items():
-        if ext in extensions:
-            return category
-    return 'unknown'
+    return _EXT_TO_CATEGORY.get(Path(file_path).suffix.lower(), 'unknown')
 
 
-def copy_to_storage(
+COPY_CHUNK_SIZE = 8 << 20  # 8 MiB: few syscalls per large scan, bounded memory
+
+
+def _copy_hashing(source: Path, dst) -> str:
+    """Copy source into the open binary file dst, computing its SHA-256 in the same pass. Returns the hex digest."""
+    sha256 = hashlib.sha256()
+    buf = bytearray(COPY_CHUNK_SIZE)
+    view = memoryview(buf)
+    with open(source, 'rb') as src:
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            sha256.update(view[:n])
+            dst.write(view[:n])
+    return sha256.hexdigest()
+
+
+def _reserve_name(dest_dir: Path, source: Path) -> Path:
+    """
+    Claim a free name for source in dest_dir (name, name_1, name_2, ...).
+
+    The name is taken by creating an empty placeholder with O_EXCL, so two
+    uploads racing for the same name can't both get it; the caller then
+    replaces the placeholder with the real file.
+    """
+    dest_path = dest_dir / source.name
+    counter = 1
+    while True:
+        try:
+            with open(dest_path, 'xb'):
+                return dest_path
+        except FileExistsError:
+            dest_path = dest_dir / f"{source.stem}_{counter}{source.suffix}"
+            counter += 1
+
+
+def store_file(
     source_path: str,
     project_id: str = None,
     preserve_name: bool = True
-) -> str:
+) -> Tuple[str, str]:
     """
-    Copy a file to document storage.
+    Copy a file to document storage, hashing it while it is copied.
 
     Args:
         source_path: Original file path
         project_id: Optional project ID for organization
-        preserve_name: Keep original filename
+        preserve_name: Keep original filename (otherwise name by content hash)
 
     Returns:
-        New file path in storage
+        Tuple of (new file path in storage, SHA-256 hex digest)
     """
     source = Path(source_path)
+    tmp_path, file_hash = _stage_file(source, project_id)
+    return _place_staged(tmp_path, source, file_hash, preserve_name), file_hash
+
+
+def _stage_file(source: Path, project_id: str = None) -> Tuple[Path, str]:
+    """
+    Copy source into the storage directory under a unique temporary name,
+    hashing it in the same pass.
+
+    The caller must pass the result to _place_staged() or unlink it.
 
+    Returns:
+        Tuple of (temporary path, SHA-256 hex digest)
+    """
     # Create project subdirectory if specified
     if project_id:
         dest_dir = DOCUMENT_STORAGE / project_id
@@ -377,29 +508,59 @@ def copy_to_storage(
         dest_dir = DOCUMENT_STORAGE / "unassigned"
     dest_dir.mkdir(exist_ok=True)
 
-    # Generate destination filename
-    if preserve_name:
-        dest_name = source.name
-        # Handle duplicates
-        dest_path = dest_dir / dest_name
-        counter = 1
-        while dest_path.exists():
-            dest_name = f"{source.stem}_{counter}{source.suffix}"
-            dest_path = dest_dir / dest_name
-            counter += 1
-    else:
-        # Use hash-based name
-        file_hash = compute_file_hash(str(source))[:12]
-        dest_name = f"{file_hash}{source.suffix}"
-        dest_path = dest_dir / dest_name
+    # Unique per call, so concurrent uploads of the same file each get their own
+    with tempfile.NamedTemporaryFile(dir=dest_dir, prefix=f".{source.name}.", suffix=".tmp", delete=False) as tmp:
+        tmp_path = Path(tmp.name)
+    try:
+        with open(tmp_path, 'wb') as dst:
+            file_hash = _copy_hashing(source, dst)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return tmp_path, file_hash
+
+
+def _place_staged(tmp_path: Path, source: Path, file_hash: str, preserve_name: bool = True) -> str:
+    """Move a staged copy to its final name next to it. Returns the stored path."""
+    dest_dir = tmp_path.parent
+    try:
+        # Generate destination filename
+        if preserve_name:
+            dest_path = _reserve_name(dest_dir, source)
+        else:
+            # Use hash-based name (same name means same content, so replacing is harmless)
+            dest_path = dest_dir / f"{file_hash[:12]}{source.suffix}"
+
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
-    # Copy file
-    import shutil
-    shutil.copy2(source, dest_path)
+    # Same metadata semantics as shutil.copy2
+    shutil.copystat(source, dest_path)
 
     return str(dest_path)
 
 
+def copy_to_storage(
+    source_path: str,
+    project_id: str = None,
+    preserve_name: bool = True
+) -> str:
+    """
+    Copy a file to document storage.
+
+    Args:
+        source_path: Original file path
+        project_id: Optional project ID for organization
+        preserve_name: Keep original filename
+
+    Returns:
+        New file path in storage
+    """
+    return store_file(source_path, project_id, preserve_name)[0]
+
+
 # ============================================
 # MAIN DOCUMENT OPERATIONS
 # ============================================
@@ -424,30 +585,57 @@ def upload_document(
         metadata: Optional pre-extracted metadata
 
     Returns:
-        Document dict with extracted metadata and extraction request if needed
+        Document dict with extracted metadata and extraction request if needed.
+        If the same content was already uploaded to the project, the existing
+        document is returned with "duplicate": True and nothing is stored.
     """
     path = Path(file_path)
+    source = str(path)
 
-    if not path.exists():
-        raise FileNotFoundError(f"File not found: {file_path}")
+    # One stat both checks the file exists and gives its size
+    try:
+        file_size = os.stat(source).st_size
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {file_path}") from None
+    file_type = get_file_type(source)
+
+    # Hash the file in the same pass that copies it into storage (or on its
+    # own when it stays where it is), then check for identical content
+    # already stored for this project: reuse that and skip the text
+    # extraction and AI metadata request
+    if copy_file:
+        tmp_path, file_hash = _stage_file(path, project_id)
+    else:
+        tmp_path, file_hash = None, compute_file_hash(source)
 
-    # Get file info
-    file_size = path.stat().st_size
-    file_hash = compute_file_hash(str(path))
-    file_type = get_file_type(str(path))
+    try:
+        existing = db.get_document_by_hash(file_hash, project_id)
+    except BaseException:
+        if tmp_path:
+            tmp_path.unlink(missing_ok=True)
+        raise
+    if existing:
+        if tmp_path:
+            tmp_path.unlink(missing_ok=True)
+        return {
+            "document": existing,
+            "extraction_method": "dedup",
+            "extraction_request": None,
+            "needs_ai_extraction": False,
+            "duplicate": True
+        }
 
-    # Copy to storage if requested
-    if copy_file:
-        stored_path = copy_to_storage(str(path), project_id)
+    if tmp_path:
+        stored_path = _place_staged(tmp_path, path, file_hash)
     else:
-        stored_path = str(path)
+        stored_path = source
 
     # Extract text
-    content_text, extraction_method = extract_text_from_file(str(path))
+    content_text, extraction_method = extract_text_from_file(source)
 
     # For images, try OCR if available
     if extraction_method == 'vision_required':
-        ocr_text, ocr_method = extract_text_from_image(str(path))
+        ocr_text, ocr_method = extract_text_from_image(source)
         if ocr_text:
             content_text = ocr_text
             extraction_method = ocr_method
@@ -480,17 +668,29 @@ def upload_document(
         extraction_request = build_metadata_extraction_request(
             document_type=document_type,
             content_text=content_text,
-            file_path=str(path) if file_type == 'image' else None
+            file_path=source if file_type == 'image' else None
         )
 
     return {
         "document": doc,
         "extraction_method": extraction_method,
         "extraction_request": extraction_request,
-        "needs_ai_extraction": extraction_request is not None
+        "needs_ai_extraction": extraction_request is not None,
+        "duplicate": False
     }
 
 
+# content_summary is a short one-line digest, not a copy of the document
+MAX_SUMMARY_CHARS = 512
+# (label, metadata key) pairs joined into content_summary; unlabeled text goes in as-is
+_SUMMARY_FIELDS = (
+    ('Vendor', 'vendor'),
+    ('Amount', 'total'),
+    ('Date', 'date'),
+    (None, 'summary'),
+)
+
+
 def update_document_metadata(
     doc_id: str,
     extracted_metadata: Dict[str, Any]
@@ -537,21 +737,18 @@ def update_document_metadata(
     # Store full extracted metadata as JSON in notes or content_summary
     if extracted_metadata:
         # Create a summary from key fields
-        summary_parts = []
-        if extracted_metadata.get('vendor'):
-            summary_parts.append(f"Vendor: {extracted_metadata['vendor']}")
-        if extracted_metadata.get('total'):
-            summary_parts.append(f"Amount: {extracted_metadata['total']}")
-        if extracted_metadata.get('date'):
-            summary_parts.append(f"Date: {extracted_metadata['date']}")
-        if extracted_metadata.get('summary'):
-            summary_parts.append(extracted_metadata['summary'])
+        summary_parts = [
+            f"{label}: {value}" if label else str(value)
+            for label, key in _SUMMARY_FIELDS
+            if (value := extracted_metadata.get(key))
+        ]
 
         if summary_parts:
-            updates['content_summary'] = ' | '.join(summary_parts)
+            updates['content_summary'] = ' | '.join(summary_parts)[:MAX_SUMMARY_CHARS]
 
-        # Store full metadata as JSON in notes if not already set
-        updates['notes'] = json.dumps(extracted_metadata, indent=2)
+        # Store full metadata as compact JSON in notes (smaller rows and WAL
+        # writes than indented JSON; pretty-print on display if needed)
+        updates['notes'] = db.json_dumps(extracted_metadata)
 
     if updates:
         return db.update_document(doc_id, **updates)
@@ -559,6 +756,42 @@ def update_document_metadata(
     return db.get_document(doc_id)
 
 
+# Short-lived cache of document query results, keyed by function + arguments.
+# Entries are tagged with db.documents_version() so any document write in this
+# process invalidates them; the TTL bounds staleness from other processes.
+QUERY_CACHE_TTL = 60
+QUERY_CACHE_MAX = 256
+_query_cache: Dict[Tuple, Tuple[float, int, List[Dict[str, Any]]]] = {}
+_query_cache_lock = threading.Lock()
+
+
+def _cached_query(key: Tuple, fetch) -> List[Dict[str, Any]]:
+    """
+    Return fetch() for key, reusing a fresh cached result when there is one.
+
+    Callers get their own copies of the row dicts, so mutating a result
+    never leaks into the cache.
+    """
+    now = time.monotonic()
+    version = db.documents_version()
+
+    with _query_cache_lock:
+        entry = _query_cache.get(key)
+    if entry is not None and entry[0] > now and entry[1] == version:
+        rows = entry[2]
+    else:
+        rows = fetch()
+        with _query_cache_lock:
+            if len(_query_cache) >= QUERY_CACHE_MAX:
+                for stale in [k for k, e in _query_cache.items() if e[0] <= now or e[1] != version]:
+                    del _query_cache[stale]
+                if len(_query_cache) >= QUERY_CACHE_MAX:
+                    _query_cache.clear()
+            _query_cache[key] = (now + QUERY_CACHE_TTL, version, rows)
+
+    return [dict(row) for row in rows]
+
+
 def search_documents(
     project_id: str = None,
     query: str = None,
@@ -574,7 +807,8 @@ def search_documents(
     """
     Search documents with flexible filtering.
 
-    This is a pass-through to db.search_documents with the same signature.
+    This is a pass-through to db.search_documents with the same signature;
+    identical searches within QUERY_CACHE_TTL are served from memory.
 
     Args:
         project_id: Filter by project
@@ -591,7 +825,7 @@ def search_documents(
     Returns:
         List of matching documents
     """
-    return db.search_documents(
+    filters = dict(
         project_id=project_id,
         query=query,
         document_type=document_type,
@@ -603,6 +837,10 @@ def search_documents(
         amount_max=amount_max,
         limit=limit
     )
+    return _cached_query(
+        ("search",) + tuple(filters.values()),
+        lambda: db.search_documents(**filters)
+    )
 
 
 def get_document(doc_id: str) -> Optional[Dict[str, Any]]:
@@ -676,7 +914,7 @@ def build_question_request(
     # Include stored metadata
     if doc.get('notes'):
         try:
-            request["metadata"] = json.loads(doc['notes'])
+            request["metadata"] = db.json_loads(doc['notes'])
         except json.JSONDecodeError:
             request["metadata"] = {"notes": doc['notes']}
 
@@ -706,25 +944,28 @@ def list_documents_for_context(
     Returns:
         List of document summaries
     """
-    docs = db.list_documents(
-        project_id=project_id,
-        document_type=document_type,
-        limit=limit
-    )
+    def fetch():
+        docs = db.list_documents(
+            project_id=project_id,
+            document_type=document_type,
+            limit=limit
+        )
 
-    # Return lightweight summaries
-    return [
-        {
-            "id": d['id'],
-            "filename": d['filename'],
-            "type": d['document_type'],
-            "vendor": d.get('vendor'),
-            "amount": d.get('amount'),
-            "date": d.get('transaction_date'),
-            "summary": d.get('content_summary', '')[:100]
-        }
-        for d in docs
-    ]
+        # Return lightweight summaries
+        return [
+            {
+                "id": d['id'],
+                "filename": d['filename'],
+                "type": d['document_type'],
+                "vendor": d.get('vendor'),
+                "amount": d.get('amount'),
+                "date": d.get('transaction_date'),
+                "summary": (d.get('content_summary') or '')[:100]
+            }
+            for d in docs
+        ]
+
+    return _cached_query(("context", project_id, document_type, limit), fetch)
 
 
 # ============================================
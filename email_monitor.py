@@ -14,24 +14,32 @@ MCP Tools Used:
 import os
 import re
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Set, Tuple
 
 import db
 import notification_router
-from config import (
-    EMAIL_SCAN_CONFIG,
-    RESOLUTION_KEYWORDS,
-    ESCALATION_KEYWORDS,
-    IGNORE_PATTERNS,
-    RELEVANCE_KEYWORDS
-)
+from config import EMAIL_SCAN_CONFIG, EMAIL_SCAN_SECONDS, RELEVANCE_KEYWORDS, next_fire
+from keyword_matcher import KeywordMatcher, scan_ignore
 
 logger = logging.getLogger(__name__)
 
 # Minimum relevance score to consider an email relevant (0-100)
 RELEVANCE_THRESHOLD = 20
 
+# Only the start of a body is scored and matched against blockers; quoted
+# replies, signatures and disclaimers further down add cost but no signal.
+# The ignore check still scans the whole body: unsubscribe/newsletter
+# markers usually sit in the footer.
+CLASSIFY_BODY_CHARS = 16384
+
+# Characters not allowed in stored attachment filenames
+_UNSAFE_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+# Display name in a "Name <email@example.com>" From field
+_FROM_NAME_RE = re.compile(r'^([^<]+)\s*<')
+
 
 # ============================================
 # GMAIL MCP INTEGRATION
@@ -117,16 +125,52 @@ def should_ignore(from_addr: str, subject: str, body: str) -> bool:
     Returns:
         True if should be ignored
     """
-    full_text = f"{from_addr} {subject} {body}".lower()
+    full_text = f"{from_addr} {subject} {body}"
+    return scan_ignore(full_text) is not None
 
-    for pattern in IGNORE_PATTERNS:
-        if pattern.lower() in full_text:
-            return True
 
-    return False
+@dataclass(frozen=True, slots=True)
+class MatchTargets:
+    """
+    Projects and blockers an email scan matches against, prepared once.
+
+    matcher is one automaton over the relevance keywords, project names
+    ("project") and blocker watch patterns ("watch"), so an email body is
+    scanned a single time whatever the number of projects and blockers.
+    """
+    projects: List[Tuple[str, str]]             # (project_id, name_lower)
+    blockers: List[Tuple[Dict, str, str]]       # (blocker, waiting_on_lower, watch_pattern_lower)
+    matcher: KeywordMatcher
 
 
-def classify_email(email: Dict) -> Dict[str, Any]:
+def load_match_targets() -> MatchTargets:
+    """
+    Fetch and pre-lowercase what emails are matched against.
+
+    Done once per scan so classifying each email is pure string work.
+
+    Returns:
+        MatchTargets for active projects with names longer than 3
+        characters and for unresolved blockers
+    """
+    projects = [
+        (project["id"], name)
+        for project in db.list_projects(status="active")
+        if len(name := (project.get("name") or "").lower()) > 3
+    ]
+    blockers = [
+        (blocker, (blocker.get("waiting_on") or "").lower(), (blocker.get("watch_pattern") or "").lower())
+        for blocker in db.get_blockers_filtered(resolved=False)
+    ]
+    matcher = KeywordMatcher({
+        "relevance": RELEVANCE_KEYWORDS,
+        "project": [name for _, name in projects],
+        "watch": [pattern for _, _, pattern in blockers if pattern],
+    })
+    return MatchTargets(projects, blockers, matcher)
+
+
+def classify_email(email: Dict, targets: MatchTargets = None) -> Dict[str, Any]:
     """
     Classify an email for project relevance.
 
@@ -139,6 +183,7 @@ def classify_email(email: Dict) -> Dict[str, Any]:
 
     Args:
         email: Email dict with from, subject, body, attachments
+        targets: Prepared match targets from load_match_targets() (loaded if None)
 
     Returns:
         {
@@ -150,7 +195,22 @@ def classify_email(email: Dict) -> Dict[str, Any]:
             "categories": ["blocker", "attachment", "keyword", etc]
         }
     """
-    result = {
+    if _is_ignored(email):
+        return _ignore_classification()
+
+    if targets is None:
+        targets = load_match_targets()
+    return _score_email(email, targets)
+
+
+def _is_ignored(email: Dict) -> bool:
+    """True if the email hits an ignore pattern (spam, newsletter, etc.), anywhere in the body."""
+    return should_ignore(email.get("from", ""), email.get("subject", ""), email.get("body", ""))
+
+
+def _ignore_classification() -> Dict[str, Any]:
+    """Classification result for an email that isn't relevant to anything."""
+    return {
         "is_relevant": False,
         "relevance_score": 0,
         "classification": "ignore",
@@ -159,35 +219,39 @@ def classify_email(email: Dict) -> Dict[str, Any]:
         "categories": []
     }
 
+
+def _score_email(email: Dict, targets: MatchTargets) -> Dict[str, Any]:
+    """Score an email that passed the ignore check (see classify_email)."""
+    result = _ignore_classification()
+
     from_addr = email.get("from", "").lower()
     from_name = _extract_name(email.get("from", ""))
     subject = email.get("subject", "").lower()
-    body = email.get("body", "").lower()
+    body = email.get("body", "")[:CLASSIFY_BODY_CHARS].lower()
     full_text = f"{subject} {body}"
 
-    # Check ignore patterns first
-    if should_ignore(from_addr, subject, body):
-        return result
+    # Single pass over the text for keywords, project names and watch patterns
+    hits = targets.matcher.match(full_text)
 
     # Check blocker matches (highest priority)
-    blocker_match = check_blocker_match(from_addr, from_name, subject, body)
+    blocker_match = _match_blocker(f"{from_addr} {from_name}".lower(), hits.get("watch", ()), targets.blockers)
     if blocker_match:
         result["matched_blocker_id"] = blocker_match["id"]
         result["relevance_score"] += 50 if "waiting_on" in str(blocker_match) else 40
         result["categories"].append("blocker_match")
 
-    # Check project name matches
-    projects = db.list_projects(status="active")
-    for project in projects:
-        project_name = project.get("name", "").lower()
-        if project_name and len(project_name) > 3 and project_name in full_text:
-            result["matched_project_id"] = project["id"]
-            result["relevance_score"] += 30
-            result["categories"].append("project_match")
-            break
+    # Check project name matches (first active project in list order wins)
+    project_hits = hits.get("project")
+    if project_hits:
+        for project_id, project_name in targets.projects:
+            if project_name in project_hits:
+                result["matched_project_id"] = project_id
+                result["relevance_score"] += 30
+                result["categories"].append("project_match")
+                break
 
     # Check for relevance keywords
-    keyword_matches = sum(1 for kw in RELEVANCE_KEYWORDS if kw.lower() in full_text)
+    keyword_matches = len(hits.get("relevance", ()))
     if keyword_matches > 0:
         result["relevance_score"] += keyword_matches * 10
         result["categories"].append("keyword_match")
@@ -212,11 +276,30 @@ def classify_email(email: Dict) -> Dict[str, Any]:
     return result
 
 
+def _match_blocker(
+    sender_text: str,
+    watch_hits: Set[str],
+    blockers: List[Tuple[Dict, str, str]]
+) -> Optional[Dict]:
+    """First blocker whose waiting_on is in the sender or whose watch pattern was hit."""
+    for blocker, waiting_on, watch_pattern in blockers:
+        # Match sender against waiting_on
+        if waiting_on and waiting_on in sender_text:
+            return blocker
+
+        # Match pattern in email content
+        if watch_pattern and watch_pattern in watch_hits:
+            return blocker
+
+    return None
+
+
 def check_blocker_match(
     from_addr: str,
     from_name: str,
     subject: str,
-    body: str
+    body: str,
+    targets: MatchTargets = None
 ) -> Optional[Dict]:
     """
     Check if email matches any active blocker.
@@ -230,27 +313,18 @@ def check_blocker_match(
         from_name: Sender display name
         subject: Email subject
         body: Email body text
+        targets: Prepared match targets from load_match_targets() (loaded if None)
 
     Returns:
         Matched blocker dict or None
     """
-    blockers = db.get_blockers_filtered(resolved=False)
+    if targets is None:
+        targets = load_match_targets()
     sender_text = f"{from_addr} {from_name}".lower()
-    content_text = f"{subject} {body}".lower()
-
-    for blocker in blockers:
-        waiting_on = (blocker.get("waiting_on") or "").lower()
-        watch_pattern = (blocker.get("watch_pattern") or "").lower()
-
-        # Match sender against waiting_on
-        if waiting_on and waiting_on in sender_text:
-            return blocker
+    content_text = f"{subject} {body[:CLASSIFY_BODY_CHARS]}".lower()
 
-        # Match pattern in email content
-        if watch_pattern and watch_pattern in content_text:
-            return blocker
-
-    return None
+    watch_hits = targets.matcher.match(content_text).get("watch", ())
+    return _match_blocker(sender_text, watch_hits, targets.blockers)
 
 
 # ============================================
@@ -303,6 +377,28 @@ def download_email_attachment(
     Returns:
         Dict with MCP params and document_id if created
     """
+    params, document_entry = _attachment_download(message_id, attachment_id, filename, project_id)
+
+    # Create document record if project matched
+    if document_entry:
+        params["document_id"] = db.create_document(**document_entry).get("id")
+
+    return params
+
+
+def _attachment_download(
+    message_id: str,
+    attachment_id: str,
+    filename: str,
+    project_id: str = None
+) -> Tuple[Dict, Optional[Dict]]:
+    """
+    MCP download params for an attachment, plus the document record to create.
+
+    Returns:
+        (params with document_id None, db.create_document(s) entry or None
+        when no project matched)
+    """
     # Sanitize filename
     safe_filename = _sanitize_filename(filename)
 
@@ -315,32 +411,31 @@ def download_email_attachment(
 
     save_path = os.path.join(save_dir, safe_filename)
 
-    # Create document record if project matched
-    document_id = None
+    document_entry = None
     if project_id:
-        doc = db.create_document(
-            filename=safe_filename,
-            file_path=save_path,
-            project_id=project_id,
-            document_type="email",
-            notes=f"Downloaded from email {message_id}"
-        )
-        document_id = doc.get("id")
+        document_entry = {
+            "filename": safe_filename,
+            "file_path": save_path,
+            "project_id": project_id,
+            "document_type": "email",
+            "notes": f"Downloaded from email {message_id}"
+        }
 
-    return {
+    params = {
         "tool": "mcp__gmail__download_attachment",
         "messageId": message_id,
         "attachmentId": attachment_id,
         "savePath": save_dir,
         "filename": safe_filename,
-        "document_id": document_id
+        "document_id": None
     }
+    return params, document_entry
 
 
 def _sanitize_filename(filename: str) -> str:
     """Sanitize a filename for safe filesystem storage."""
     # Remove or replace problematic characters
-    safe = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    safe = _UNSAFE_FILENAME_RE.sub('_', filename)
     # Limit length
     if len(safe) > 100:
         name, ext = os.path.splitext(safe)
@@ -351,7 +446,7 @@ def _sanitize_filename(filename: str) -> str:
 def _extract_name(from_field: str) -> str:
     """Extract display name from From field."""
     # Handle "Name <email@example.com>" format
-    match = re.match(r'^([^<]+)\s*<', from_field)
+    match = _FROM_NAME_RE.match(from_field)
     if match:
         return match.group(1).strip()
     return from_field
@@ -361,20 +456,10 @@ def _extract_name(from_field: str) -> str:
 # MAIN SCAN FUNCTIONS
 # ============================================
 
-def process_email(email: Dict) -> Dict[str, Any]:
-    """
-    Process a single email: classify, check blockers, handle attachments.
-
-    Args:
-        email: Full email dict from Gmail with id, from, subject, body, attachments
-
-    Returns:
-        Processing result with actions taken
-    """
-    message_id = email.get("id", "")
-
-    result = {
-        "message_id": message_id,
+def _new_result(email: Dict) -> Dict[str, Any]:
+    """Empty processing result for an email."""
+    return {
+        "message_id": email.get("id", ""),
         "from": email.get("from"),
         "subject": email.get("subject"),
         "classification": None,
@@ -384,39 +469,52 @@ def process_email(email: Dict) -> Dict[str, Any]:
         "scan_log_id": None
     }
 
-    # Check deduplication
-    if is_already_processed(message_id):
-        result["already_processed"] = True
-        return result
 
-    # Classify
-    classification = classify_email(email)
-    result["classification"] = classification
+def _scan_log_entry(email: Dict, classification: Dict) -> Dict[str, Any]:
+    """Keyword arguments for db.create_email_scan_log(s) for a classified email."""
+    return {
+        "gmail_message_id": email.get("id", ""),
+        "gmail_thread_id": email.get("threadId"),
+        "from_address": email.get("from"),
+        "from_name": _extract_name(email.get("from", "")),
+        "subject": email.get("subject"),
+        "classification": classification["classification"],
+        "matched_blocker_id": classification.get("matched_blocker_id"),
+        "matched_project_id": classification.get("matched_project_id"),
+        "has_attachment": bool(email.get("attachments")),
+        "notification_sent": False
+    }
 
-    # Create scan log entry
-    scan_log = db.create_email_scan_log(
-        gmail_message_id=message_id,
-        gmail_thread_id=email.get("threadId"),
-        from_address=email.get("from"),
-        from_name=_extract_name(email.get("from", "")),
-        subject=email.get("subject"),
-        classification=classification["classification"],
-        matched_blocker_id=classification.get("matched_blocker_id"),
-        matched_project_id=classification.get("matched_project_id"),
-        has_attachment=bool(email.get("attachments")),
-        notification_sent=False
-    )
-    result["scan_log_id"] = scan_log.get("id")
+
+def _act_on_email(email: Dict, result: Dict[str, Any]) -> Tuple[List[Dict], List[Tuple[Dict, Dict]]]:
+    """
+    Notify and queue attachment downloads for a classified, logged email.
+
+    Database rows for the attachments are returned rather than written, so
+    a whole scan's worth can be stored at once by _store_attachments().
+
+    Args:
+        email: Full email dict
+        result: Processing result with classification and scan_log_id set
+            (updated in place)
+
+    Returns:
+        (attachment records, [(download params, document entry), ...])
+    """
+    message_id = result["message_id"]
+    classification = result["classification"]
+    attachment_records = []
+    pending_documents = []
 
     if not classification["is_relevant"]:
-        return result
+        return attachment_records, pending_documents
 
     # Check blocker resolution
     if classification.get("matched_blocker_id"):
         result["blocker_notification"] = check_blocker_resolution(email, classification)
 
     # Queue P1 notification for relevant email (if not a blocker match, which triggers P0)
-    if classification["is_relevant"] and not result["blocker_notification"]:
+    if not result["blocker_notification"]:
         notification_router.queue_p1(
             message=f"Email from {email.get('from', 'unknown')}: {email.get('subject', 'No subject')[:50]}",
             trigger_type="email_activity",
@@ -428,24 +526,84 @@ def process_email(email: Dict) -> Dict[str, Any]:
     project_id = classification.get("matched_project_id")
     if email.get("attachments"):
         for att in email["attachments"]:
-            att_params = download_email_attachment(
+            att_params, document_entry = _attachment_download(
                 message_id=message_id,
                 attachment_id=att.get("id", att.get("attachmentId", "")),
                 filename=att.get("filename", "attachment"),
                 project_id=project_id
             )
             result["attachments_to_download"].append(att_params)
+            if document_entry:
+                pending_documents.append((att_params, document_entry))
 
-            # Create attachment record
-            db.create_email_attachment(
-                email_scan_log_id=scan_log.get("id"),
-                gmail_attachment_id=att.get("id", att.get("attachmentId", "")),
-                filename=att.get("filename", "attachment"),
-                project_id=project_id,
-                blocker_id=classification.get("matched_blocker_id"),
-                download_status="pending"
-            )
+            # Attachment record
+            attachment_records.append({
+                "email_scan_log_id": result["scan_log_id"],
+                "gmail_attachment_id": att.get("id", att.get("attachmentId", "")),
+                "filename": att.get("filename", "attachment"),
+                "project_id": project_id,
+                "blocker_id": classification.get("matched_blocker_id"),
+                "download_status": "pending"
+            })
+
+    return attachment_records, pending_documents
+
+
+def _act_on_email_safely(email: Dict, result: Dict) -> Tuple[List[Dict], List[Tuple[Dict, Dict]]]:
+    """
+    _act_on_email for one email of a batch: an error is logged and recorded
+    on the result instead of aborting the rest of the scan.
+    """
+    try:
+        return _act_on_email(email, result)
+    except Exception as e:
+        logger.error(f"Failed to act on email {result['message_id']}: {e}")
+        result["error"] = str(e)
+        return [], []
+
+
+def _store_attachments(attachment_records: List[Dict], pending_documents: List[Tuple[Dict, Dict]]) -> None:
+    """
+    Insert deferred document and attachment rows in one transaction.
 
+    Fills each download's document_id from the created documents.
+    """
+    if not attachment_records and not pending_documents:
+        return
+
+    with db.transaction():
+        documents = db.create_documents([entry for _, entry in pending_documents])
+        for (params, _), document in zip(pending_documents, documents):
+            params["document_id"] = document["id"]
+        db.create_email_attachments(attachment_records)
+
+
+def process_email(email: Dict) -> Dict[str, Any]:
+    """
+    Process a single email: classify, check blockers, handle attachments.
+
+    Args:
+        email: Full email dict from Gmail with id, from, subject, body, attachments
+
+    Returns:
+        Processing result with actions taken
+    """
+    result = _new_result(email)
+
+    # Check deduplication
+    if is_already_processed(result["message_id"]):
+        result["already_processed"] = True
+        return result
+
+    # Classify
+    classification = classify_email(email)
+    result["classification"] = classification
+
+    # Create scan log entry
+    scan_log = db.create_email_scan_log(**_scan_log_entry(email, classification))
+    result["scan_log_id"] = scan_log.get("id")
+
+    _store_attachments(*_act_on_email(email, result))
     return result
 
 
@@ -510,8 +668,56 @@ def process_search_results(emails: List[Dict], scan_context: Dict) -> Dict[str,
     """
     scan_context["total_emails"] = len(emails)
 
+    # One dedup query for the whole batch instead of one per email
+    seen = db.get_processed_email_ids([email.get("id", "") for email in emails])
+
+    # Projects and blockers don't change mid-scan; fetch them once, and only
+    # if some new email gets past the ignore patterns
+    targets = None
+
+    results = []
+    pending = []
     for email in emails:
-        result = process_email(email)
+        result = _new_result(email)
+        if result["message_id"] in seen:
+            result["already_processed"] = True
+        else:
+            # Also catches a message repeated within this batch
+            seen.add(result["message_id"])
+            if _is_ignored(email):
+                # Still logged below, so it isn't picked up again next scan
+                result["classification"] = _ignore_classification()
+            else:
+                if targets is None:
+                    targets = load_match_targets()
+                result["classification"] = _score_email(email, targets)
+            pending.append((email, result))
+        results.append(result)
+
+    # Log every new email in one transaction, then act on them
+    scan_logs = db.create_email_scan_logs([
+        _scan_log_entry(email, result["classification"]) for email, result in pending
+    ])
+    for (email, result), scan_log in zip(pending, scan_logs):
+        result["scan_log_id"] = scan_log["id"]
+
+    # Notifications and attachment records are I/O-bound; overlap them
+    # (db serializes the writes itself). One email failing doesn't cost the
+    # others their attachments.
+    workers = min(EMAIL_SCAN_CONFIG.get("concurrency", 1), len(pending))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email-scan") as pool:
+            actions = list(pool.map(lambda item: _act_on_email_safely(*item), pending))
+    else:
+        actions = [_act_on_email_safely(email, result) for email, result in pending]
+
+    # Every document and attachment row of the scan in one transaction
+    _store_attachments(
+        [record for records, _ in actions for record in records],
+        [document for _, documents in actions for document in documents]
+    )
+
+    for result in results:
         scan_context["emails_processed"].append(result)
 
         if result.get("already_processed"):
@@ -550,6 +756,7 @@ def get_scan_status() -> Dict[str, Any]:
         "enabled": EMAIL_SCAN_CONFIG.get("enabled", True),
         "hours_lookback": EMAIL_SCAN_CONFIG.get("hours_lookback", 24),
         "max_emails_per_scan": EMAIL_SCAN_CONFIG.get("max_emails_per_scan", 50),
+        "next_scan": next_fire(EMAIL_SCAN_SECONDS, datetime.now()).isoformat(),
         "recent_scans": len(recent_scans),
         "last_scan": recent_scans[0] if recent_scans else None
     }
@@ -1,15 +1,27 @@
 #!/usr/bin/env python3
 """
 Grok API client for Project Manager Agent.
-Supports tool/function calling for memory retrieval.
+Supports tool/function calling for memory retrieval, and streaming replies
+via chat_stream().
 """
 
 import os
 import json
-import urllib.request
-import urllib.error
+import atexit
+import hashlib
+import http.client
 import logging
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+
+try:
+    import orjson  # Optional: faster JSON for request payloads, responses and tool results
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +29,46 @@ logger = logging.getLogger(__name__)
 API_URL = "https://api.x.ai/v1/chat/completions"
 API_KEY = os.environ.get("XAI_API_KEY_FAST", os.environ.get("XAI_API_KEY"))
 MODEL = "grok-4-latest"
+REQUEST_TIMEOUT = 30  # seconds
+MAX_TOOL_WORKERS = 4  # parallel tool calls per turn (matches the db read pool)
+
+# Transient errors are retried with exponential backoff (0.5s, 1s, 2s)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5   # seconds, doubled per retry
+MAX_RETRY_AFTER = 30  # cap on a server-requested Retry-After wait
+
+# Circuit breaker: after this many consecutive failed requests, fail fast
+# for a while instead of hammering an API that is down
+CIRCUIT_FAILURES = 5
+CIRCUIT_COOLDOWN = 30  # seconds
+
+# Idle keep-alive HTTPS connections shared by all threads, so only a new
+# connection pays for the TCP + TLS handshake. Each request checks one out
+# (http.client connections aren't thread-safe) and returns it when done.
+MAX_IDLE_CONNECTIONS = 8
+_API = urllib.parse.urlsplit(API_URL)
+_idle: "queue.LifoQueue[http.client.HTTPSConnection]" = queue.LifoQueue(maxsize=MAX_IDLE_CONNECTIONS)
+
+# Consecutive failure count and when the open circuit closes again (monotonic)
+_circuit = {"failures": 0, "open_until": 0.0}
+_circuit_lock = threading.Lock()
+
+# Request headers that never change (Authorization and Accept are added per request)
+_STATIC_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+}
+
+# Replies to identical low-temperature, tool-free requests are reused for a
+# while (they are near-deterministic; anything with tools has side effects)
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.3
+RESPONSE_CACHE_TTL = 600  # seconds
+RESPONSE_CACHE_MAX = 512
+
+# sha256(request body) -> (expires_at, response)
+_response_cache: Dict[bytes, tuple] = {}
+_response_cache_lock = threading.Lock()
 
 SYSTEM_PROMPT = """You are a helpful project manager assistant. You help the user manage tasks, track progress, and stay organized.
 
@@ -54,6 +106,10 @@ def chat(
 
     Returns:
         {"content": str, "tool_calls": list or None}
+
+    Requests without tools at temperature <= RESPONSE_CACHE_MAX_TEMPERATURE
+    are answered from memory when an identical one was made in the last
+    RESPONSE_CACHE_TTL seconds.
     """
     if not API_KEY:
         raise ValueError("XAI_API_KEY or XAI_API_KEY_FAST not set")
@@ -75,30 +131,304 @@ def chat(
         payload["tools"] = tools
         payload["tool_choice"] = "auto"
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-        "Accept": "application/json"
+    data = _json_encode(payload)
+    cacheable = not tools and temperature <= RESPONSE_CACHE_MAX_TEMPERATURE
+    if cacheable:
+        key = hashlib.sha256(data).digest()
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
+
+    result = _post(data)
+    message = result["choices"][0]["message"]
+
+    response = {
+        "content": message.get("content", ""),
+        "tool_calls": message.get("tool_calls")
     }
+    if cacheable:
+        _cache_response(key, response)
+    return response
+
+
+def _cached_response(key: bytes) -> Optional[Dict[str, Any]]:
+    """Return a copy of a fresh cached response for key, or None."""
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+    if entry is None or entry[0] <= time.monotonic():
+        return None
+    return dict(entry[1])
+
+
+def _cache_response(key: bytes, response: Dict[str, Any]):
+    """Remember a response for RESPONSE_CACHE_TTL seconds."""
+    now = time.monotonic()
+    with _response_cache_lock:
+        if len(_response_cache) >= RESPONSE_CACHE_MAX:
+            for stale in [k for k, e in _response_cache.items() if e[0] <= now]:
+                del _response_cache[stale]
+            if len(_response_cache) >= RESPONSE_CACHE_MAX:
+                _response_cache.clear()
+        _response_cache[key] = (now + RESPONSE_CACHE_TTL, dict(response))
+
+
+def chat_stream(
+    messages: List[Dict[str, str]],
+    system_prompt: str = None,
+    temperature: float = 0.7
+) -> Iterator[str]:
+    """
+    Send messages to Grok and yield the reply text as it is generated.
+
+    Args:
+        messages: List of {"role": "user"|"assistant", "content": "..."}
+        system_prompt: System instructions (default: SYSTEM_PROMPT)
+        temperature: Creativity (0-1)
+
+    Yields:
+        Content deltas, in order (joined they make the full reply)
+    """
+    if not API_KEY:
+        raise ValueError("XAI_API_KEY or XAI_API_KEY_FAST not set")
+
+    if system_prompt is None:
+        system_prompt = SYSTEM_PROMPT
+
+    payload = {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            *messages
+        ],
+        "temperature": temperature,
+        "stream": True
+    }
+
+    conn, response = _request(_json_encode(payload), accept="text/event-stream")
+    finished = False
+    try:
+        try:
+            # Server-sent events: one "data: {json}" line per chunk, ending with "data: [DONE]"
+            for line in response:
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    finished = True
+                    break
+
+                choices = _json_decode(data).get("choices")
+                if choices:
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+        except (OSError, http.client.HTTPException) as e:
+            raise RuntimeError(f"Connection error: {e}")
+    finally:
+        # A connection with unread response data can't carry the next request
+        if finished:
+            _discard(conn, response)
+        else:
+            conn.close()
+
+
+def _post(data: bytes) -> Dict[str, Any]:
+    """
+    POST an encoded JSON payload to the chat completions endpoint and
+    return the decoded JSON response.
+
+    Raises:
+        RuntimeError: On HTTP error status or connection failure
+    """
+    conn, response = _request(data)
+    try:
+        body = response.read()
+    except (OSError, http.client.HTTPException) as e:
+        conn.close()
+        _record_failure()
+        raise RuntimeError(f"Connection error: {e}")
+
+    _checkin(conn, response)
+    return _json_decode(body)
+
+
+def _json_encode(value: Any) -> bytes:
+    """Serialize a request payload to UTF-8 JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode("utf-8")
+
+
+def _json_text(value: Any) -> str:
+    """Serialize a tool result to JSON text; values JSON can't hold (dates, bytes) become strings."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, default=str)
+
+
+def _json_decode(data: Union[str, bytes]) -> Any:
+    """Parse JSON text or a response body (orjson when installed)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(API_URL, data=data, headers=headers)
 
+def _request(
+    data: bytes,
+    accept: str = "application/json"
+) -> Tuple[http.client.HTTPSConnection, http.client.HTTPResponse]:
+    """
+    Send an encoded chat completions request on a pooled connection.
+
+    Rate limits (429) and server errors (5xx) are retried up to MAX_RETRIES
+    times with exponential backoff, honouring Retry-After. After
+    CIRCUIT_FAILURES consecutive server or connection failures, requests
+    fail fast for CIRCUIT_COOLDOWN seconds instead of hitting the API.
+
+    The caller owns the returned connection: once the response has been
+    read to the end it goes back via _checkin() (or _discard()), otherwise
+    it must be closed.
+
+    Raises:
+        RuntimeError: On HTTP error status or connection failure
+    """
+    _check_circuit()
+    headers = {**_STATIC_HEADERS, "Authorization": f"Bearer {API_KEY}", "Accept": accept}
+    attempt = 0
+
+    while True:
+        conn, reused = _checkout()
+
+        try:
+            conn.request("POST", _API.path, body=data, headers=headers)
+            response = conn.getresponse()
+        except (ConnectionResetError, BrokenPipeError) as e:
+            conn.close()
+            # The server closed an idle keep-alive socket before reading the
+            # request; retry on another (eventually a fresh) connection
+            if reused:
+                continue
+            _record_failure()
+            raise RuntimeError(f"Connection error: {e}")
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            _record_failure()
+            raise RuntimeError(f"Connection error: {e}")
+
+        if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+            delay = _retry_delay(response, attempt)
+            _discard(conn, response)
+            attempt += 1
+            logger.warning(f"Grok API {response.status}, retry {attempt}/{MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if response.status >= 400:
+            try:
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                body = b""
+            conn.close()
+            # A 4xx means the API is up; only server errors count toward the breaker
+            if response.status >= 500:
+                _record_failure()
+            else:
+                _record_success()
+            raise RuntimeError(f"Grok API error {response.status}: {body.decode('utf-8', 'replace')}")
+
+        _record_success()
+        return conn, response
+
+
+def _retry_delay(response: http.client.HTTPResponse, attempt: int) -> float:
+    """Seconds to wait before retry number attempt + 1 (Retry-After if the server sent one)."""
+    retry_after = response.getheader("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_RETRY_AFTER)
+        except ValueError:
+            pass  # HTTP-date form: fall back to our own backoff
+    return RETRY_BACKOFF * (2 ** attempt)
+
+
+def _discard(conn: http.client.HTTPSConnection, response: http.client.HTTPResponse):
+    """Read and drop the rest of a response, then return its connection to the pool."""
     try:
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode("utf-8"))
-            message = result["choices"][0]["message"]
+        response.read()
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        return
+    _checkin(conn, response)
+
+
+def _check_circuit():
+    """Fail fast while the circuit breaker is open."""
+    with _circuit_lock:
+        remaining = _circuit["open_until"] - time.monotonic()
+    if remaining > 0:
+        raise RuntimeError(f"Grok API unavailable, not retrying for {remaining:.0f}s")
+
+
+def _record_failure():
+    """Count a server/connection failure; open the circuit after CIRCUIT_FAILURES in a row."""
+    with _circuit_lock:
+        _circuit["failures"] += 1
+        if _circuit["failures"] >= CIRCUIT_FAILURES:
+            _circuit["open_until"] = time.monotonic() + CIRCUIT_COOLDOWN
+            _circuit["failures"] = 0
+            logger.error(f"Grok API failing, pausing requests for {CIRCUIT_COOLDOWN}s")
 
-            return {
-                "content": message.get("content", ""),
-                "tool_calls": message.get("tool_calls")
-            }
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else ""
-        raise RuntimeError(f"Grok API error {e.code}: {error_body}")
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Connection error: {e.reason}")
+
+def _record_success():
+    """Reset the consecutive failure count."""
+    with _circuit_lock:
+        _circuit["failures"] = 0
+
+
+def _checkout() -> Tuple[http.client.HTTPSConnection, bool]:
+    """Take an idle connection, or open a new one. Returns (connection, reused)."""
+    try:
+        return _idle.get_nowait(), True
+    except queue.Empty:
+        return http.client.HTTPSConnection(_API.hostname, _API.port, timeout=REQUEST_TIMEOUT), False
+
+
+def _checkin(conn: http.client.HTTPSConnection, response: http.client.HTTPResponse):
+    """Return a connection whose response was read to the end to the idle pool."""
+    if response.will_close:
+        conn.close()
+        return
+    try:
+        _idle.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def _close_idle():
+    """Close every idle connection."""
+    while True:
+        try:
+            _idle.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+atexit.register(_close_idle)
+
+
+def _tool_key(tool_call: dict) -> tuple:
+    """Identity of a tool call: function name plus its raw argument JSON."""
+    function = tool_call["function"]
+    return function["name"], function["arguments"]
+
+
+def _run_tool(tool_call: dict, tool_executor, chat_id: str) -> Any:
+    """Execute one tool call from a Grok response."""
+    func_name = tool_call["function"]["name"]
+    args = _json_decode(tool_call["function"]["arguments"])
+
+    logger.info(f"Executing tool: {func_name}({args})")
+    return tool_executor(func_name, args, chat_id)
 
 
 def chat_with_tools(
@@ -115,7 +445,8 @@ def chat_with_tools(
     Args:
         messages: Conversation messages
         tools: Tool definitions
-        tool_executor: Function to execute tools (name, args, chat_id) -> result
+        tool_executor: Function to execute tools (name, args, chat_id) -> result.
+            Must be thread-safe: several calls from one turn run concurrently.
         chat_id: Chat ID for tool execution
         system_prompt: Optional system prompt
         max_iterations: Max tool call iterations
@@ -138,18 +469,27 @@ def chat_with_tools(
             "tool_calls": response["tool_calls"]
         })
 
-        # Execute each tool and add results
-        for tool_call in response["tool_calls"]:
-            func_name = tool_call["function"]["name"]
-            args = json.loads(tool_call["function"]["arguments"])
-
-            logger.info(f"Executing tool: {func_name}({args})")
-            result = tool_executor(func_name, args, chat_id)
-
+        # Execute the turn's distinct tool calls (concurrently when there are
+        # several); a call repeated with identical arguments runs once
+        tool_calls = response["tool_calls"]
+        distinct = {}
+        for tool_call in tool_calls:
+            distinct.setdefault(_tool_key(tool_call), tool_call)
+
+        calls = list(distinct.values())
+        if len(calls) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(calls), MAX_TOOL_WORKERS)) as pool:
+                results = list(pool.map(lambda call: _run_tool(call, tool_executor, chat_id), calls))
+        else:
+            results = [_run_tool(calls[0], tool_executor, chat_id)]
+        contents = {key: _json_text(result) for key, result in zip(distinct, results)}
+
+        # Results go back in the order the model asked for them
+        for tool_call in tool_calls:
             current_messages.append({
                 "role": "tool",
                 "tool_call_id": tool_call["id"],
-                "content": json.dumps(result)
+                "content": contents[_tool_key(tool_call)]
             })
 
     # Final call without tools
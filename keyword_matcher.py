@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Keyword matching for Project Manager Agent.
+
+Scans text once for every keyword in a set of categories (resolution,
+escalation, relevance) instead of running one substring check per keyword
+per list. Uses a pyahocorasick automaton when the package is installed and
+falls back to plain substring checks otherwise.
+
+IGNORE_PATTERNS are compiled into a single case-insensitive regex so spam
+detection is one search per email however many patterns are configured.
+"""
+
+import functools
+import logging
+import re
+from typing import Dict, List, Optional, Set
+
+from config import (
+    RESOLUTION_KEYWORDS,
+    ESCALATION_KEYWORDS,
+    IGNORE_PATTERNS,
+    RELEVANCE_KEYWORDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """Case-insensitive multi-keyword matcher grouped by category."""
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        """
+        Args:
+            categories: Mapping of category name to its keyword list
+        """
+        # keyword -> categories it belongs to (a keyword may appear in several lists)
+        self._keywords: Dict[str, List[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                self._keywords.setdefault(keyword.lower(), []).append(category)
+
+        self._automaton = self._build_automaton()
+
+    def _build_automaton(self):
+        """Build an Aho-Corasick automaton, or None if pyahocorasick is missing."""
+        try:
+            import ahocorasick
+        except ImportError:
+            logger.debug("pyahocorasick not installed, using substring keyword matching")
+            return None
+
+        automaton = ahocorasick.Automaton()
+        for keyword, categories in self._keywords.items():
+            automaton.add_word(keyword, (keyword, categories))
+        automaton.make_automaton()
+        return automaton
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        """
+        Find which keywords occur in text.
+
+        Args:
+            text: Text to scan (case-insensitive)
+
+        Returns:
+            Mapping of category -> set of distinct keywords found.
+            Categories without hits are omitted.
+        """
+        text = text.lower()
+        hits: Dict[str, Set[str]] = {}
+
+        if self._automaton is not None:
+            found = self._automaton.iter(text)
+            for _, (keyword, categories) in found:
+                for category in categories:
+                    hits.setdefault(category, set()).add(keyword)
+        else:
+            for keyword, categories in self._keywords.items():
+                if keyword in text:
+                    for category in categories:
+                        hits.setdefault(category, set()).add(keyword)
+
+        return hits
+
+
+@functools.cache
+def email_keywords() -> KeywordMatcher:
+    """Shared matcher over the email keyword lists from config (built on first use)."""
+    return KeywordMatcher({
+        "resolution": RESOLUTION_KEYWORDS,
+        "escalation": ESCALATION_KEYWORDS,
+        "relevance": RELEVANCE_KEYWORDS,
+    })
+
+
+@functools.cache
+def ignore_pattern() -> re.Pattern:
+    """
+    All IGNORE_PATTERNS compiled into one alternation (built on first use).
+
+    Entries are regular expressions, so variants like "no-?reply@" can be
+    added to config without another pass over the email.
+    """
+    return re.compile("|".join(f"(?:{p})" for p in IGNORE_PATTERNS), re.IGNORECASE)
+
+
+def scan_ignore(text: str) -> Optional[str]:
+    """
+    Find the first ignore pattern hit in text.
+
+    Args:
+        text: Text to scan
+
+    Returns:
+        The matching text, or None if nothing matched
+    """
+    match = ignore_pattern().search(text)
+    return match.group(0) if match else None
+
+
+# ============================================
+# TEST
+# ============================================
+
+if __name__ == "__main__":
+    matcher = email_keywords()
+
+    samples = [
+        "Here is the invoice you asked for, attached.",
+        "Quick question - we need more details on the quote.",
+        "Click to unsubscribe from our newsletter",
+    ]
+
+    for sample in samples:
+        print(f"{sample!r}")
+        print(f"  ignore: {scan_ignore(sample)}")
+        for category, keywords in sorted(matcher.match(sample).items()):
+            print(f"  {category}: {', '.join(sorted(keywords))}")
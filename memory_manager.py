@@ -6,6 +6,7 @@ UNIFIED APPROACH: 60K token active context with tool-based retrieval.
 Uses the simple `messages` table in db.py - no duplication.
 """
 
+import functools
 import json
 import logging
 from datetime import datetime, timedelta
@@ -21,23 +22,44 @@ logger = logging.getLogger(__name__)
 
 ACTIVE_CONTEXT_TOKENS = 60_000  # 60K tokens for active context
 CHARS_PER_TOKEN = 4             # Conservative estimate
+MESSAGE_OVERHEAD_TOKENS = 10    # Per-message role/framing overhead
+
+# A message's stored token count (estimated from length if a row has none)
+_TOKEN_COUNT_SQL = f"COALESCE(token_count, LENGTH(content) / {CHARS_PER_TOKEN})"
 
 
 # ============================================
 # TOKEN ESTIMATION
 # ============================================
 
+@functools.cache
+def _token_encoder():
+    """BPE encoder for token counts, or None if tiktoken is missing (loaded on first use)."""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.debug("tiktoken not installed, estimating tokens from length")
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
 def estimate_tokens(text: str) -> int:
-    """Conservative token estimation (4 chars per token)."""
+    """
+    Token count for text: a BPE count when tiktoken is installed,
+    otherwise a conservative estimate (4 chars per token).
+    """
     if not text:
         return 0
+    encoder = _token_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
     return len(text) // CHARS_PER_TOKEN
 
 
 def estimate_message_tokens(message: dict) -> int:
     """Estimate tokens for a single message including overhead."""
     content = message.get("content", "")
-    return estimate_tokens(content) + 10  # 10 tokens overhead
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
 
 
 # ============================================
@@ -45,9 +67,9 @@ def estimate_message_tokens(message: dict) -> int:
 # ============================================
 
 def add_message(chat_id: str, role: str, content: str) -> int:
-    """Add a message. Uses db.add_message directly."""
+    """Add a message. Uses db.add_message directly, storing its token count."""
     chat_id_int = int(chat_id) if chat_id.isdigit() else None
-    return db.add_message(role, content, chat_id_int)
+    return db.add_message(role, content, chat_id_int, token_count=estimate_tokens(content))
 
 
 # ============================================
@@ -59,39 +81,37 @@ def build_context(chat_id: str) -> List[dict]:
     Build context for Grok API call.
     Loads messages until 60K token limit.
     Returns in chronological order.
+
+    The token budget is applied in SQL (a running total of the token
+    counts stored at insert, plus per-message overhead), so only the
+    messages that fit are read, however long the history is.
     """
     chat_id_int = int(chat_id) if chat_id.isdigit() else None
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    if chat_id_int:
-        cursor.execute("""
-            SELECT role, content FROM messages
-            WHERE chat_id = ?
-            ORDER BY id DESC
-        """, (chat_id_int,))
-    else:
-        cursor.execute("""
-            SELECT role, content FROM messages
+    # Every message costs at least the overhead, so no more than this many can fit
+    max_messages = ACTIVE_CONTEXT_TOKENS // MESSAGE_OVERHEAD_TOKENS
+    where = "WHERE chat_id = ?" if chat_id_int else ""
+    params = [chat_id_int] if chat_id_int else []
+
+    with db.read_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT role, content, running_tokens FROM (
+                SELECT id, role, content,
+                       SUM({_TOKEN_COUNT_SQL} + {MESSAGE_OVERHEAD_TOKENS})
+                           OVER (ORDER BY id DESC) AS running_tokens
+                FROM (
+                    SELECT id, role, content, token_count FROM messages
+                    {where}
+                    ORDER BY id DESC
+                    LIMIT ?
+                )
+            )
+            WHERE running_tokens <= ?
             ORDER BY id DESC
-        """)
+        """, (*params, max_messages, ACTIVE_CONTEXT_TOKENS)).fetchall()
 
-    messages = []
-    total_tokens = 0
-
-    for row in cursor.fetchall():
-        msg = {"role": row["role"], "content": row["content"]}
-        msg_tokens = estimate_message_tokens(msg)
-
-        if total_tokens + msg_tokens > ACTIVE_CONTEXT_TOKENS:
-            break
-
-        messages.append(msg)
-        total_tokens += msg_tokens
-
-    conn.close()
-    messages.reverse()
+    messages = [{"role": row["role"], "content": row["content"]} for row in reversed(rows)]
+    total_tokens = rows[-1]["running_tokens"] if rows else 0
 
     logger.info(f"Context built: {len(messages)} messages, ~{total_tokens} tokens")
     return messages
@@ -101,39 +121,59 @@ def build_context(chat_id: str) -> List[dict]:
 # TOOL FUNCTIONS (for Grok to call)
 # ============================================
 
-def search_history(query: str, chat_id: str, limit: int = 5) -> List[dict]:
+def search_history(query: str, chat_id: str, limit: int = 5, rank_mode: str = "relevant") -> List[dict]:
     """
     TOOL: Search past messages by keyword.
+
+    Every word of the query must match (stemmed, so "invoices" finds
+    "invoice"); if no message has them all, any word may match instead.
+    rank_mode "relevant" puts the best matches (bm25) first; "recent" puts
+    the newest matches first.
     """
     chat_id_int = int(chat_id) if chat_id.isdigit() else None
-
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    words = query.split()
+    if not words:
+        return []
+
+    sql = """
+        SELECT m.id, m.role, m.content, m.created_at
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        WHERE messages_fts MATCH ?
+    """
+    params = []
 
     if chat_id_int:
-        cursor.execute("""
-            SELECT id, role, content, created_at
-            FROM messages
-            WHERE chat_id = ? AND content LIKE ?
-            ORDER BY id DESC
-            LIMIT ?
-        """, (chat_id_int, f"%{query}%", limit))
+        sql += " AND m.chat_id = ?"
+        params.append(chat_id_int)
+
+    if rank_mode == "recent":
+        sql += " ORDER BY m.id DESC LIMIT ?"
     else:
-        cursor.execute("""
-            SELECT id, role, content, created_at
-            FROM messages
-            WHERE content LIKE ?
-            ORDER BY id DESC
-            LIMIT ?
-        """, (f"%{query}%", limit))
+        sql += " ORDER BY messages_fts.rank LIMIT ?"
+    params.append(limit)
 
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    # Implicit AND first; OR only as a fallback so common words don't flood results
+    operators = (" ", " OR ") if len(words) > 1 else (" ",)
+    with db.read_connection() as conn:
+        for operator in operators:
+            results = db.fetch_dicts(conn.execute(sql, [_fts_query(words, operator), *params]))
+            if results:
+                break
 
     logger.info(f"search_history('{query}'): found {len(results)} matches")
     return results
 
 
+def _fts_query(words: List[str], operator: str = " ") -> str:
+    """
+    Turn query words into an FTS5 MATCH expression: each word quoted (so
+    operators and punctuation in it are literal) and joined by operator,
+    " " (implicit AND) or " OR ".
+    """
+    return operator.join('"' + word.replace('"', '""') + '"' for word in words)
+
+
 def get_messages_by_date(chat_id: str, date: str, limit: int = 20) -> List[dict]:
     """
     TOOL: Get messages from a specific date.
@@ -141,28 +181,27 @@ def get_messages_by_date(chat_id: str, date: str, limit: int = 20) -> List[dict]
     target_date = _parse_date(date)
     chat_id_int = int(chat_id) if chat_id.isdigit() else None
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    if chat_id_int:
-        cursor.execute("""
-            SELECT id, role, content, created_at
-            FROM messages
-            WHERE chat_id = ? AND date(created_at) = date(?)
-            ORDER BY id ASC
-            LIMIT ?
-        """, (chat_id_int, target_date.strftime("%Y-%m-%d"), limit))
-    else:
-        cursor.execute("""
-            SELECT id, role, content, created_at
-            FROM messages
-            WHERE date(created_at) = date(?)
-            ORDER BY id ASC
-            LIMIT ?
-        """, (target_date.strftime("%Y-%m-%d"), limit))
-
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    with db.read_connection() as conn:
+        cursor = conn.cursor()
+
+        if chat_id_int:
+            cursor.execute("""
+                SELECT id, role, content, created_at
+                FROM messages
+                WHERE chat_id = ? AND date(created_at) = date(?)
+                ORDER BY id ASC
+                LIMIT ?
+            """, (chat_id_int, target_date.strftime("%Y-%m-%d"), limit))
+        else:
+            cursor.execute("""
+                SELECT id, role, content, created_at
+                FROM messages
+                WHERE date(created_at) = date(?)
+                ORDER BY id ASC
+                LIMIT ?
+            """, (target_date.strftime("%Y-%m-%d"), limit))
+
+        results = db.fetch_dicts(cursor)
 
     logger.info(f"get_messages_by_date('{date}'): found {len(results)} messages")
     return results
@@ -179,24 +218,27 @@ def get_extended_context(chat_id: str, count: int = 50) -> List[dict]:
     return messages
 
 
+# Relative date words -> days back from today
+_RELATIVE_DAYS = {'today': 0, 'yesterday': 1}
+_WEEKDAYS = {name: i for i, name in enumerate(
+    ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+)}
+
+
 def _parse_date(date_str: str) -> datetime:
     """Parse date string including relative dates."""
     date_str = date_str.lower().strip()
     today = datetime.now()
 
-    if date_str == 'today':
-        return today
-    elif date_str == 'yesterday':
-        return today - timedelta(days=1)
-    elif date_str in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']:
-        days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-        target_day = days.index(date_str)
-        current_day = today.weekday()
-        days_ago = (current_day - target_day) % 7
-        if days_ago == 0:
-            days_ago = 7
+    days_ago = _RELATIVE_DAYS.get(date_str)
+    if days_ago is not None:
         return today - timedelta(days=days_ago)
 
+    target_day = _WEEKDAYS.get(date_str)
+    if target_day is not None:
+        # Most recent past occurrence (a week ago if it's that day today)
+        return today - timedelta(days=(today.weekday() - target_day - 1) % 7 + 1)
+
     try:
         return datetime.fromisoformat(date_str)
     except ValueError:
@@ -217,7 +259,12 @@ MEMORY_TOOLS = [
                 "type": "object",
                 "properties": {
                     "query": {"type": "string", "description": "Search term"},
-                    "limit": {"type": "integer", "description": "Max results (default 5)"}
+                    "limit": {"type": "integer", "description": "Max results (default 5)"},
+                    "rank_mode": {
+                        "type": "string",
+                        "enum": ["relevant", "recent"],
+                        "description": "Best matches first (default) or newest matches first"
+                    }
                 },
                 "required": ["query"]
             }
@@ -257,7 +304,7 @@ MEMORY_TOOLS = [
 def execute_tool(tool_name: str, args: dict, chat_id: str) -> Any:
     """Execute a memory tool by name."""
     if tool_name == "search_history":
-        return search_history(args["query"], chat_id, args.get("limit", 5))
+        return search_history(args["query"], chat_id, args.get("limit", 5), args.get("rank_mode", "relevant"))
     elif tool_name == "get_messages_by_date":
         return get_messages_by_date(chat_id, args["date"], args.get("limit", 20))
     elif tool_name == "get_extended_context":
@@ -274,32 +321,20 @@ def get_stats(chat_id: str) -> Dict[str, Any]:
     """Get memory statistics."""
     chat_id_int = int(chat_id) if chat_id.isdigit() else None
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    if chat_id_int:
-        cursor.execute("""
-            SELECT COUNT(*) as count, MIN(created_at) as oldest, MAX(created_at) as newest
-            FROM messages WHERE chat_id = ?
-        """, (chat_id_int,))
-    else:
-        cursor.execute("""
-            SELECT COUNT(*) as count, MIN(created_at) as oldest, MAX(created_at) as newest
-            FROM messages
-        """)
-
-    row = cursor.fetchone()
-
-    if chat_id_int:
-        cursor.execute("SELECT SUM(LENGTH(content)) as total FROM messages WHERE chat_id = ?", (chat_id_int,))
-    else:
-        cursor.execute("SELECT SUM(LENGTH(content)) as total FROM messages")
-
-    chars_row = cursor.fetchone()
-    conn.close()
+    # Same per-message accounting as build_context, so within_context says
+    # whether the whole history would fit in one context
+    sql = f"""
+        SELECT COUNT(*) as count, MIN(created_at) as oldest, MAX(created_at) as newest,
+               SUM({_TOKEN_COUNT_SQL} + {MESSAGE_OVERHEAD_TOKENS}) as total_tokens
+        FROM messages
+    """
+    with db.read_connection() as conn:
+        if chat_id_int:
+            row = conn.execute(sql + " WHERE chat_id = ?", (chat_id_int,)).fetchone()
+        else:
+            row = conn.execute(sql).fetchone()
 
-    total_chars = chars_row["total"] or 0
-    estimated_tokens = total_chars // CHARS_PER_TOKEN
+    estimated_tokens = row["total_tokens"] or 0
 
     return {
         "total_messages": row["count"] or 0,
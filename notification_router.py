@@ -17,20 +17,38 @@ import json
 import logging
 import os
 import subprocess
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 import db
 import telegram_client
-from config import DEDUP_WINDOWS, P1_BATCH_TIMES, P2_WEEKLY_DAY, P2_WEEKLY_TIME
+from keyword_matcher import email_keywords
+from config import (
+    DEDUP_WINDOWS,
+    P1_BATCH_MAX,
+    P1_BATCH_SECONDS,
+    P2_WEEKLY_DAY,
+    P2_WEEKLY_TIME,
+    POLICIES,
+    SMS_CONFIG,
+    get_sms_script_path,
+    next_fire
+)
 
 logger = logging.getLogger(__name__)
 
-# SMS script path - use user's notification scripts
-SMS_SCRIPT = os.path.expanduser("~/.claude/scripts/sms-tool.py")
 # Log path - relative to project directory
 LOG_PATH = os.path.join(os.path.dirname(__file__), "notification.log")
 
+# In-process dedup cache: (priority, trigger_type, source_id) -> monotonic expiry.
+# Collapses burst duplicates (e.g. deadline check + email scan in the same
+# second) without a database round-trip.
+DEDUP_CACHE_MAX = 4096
+_dedup_cache: Dict[Tuple[str, str, Optional[str]], float] = {}
+_dedup_lock = threading.Lock()
+
 
 # ============================================
 # QUEUEING FUNCTIONS
@@ -57,8 +75,8 @@ def queue_p0(
     Returns:
         Notification record or None if deduplicated
     """
-    # Check deduplication
-    if db.check_dedup(trigger_type, source_id, DEDUP_WINDOWS["P0"]):
+    # Check and record deduplication in one step
+    if not _claim_dedup("P0", trigger_type, source_id):
         logger.info(f"P0 deduplicated: {trigger_type} for {source_id}")
         _log_notification("P0", message, trigger_type, "deduplicated")
         return None
@@ -78,15 +96,12 @@ def queue_p0(
     )
 
     # Immediate send to both channels
-    telegram_success = _send_telegram(f"[URGENT] {message}")
-    sms_success = _send_sms(message[:160])  # SMS has char limit
+    telegram_success = _send_telegram(f"[URGENT] {message}", "P0")
+    sms_success = _send_sms(message[:SMS_CONFIG.max_length])  # SMS has char limit
 
     # Mark as sent
     db.mark_notification_sent(notif["id"])
 
-    # Update dedup
-    db.update_dedup(trigger_type, source_id)
-
     # Log
     status = "sent" if telegram_success else "telegram_failed"
     if not sms_success:
@@ -117,8 +132,8 @@ def queue_p1(
     Returns:
         Notification record or None if deduplicated
     """
-    # Check deduplication
-    if db.check_dedup(trigger_type, source_id, DEDUP_WINDOWS["P1"]):
+    # Check and record deduplication in one step
+    if not _claim_dedup("P1", trigger_type, source_id):
         logger.info(f"P1 deduplicated: {trigger_type} for {source_id}")
         _log_notification("P1", message, trigger_type, "deduplicated")
         return None
@@ -140,9 +155,6 @@ def queue_p1(
         context=context
     )
 
-    # Update dedup
-    db.update_dedup(trigger_type, source_id)
-
     # Log
     _log_notification("P1", message, trigger_type, f"queued for {next_batch.strftime('%H:%M')}")
 
@@ -205,26 +217,18 @@ def process_pending_batch() -> int:
     """
     Process and send pending P1 notifications.
 
-    Called by scheduler at 9am, 1pm, 5pm.
-    Groups notifications into single digest message.
+    Called by the single p1_batch scheduler job at each P1_BATCH_TIMES slot.
+    Takes one batch (up to P1_BATCH_MAX, oldest first) and groups it into a
+    single digest message; anything left over goes out with the next batch.
 
     Returns:
         Number of notifications sent
     """
-    now = datetime.now(timezone.utc)
+    # scheduled_for is stored as local time (see _get_next_batch_time)
+    now = datetime.now().isoformat()
 
-    # Get pending P1 notifications scheduled for now or earlier
-    pending = db.get_pending_notifications(priority="P1")
-
-    ready = []
-    for n in pending:
-        if n.get("scheduled_for"):
-            try:
-                scheduled = datetime.fromisoformat(n["scheduled_for"].replace("Z", "+00:00"))
-                if scheduled <= now:
-                    ready.append(n)
-            except ValueError:
-                ready.append(n)  # Include if can't parse
+    # Claim due P1 notifications (marked sent in the same transaction)
+    ready = db.claim_due_notifications("P1", due_before=now, limit=P1_BATCH_MAX)
 
     if not ready:
         logger.info("No P1 notifications ready for batch")
@@ -234,11 +238,7 @@ def process_pending_batch() -> int:
     digest = _format_digest(ready)
 
     # Send
-    _send_telegram(digest)
-
-    # Mark all as sent
-    for notif in ready:
-        db.mark_notification_sent(notif["id"])
+    _send_telegram(digest, "P1")
 
     logger.info(f"Sent P1 batch digest with {len(ready)} notifications")
     _log_notification("P1", f"Batch sent: {len(ready)} items", "batch_digest", "sent")
@@ -265,7 +265,7 @@ def process_weekly_report() -> bool:
     report = pending[-1]
 
     # Send
-    success = _send_telegram(report["message"])
+    success = _send_telegram(report["message"], "P2")
     if success:
         db.mark_notification_sent(report["id"])
         logger.info("Sent P2 weekly report")
@@ -291,9 +291,12 @@ def check_urgent_deadlines() -> List[Dict]:
     # Get tasks due within 24 hours
     urgent_tasks = db.get_tasks_due_within(hours=24, status_not="completed")
 
+    # Prefetch full-kit items for all of them in one query
+    kits = db.get_full_kit_for_tasks([task["id"] for task in urgent_tasks])
+
     for task in urgent_tasks:
         # Check full-kit
-        kit_items = db.get_full_kit_items(task["id"])
+        kit_items = kits[task["id"]]
         incomplete = [item for item in kit_items if not item.get("is_satisfied")]
 
         if incomplete:
@@ -331,15 +334,31 @@ def check_blocker_updates(email_from: str, email_subject: str, email_body: str)
     """
     notifications = []
 
-    # Get active blockers
-    blockers = db.get_blockers_filtered(resolved=False)
+    # Get active blockers that have something to match on
+    blockers = [
+        b for b in db.get_blockers_filtered(resolved=False)
+        if b.get("watch_pattern") or b.get("waiting_on")
+    ]
+    if not blockers:
+        return notifications
+
+    # Normalize once per email instead of once per blocker
+    sender = email_from.lower()
+    subject = email_subject.lower()
+    body = email_body.lower()
+
+    # Keyword scan is deferred until a blocker actually matches
+    is_resolution = None
 
     for blocker in blockers:
         # Check watch pattern match
-        if _matches_blocker(blocker, email_from, email_subject, email_body):
+        if _matches_blocker(blocker, sender, subject, body):
 
             # Determine if resolution or escalation
-            if _is_resolution(blocker, email_subject, email_body):
+            if is_resolution is None:
+                is_resolution = _is_resolution(subject, body)
+
+            if is_resolution:
                 message = f"UNBLOCKED: {blocker['description']} - Email from {email_from}"
                 trigger = "blocker_resolved"
 
@@ -451,21 +470,39 @@ def notify_new_blocker(blocker_id: str, description: str, waiting_on: str = None
 # HELPER FUNCTIONS
 # ============================================
 
-def _get_next_batch_time() -> datetime:
-    """Get next 9am, 1pm, or 5pm."""
-    now = datetime.now()
-    today = now.date()
+def _claim_dedup(priority: str, trigger_type: str, source_id: str) -> bool:
+    """
+    Claim a notification slot, checking the in-process cache before SQLite.
 
-    for time_str in P1_BATCH_TIMES:
-        hour, minute = map(int, time_str.split(":"))
-        batch_time = datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute))
+    Returns:
+        True if ok to send, False if duplicate within the priority's window
+    """
+    key = (priority, trigger_type, source_id)
+    now = time.monotonic()
 
-        if batch_time > now:
-            return batch_time
+    with _dedup_lock:
+        expires = _dedup_cache.get(key)
+        if expires is not None and expires > now:
+            return False
 
-    # Next day 9am
-    tomorrow = today + timedelta(days=1)
-    return datetime.combine(tomorrow, datetime.min.time().replace(hour=9, minute=0))
+    window_hours = DEDUP_WINDOWS[priority]
+    if not db.claim_dedup(trigger_type, source_id, window_hours):
+        return False
+
+    with _dedup_lock:
+        if len(_dedup_cache) >= DEDUP_CACHE_MAX:
+            for stale in [k for k, exp in _dedup_cache.items() if exp <= now]:
+                del _dedup_cache[stale]
+            if len(_dedup_cache) >= DEDUP_CACHE_MAX:
+                _dedup_cache.clear()
+        _dedup_cache[key] = now + window_hours * 3600
+
+    return True
+
+
+def _get_next_batch_time() -> datetime:
+    """Get next 9am, 1pm, or 5pm."""
+    return next_fire(P1_BATCH_SECONDS, datetime.now())
 
 
 def _get_next_sunday_8pm() -> datetime:
@@ -491,7 +528,7 @@ def _hours_until(due_date: str) -> int:
 
 
 def _matches_blocker(blocker: Dict, email_from: str, subject: str, body: str) -> bool:
-    """Check if email matches blocker watch pattern."""
+    """Check if email matches blocker watch pattern (email fields already lowercased)."""
     pattern = blocker.get("watch_pattern", "")
     waiting_on = blocker.get("waiting_on", "")
 
@@ -499,28 +536,25 @@ def _matches_blocker(blocker: Dict, email_from: str, subject: str, body: str) ->
         return False
 
     # Check sender matches waiting_on
-    if waiting_on and waiting_on.lower() in email_from.lower():
+    if waiting_on and waiting_on.lower() in email_from:
         return True
 
     # Check pattern in subject or body
     if pattern:
         pattern_lower = pattern.lower()
-        if pattern_lower in subject.lower() or pattern_lower in body.lower():
+        if pattern_lower in subject or pattern_lower in body:
             return True
 
     return False
 
 
-def _is_resolution(blocker: Dict, subject: str, body: str) -> bool:
+def _is_resolution(subject: str, body: str) -> bool:
     """Determine if email resolves blocker vs escalates."""
-    # Simple heuristic: check for resolution keywords
-    resolution_keywords = ["attached", "here is", "completed", "finished", "done", "ready", "sent", "enclosed"]
-    escalation_keywords = ["need more", "additional", "question", "clarify", "missing", "waiting"]
+    # Simple heuristic: compare resolution vs escalation keyword hits (one scan)
+    hits = email_keywords().match(subject + " " + body)
 
-    text = (subject + " " + body).lower()
-
-    resolution_score = sum(1 for kw in resolution_keywords if kw in text)
-    escalation_score = sum(1 for kw in escalation_keywords if kw in text)
+    resolution_score = len(hits.get("resolution", ()))
+    escalation_score = len(hits.get("escalation", ()))
 
     return resolution_score > escalation_score
 
@@ -535,7 +569,7 @@ def _format_digest(notifications: List[Dict]) -> str:
         ctx = n.get("context")
         if isinstance(ctx, str):
             try:
-                ctx = json.loads(ctx)
+                ctx = db.json_loads(ctx)
             except json.JSONDecodeError:
                 ctx = {}
         elif ctx is None:
@@ -553,10 +587,10 @@ def _format_digest(notifications: List[Dict]) -> str:
     return "\n".join(lines)
 
 
-def _send_telegram(message: str) -> bool:
-    """Send message via Telegram."""
+def _send_telegram(message: str, priority: str) -> bool:
+    """Send message via Telegram, silently if the priority's policy says so."""
     try:
-        telegram_client.send_message(message)
+        telegram_client.send_message(message, disable_notification=POLICIES[priority].silent)
         return True
     except Exception as e:
         logger.error(f"Telegram send failed: {e}")
@@ -565,13 +599,17 @@ def _send_telegram(message: str) -> bool:
 
 def _send_sms(message: str) -> bool:
     """Send message via SMS (Sinch)."""
+    if not SMS_CONFIG.enabled:
+        return False
+
     try:
-        if not os.path.exists(SMS_SCRIPT):
-            logger.warning(f"SMS script not found: {SMS_SCRIPT}")
+        sms_script = get_sms_script_path()
+        if not os.path.exists(sms_script):
+            logger.warning(f"SMS script not found: {sms_script}")
             return False
 
         result = subprocess.run(
-            ["python", SMS_SCRIPT, "send", message],
+            ["python", sms_script, "send", message],
             capture_output=True,
             text=True,
             timeout=30
@@ -595,7 +633,7 @@ def _log_notification(priority: str, message: str, trigger_type: str, status: st
     try:
         os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
         with open(LOG_PATH, "a") as f:
-            f.write(json.dumps(entry) + "\n")
+            f.write(db.json_dumps(entry) + "\n")
     except Exception as e:
         logger.error(f"Failed to write notification log: {e}")
 
@@ -322,14 +322,12 @@ def create_task_from_schedule(schedule: Dict) -> Dict[str, Any]:
     )
 
     # Link to recurring schedule
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE tasks SET recurring_schedule_id = ? WHERE id = ?",
-        (schedule["id"], task["id"])
-    )
-    conn.commit()
-    conn.close()
+    with db.write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE tasks SET recurring_schedule_id = ? WHERE id = ?",
+            (schedule["id"], task["id"])
+        )
 
     logger.info(f"Created task '{task['title']}' from schedule '{schedule.get('name')}' due {due_date}")
 
@@ -352,18 +350,15 @@ def update_schedule_after_generation(schedule_id: str) -> None:
     now = datetime.now()
     next_due = get_next_occurrence(schedule, after=now)
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE recurring_schedules
-        SET last_generated_date = ?,
-            next_due_date = ?,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    """, (now.isoformat(), next_due.isoformat(), schedule_id))
-
-    conn.commit()
-    conn.close()
+    with db.write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE recurring_schedules
+            SET last_generated_date = ?,
+                next_due_date = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (now.isoformat(), next_due.isoformat(), schedule_id))
 
 
 # ============================================
@@ -377,21 +372,20 @@ def get_due_schedules() -> List[Dict]:
     Returns:
         List of schedules where next_due_date <= now
     """
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    with db.read_connection() as conn:
+        cursor = conn.cursor()
 
-    now = datetime.now().isoformat()
+        now = datetime.now().isoformat()
 
-    cursor.execute("""
-        SELECT * FROM recurring_schedules
-        WHERE is_active = 1
-          AND (next_due_date IS NULL OR next_due_date <= ?)
-          AND (end_date IS NULL OR end_date >= ?)
-        ORDER BY next_due_date ASC
-    """, (now, now[:10]))  # Compare date part for end_date
+        cursor.execute("""
+            SELECT * FROM recurring_schedules
+            WHERE is_active = 1
+              AND (next_due_date IS NULL OR next_due_date <= ?)
+              AND (end_date IS NULL OR end_date >= ?)
+            ORDER BY next_due_date ASC
+        """, (now, now[:10]))  # Compare date part for end_date
 
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+        results = [dict(row) for row in cursor.fetchall()]
 
     return results
 
@@ -420,8 +414,10 @@ def generate_due_tasks() -> Dict[str, Any]:
 
     for schedule in due_schedules:
         try:
-            task = create_task_from_schedule(schedule)
-            update_schedule_after_generation(schedule["id"])
+            # Task and schedule advance commit together, so a failure can't double-generate
+            with db.transaction():
+                task = create_task_from_schedule(schedule)
+                update_schedule_after_generation(schedule["id"])
 
             result["tasks_created"] += 1
             result["tasks"].append({
@@ -522,14 +518,12 @@ def create_schedule(
     # Set initial next_due_date
     next_due = get_next_occurrence(schedule)
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE recurring_schedules SET next_due_date = ? WHERE id = ?",
-        (next_due.isoformat(), schedule["id"])
-    )
-    conn.commit()
-    conn.close()
+    with db.write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE recurring_schedules SET next_due_date = ? WHERE id = ?",
+            (next_due.isoformat(), schedule["id"])
+        )
 
     # Fetch updated schedule
     schedule = db.get_recurring_schedule(schedule["id"])
@@ -549,29 +543,25 @@ def get_schedule(schedule_id: str) -> Optional[Dict]:
 
 def deactivate_schedule(schedule_id: str) -> bool:
     """Deactivate a recurring schedule."""
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE recurring_schedules SET is_active = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (schedule_id,)
-    )
-    updated = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    with db.write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE recurring_schedules SET is_active = 0, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (schedule_id,)
+        )
+        updated = cursor.rowcount > 0
     return updated
 
 
 def activate_schedule(schedule_id: str) -> bool:
     """Activate a recurring schedule."""
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE recurring_schedules SET is_active = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (schedule_id,)
-    )
-    updated = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    with db.write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE recurring_schedules SET is_active = 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (schedule_id,)
+        )
+        updated = cursor.rowcount > 0
     return updated
 
 
@@ -593,22 +583,20 @@ def update_schedule(schedule_id: str, **kwargs) -> Optional[Dict]:
     if kwargs.get("cron_pattern"):
         parse_cron_pattern(kwargs["cron_pattern"])
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    with db.write_connection() as conn:
+        cursor = conn.cursor()
 
-    sets = []
-    params = []
-    for key, value in kwargs.items():
-        sets.append(f"{key} = ?")
-        params.append(value)
+        sets = []
+        params = []
+        for key, value in kwargs.items():
+            sets.append(f"{key} = ?")
+            params.append(value)
 
-    sets.append("updated_at = CURRENT_TIMESTAMP")
-    params.append(schedule_id)
+        sets.append("updated_at = CURRENT_TIMESTAMP")
+        params.append(schedule_id)
 
-    query = f"UPDATE recurring_schedules SET {', '.join(sets)} WHERE id = ?"
-    cursor.execute(query, params)
-    conn.commit()
-    conn.close()
+        query = f"UPDATE recurring_schedules SET {', '.join(sets)} WHERE id = ?"
+        cursor.execute(query, params)
 
     # Recalculate next_due_date if frequency-related fields changed
     schedule = get_schedule(schedule_id)
@@ -616,14 +604,12 @@ def update_schedule(schedule_id: str, **kwargs) -> Optional[Dict]:
                      'month_of_year', 'time_of_day']
     if schedule and any(k in kwargs for k in recalc_fields):
         next_due = get_next_occurrence(schedule)
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE recurring_schedules SET next_due_date = ? WHERE id = ?",
-            (next_due.isoformat(), schedule_id)
-        )
-        conn.commit()
-        conn.close()
+        with db.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE recurring_schedules SET next_due_date = ? WHERE id = ?",
+                (next_due.isoformat(), schedule_id)
+            )
         schedule = get_schedule(schedule_id)
 
     return schedule
@@ -640,17 +626,16 @@ def get_tasks_for_schedule(schedule_id: str, limit: int = 10) -> List[Dict]:
     Returns:
         List of task dicts
     """
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM tasks
-        WHERE recurring_schedule_id = ?
-        ORDER BY created_at DESC
-        LIMIT ?
-    """, (schedule_id, limit))
-
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    with db.read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM tasks
+            WHERE recurring_schedule_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (schedule_id, limit))
+
+        results = [dict(row) for row in cursor.fetchall()]
     return results
 
 
@@ -748,4 +748,5 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", 4000))
     logger.info(f"Starting Project Manager Agent on port {port}")
     logger.info(f"Context limit: {memory_manager.ACTIVE_CONTEXT_TOKENS:,} tokens")
-    app.run(host="0.0.0.0", port=port, debug=False)
+    # One thread per request: a chat waiting on Grok doesn't hold up other chats
+    app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
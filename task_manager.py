@@ -43,31 +43,24 @@ def create_project_with_tasks(
         **kwargs
     )
 
-    created_tasks = []
-    for i, task_data in enumerate(tasks):
-        task = db.create_task(
-            project_id=project["id"],
-            title=task_data.get("title"),
-            description=task_data.get("description"),
-            estimated_hours=task_data.get("estimated_hours"),
-            due_date=task_data.get("due_date"),
-            priority=task_data.get("priority", 50)
-        )
-        # Set sort order
-        db.update_task(task["id"], sort_order=i)
-
-        # Add full kit items if provided
-        for kit_item in task_data.get("full_kit", []):
-            if isinstance(kit_item, str):
-                db.add_full_kit_item(task["id"], kit_item)
-            else:
-                db.add_full_kit_item(
-                    task["id"],
-                    kit_item.get("description", kit_item),
-                    kit_item.get("type", "other")
-                )
+    # Insert all tasks in one transaction (sort order follows list position)
+    created_tasks = db.create_tasks(project["id"], [
+        {
+            "title": task_data.get("title"),
+            "description": task_data.get("description"),
+            "estimated_hours": task_data.get("estimated_hours"),
+            "due_date": task_data.get("due_date"),
+            "priority": task_data.get("priority", 50),
+            "sort_order": i
+        }
+        for i, task_data in enumerate(tasks)
+    ])
 
-        created_tasks.append(task)
+    # Add full kit items if provided (one transaction for all tasks)
+    with db.transaction():
+        for task, task_data in zip(created_tasks, tasks):
+            if task_data.get("full_kit"):
+                db.add_full_kit_items(task["id"], task_data["full_kit"])
 
     project["tasks"] = created_tasks
     return project
@@ -80,23 +73,18 @@ def add_dependency(
     feeding_buffer_hours: float = 0
 ) -> Dict[str, Any]:
     """Add a dependency between tasks."""
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    dep_id = db.generate_id()
-    cursor.execute("""
-        INSERT INTO task_dependencies (
-            id, task_id, depends_on_task_id, dependency_type, feeding_buffer_hours
-        ) VALUES (?, ?, ?, ?, ?)
-    """, (dep_id, task_id, depends_on_task_id, dependency_type, feeding_buffer_hours))
-
-    conn.commit()
-    conn.close()
-
-    # Update task status if dependencies not met
-    blocking = toc_engine.get_blocking_dependencies(task_id)
-    if blocking:
-        db.update_task(task_id, status="waiting_for_kit")
+    with db.transaction() as conn:
+        dep_id = db.generate_id()
+        conn.execute("""
+            INSERT INTO task_dependencies (
+                id, task_id, depends_on_task_id, dependency_type, feeding_buffer_hours
+            ) VALUES (?, ?, ?, ?, ?)
+        """, (dep_id, task_id, depends_on_task_id, dependency_type, feeding_buffer_hours))
+
+        # Update task status if dependencies not met
+        blocking = toc_engine.get_blocking_dependencies(task_id)
+        if blocking:
+            db.update_task(task_id, status="waiting_for_kit")
 
     return {
         "id": dep_id,
@@ -211,9 +199,6 @@ def get_next_tasks(project_id: str = None, limit: int = 5) -> List[Dict[str, Any
     2. Priority
     3. Due date proximity
     """
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
     query = """
         SELECT t.*, p.name as project_name
         FROM tasks t
@@ -229,9 +214,8 @@ def get_next_tasks(project_id: str = None, limit: int = 5) -> List[Dict[str, Any
     query += " ORDER BY t.priority DESC, t.due_date ASC NULLS LAST, t.created_at LIMIT ?"
     params.append(limit)
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
+    with db.read_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
 
     result = []
     for row in rows:
@@ -263,9 +247,6 @@ def get_dashboard_data() -> Dict[str, Any]:
 
 def search_tasks(query: str, project_id: str = None) -> List[Dict[str, Any]]:
     """Search tasks by title or description."""
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
     sql = """
         SELECT t.*, p.name as project_name
         FROM tasks t
@@ -280,9 +261,8 @@ def search_tasks(query: str, project_id: str = None) -> List[Dict[str, Any]]:
 
     sql += " ORDER BY t.priority DESC, t.created_at DESC LIMIT 20"
 
-    cursor.execute(sql, params)
-    rows = cursor.fetchall()
-    conn.close()
+    with db.read_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
 
     return [dict(row) for row in rows]
 
@@ -321,12 +301,12 @@ def update_progress(project_id: str, progress_percent: float = None, buffer_cons
 
 def calculate_progress_from_tasks(project_id: str) -> float:
     """Auto-calculate progress based on completed tasks."""
-    tasks = db.list_tasks(project_id=project_id)
-    if not tasks:
+    statuses = db.list_tasks(project_id=project_id, columnar=True)["status"]
+    if not statuses:
         return 0
 
-    completed = len([t for t in tasks if t["status"] == "completed"])
-    total = len(tasks)
+    completed = statuses.count("completed")
+    total = len(statuses)
 
     progress = (completed / total) * 100
     toc_engine.update_buffer_status(project_id, progress=progress)
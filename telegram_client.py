@@ -16,7 +16,12 @@ CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 API_BASE = "https://api.telegram.org/bot"
 
 
-def send_message(text: str, chat_id: int = None, parse_mode: str = None) -> Dict[str, Any]:
+def send_message(
+    text: str,
+    chat_id: int = None,
+    parse_mode: str = None,
+    disable_notification: bool = False
+) -> Dict[str, Any]:
     """
     Send a message to Telegram.
 
@@ -24,6 +29,7 @@ def send_message(text: str, chat_id: int = None, parse_mode: str = None) -> Dict
         text: Message text
         chat_id: Target chat (defaults to TELEGRAM_CHAT_ID)
         parse_mode: "Markdown" or "HTML" for formatting
+        disable_notification: Deliver silently (no sound or banner)
 
     Returns:
         API response
@@ -43,6 +49,8 @@ def send_message(text: str, chat_id: int = None, parse_mode: str = None) -> Dict
     }
     if parse_mode:
         payload["parse_mode"] = parse_mode
+    if disable_notification:
+        payload["disable_notification"] = True
 
     data = json.dumps(payload).encode("utf-8")
     headers = {"Content-Type": "application/json"}
@@ -0,0 +1,20 @@
+"""Tests for config helpers."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import config
+
+
+class GetSmsScriptPathTest(unittest.TestCase):
+    def test_expands_home(self):
+        path = config.get_sms_script_path()
+        self.assertEqual(path, os.path.expanduser(config.SMS_CONFIG.script_path))
+        self.assertFalse(path.startswith("~"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -189,15 +189,16 @@ def complete_task(task_id: str, actual_hours: float = None) -> Dict[str, Any]:
     if actual_hours is not None:
         updates["actual_hours"] = actual_hours
 
-    task = db.update_task(task_id, **updates)
+    with db.transaction():
+        task = db.update_task(task_id, **updates)
 
-    # Resolve any blockers on this task
-    blockers = db.list_blockers(task_id=task_id)
-    for blocker in blockers:
-        db.resolve_blocker(blocker["id"], resolved_by="task_completed")
+        # Resolve any blockers on this task
+        blockers = db.list_blockers(task_id=task_id)
+        for blocker in blockers:
+            db.resolve_blocker(blocker["id"], resolved_by="task_completed")
 
-    # Check if any dependent tasks can now be started
-    unblock_dependent_tasks(task_id)
+        # Check if any dependent tasks can now be started
+        unblock_dependent_tasks(task_id)
 
     return task
 
@@ -214,56 +215,55 @@ def block_task(task_id: str, reason: str, waiting_on: str = None) -> Dict[str, A
     Returns:
         Created blocker dict
     """
-    task = db.update_task(task_id, status="blocked")
-
-    blocker = db.create_blocker(
-        description=reason,
-        blocker_type="other",
-        task_id=task_id,
-        waiting_on=waiting_on
-    )
+    with db.transaction():
+        task = db.update_task(task_id, status="blocked")
+
+        blocker = db.create_blocker(
+            description=reason,
+            blocker_type="other",
+            task_id=task_id,
+            waiting_on=waiting_on
+        )
 
-    # Log context switch
-    db.log_context_switch(
-        from_task_id=task_id,
-        switch_type="blocked",
-        reason=reason
-    )
+        # Log context switch
+        db.log_context_switch(
+            from_task_id=task_id,
+            switch_type="blocked",
+            reason=reason
+        )
 
     return blocker
 
 
 def get_blocking_dependencies(task_id: str) -> List[Dict[str, Any]]:
     """Get tasks that must complete before this one can start."""
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    with db.read_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT t.* FROM tasks t
-        JOIN task_dependencies td ON td.depends_on_task_id = t.id
-        WHERE td.task_id = ? AND t.status != 'completed'
-    """, (task_id,))
+        cursor.execute("""
+            SELECT t.* FROM tasks t
+            JOIN task_dependencies td ON td.depends_on_task_id = t.id
+            WHERE td.task_id = ? AND t.status != 'completed'
+        """, (task_id,))
 
-    rows = cursor.fetchall()
-    conn.close()
+        rows = cursor.fetchall()
 
     return [dict(row) for row in rows]
 
 
 def unblock_dependent_tasks(completed_task_id: str) -> List[str]:
     """Check if completing this task unblocks others."""
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    with db.read_connection() as conn:
+        cursor = conn.cursor()
 
-    # Find tasks that depend on the completed task
-    cursor.execute("""
-        SELECT DISTINCT td.task_id
-        FROM task_dependencies td
-        WHERE td.depends_on_task_id = ?
-    """, (completed_task_id,))
+        # Find tasks that depend on the completed task
+        cursor.execute("""
+            SELECT DISTINCT td.task_id
+            FROM task_dependencies td
+            WHERE td.depends_on_task_id = ?
+        """, (completed_task_id,))
 
-    dependent_ids = [row["task_id"] for row in cursor.fetchall()]
-    conn.close()
+        dependent_ids = [row["task_id"] for row in cursor.fetchall()]
 
     unblocked = []
     for dep_id in dependent_ids:
@@ -336,35 +336,31 @@ def update_buffer_status(project_id: str, progress: float = None, consumed: floa
         db.update_project(project_id, **updates)
 
         # Record to history for fever chart
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO buffer_history (id, project_id, progress_percent, consumed_percent)
-            VALUES (?, ?, ?, ?)
-        """, (
-            db.generate_id(),
-            project_id,
-            updates.get("progress_percent", 0),
-            updates.get("buffer_consumed_percent", 0)
-        ))
-        conn.commit()
-        conn.close()
+        with db.write_connection() as conn:
+            conn.execute("""
+                INSERT INTO buffer_history (id, project_id, progress_percent, consumed_percent)
+                VALUES (?, ?, ?, ?)
+            """, (
+                db.generate_id(),
+                project_id,
+                updates.get("progress_percent", 0),
+                updates.get("buffer_consumed_percent", 0)
+            ))
 
 
 def get_buffer_history(project_id: str, days: int = 30) -> List[Dict[str, Any]]:
     """Get buffer history for fever chart."""
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    with db.read_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT progress_percent, consumed_percent, recorded_at
-        FROM buffer_history
-        WHERE project_id = ? AND recorded_at > datetime('now', ?)
-        ORDER BY recorded_at
-    """, (project_id, f"-{days} days"))
+        cursor.execute("""
+            SELECT progress_percent, consumed_percent, recorded_at
+            FROM buffer_history
+            WHERE project_id = ? AND recorded_at > datetime('now', ?)
+            ORDER BY recorded_at
+        """, (project_id, f"-{days} days"))
 
-    rows = cursor.fetchall()
-    conn.close()
+        rows = cursor.fetchall()
 
     return [dict(row) for row in rows]
 
@@ -459,23 +455,22 @@ def calculate_flow_efficiency(project_id: str) -> float:
 
     This measures how much of the total time was spent actually working vs waiting.
     """
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT
-            SUM(actual_hours) as touch_time,
-            SUM(
-                CASE WHEN actual_end IS NOT NULL AND actual_start IS NOT NULL
-                THEN julianday(actual_end) - julianday(actual_start)
-                ELSE 0 END
-            ) * 24 as lead_time_hours
-        FROM tasks
-        WHERE project_id = ? AND status = 'completed'
-    """, (project_id,))
-
-    row = cursor.fetchone()
-    conn.close()
+    with db.read_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT
+                SUM(actual_hours) as touch_time,
+                SUM(
+                    CASE WHEN actual_end IS NOT NULL AND actual_start IS NOT NULL
+                    THEN julianday(actual_end) - julianday(actual_start)
+                    ELSE 0 END
+                ) * 24 as lead_time_hours
+            FROM tasks
+            WHERE project_id = ? AND status = 'completed'
+        """, (project_id,))
+
+        row = cursor.fetchone()
 
     touch = row["touch_time"] or 0
     lead = row["lead_time_hours"] or 0
@@ -494,6 +489,7 @@ def get_wip_status() -> Dict[str, Any]:
         "limit": limit,
         "within_limit": within,
         "active_tasks": active,
+        "by_project": db.get_wip_counts(),
         "context_switches_today": switches_today
     }
 